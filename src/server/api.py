@@ -1,21 +1,228 @@
-import datetime
-import json
+import asyncio
+import os
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 
-from db import PSQLConnector
-from fastapi import FastAPI, WebSocket
+import db
+import metrics
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
+from prometheus_client import make_asgi_app
 
-from calc import SlidingWindow
+from unbabel.cache import CACHE_SIZE, RING_BINS, BinRing, LRUCache
+from unbabel.calc import GroupedWindow, WatermarkWindow, format_ticks, txt_to_arrays
+from unbabel.parse import MINUTE_US, WORDS_FIELD, EventParser, parse_interval
+from unbabel.pool import PoolRunner
+from unbabel.protocol import (
+    ACK,
+    PROTOCOL_VERSION,
+    consume_frame,
+    format_ack,
+    shard_of,
+    split_frame,
+)
+from unbabel.sink import WriteBehindSink
+from unbabel.snapshot import dump_snapshot, read_snapshot, write_snapshot
+from unbabel.stats import parse_stats, stat_column
 
 app = FastAPI()
-window = SlidingWindow(10)
+app.mount("/metrics", make_asgi_app())
+# the connection pool of the process, open from startup to shutdown
+pool: Optional[PoolRunner] = None
+# the sinks of the open websockets, flushed on shutdown
+sinks: Set[WriteBehindSink] = set()
+# windows by stream, the fields their events are grouped by, their statistics,
+# and their reorder delay and allowed lateness
+Spec = Tuple[str, Tuple[str, ...], Tuple[str, ...], int, int]
+windows: Dict[Spec, GroupedWindow] = {}
+# the open connections of each window, the last of which flushes it on close
+connections: Dict[Spec, int] = {}
+parse = EventParser()
+# streams are split over service processes, each holding the windows of its shard
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", 1))
+SHARD_INDEX = int(os.environ.get("SHARD_INDEX", 0))
+WRONG_SHARD = 4000  # websocket close code, in the range of private codes
+INVALID = 1008  # websocket close code of a policy violation, for invalid options
+# the epoch timestamps in microseconds of the latest consumed event of each stream
+offsets: Dict[str, int] = {}
+# the windows and offsets are snapshot periodically, and restored on startup
+SNAPSHOT_PATH = Path(
+    os.environ.get("SNAPSHOT_PATH", f"snapshots/windows-{SHARD_INDEX}.snap")
+)
+SNAPSHOT_INTERVAL = float(os.environ.get("SNAPSHOT_INTERVAL", 10))
+snapshotter: Optional[asyncio.Future] = None
+# the latest bins of every group, and database reads of older ranges
+ring = BinRing(int(os.environ.get("RING_BINS", RING_BINS)))
+cache = LRUCache(int(os.environ.get("CACHE_SIZE", CACHE_SIZE)))
+MIN_DATE = "0001-01-01 00:00:00"
+MAX_DATE = "9999-12-31 23:59:59"
+
+# gauges of the state held in memory, computed when scraped
+metrics.GROUPS.set_function(lambda: sum(len(g.windows) for g in windows.values()))
+metrics.REORDER.set_function(
+    lambda: sum(
+        len(w.buffer)
+        for g in windows.values()
+        for w in g.windows.values()
+        if isinstance(w, WatermarkWindow)
+    )
+)
+metrics.PENDING.set_function(lambda: sum(len(sink.pending) for sink in sinks))
+metrics.POOL_IN_USE.set_function(lambda: pool.in_use if pool else 0)
+metrics.POOL_QUEUED.set_function(lambda: pool.queued if pool else 0)
+
+
+def get_window(
+    stream: str,
+    fields: Sequence[str],
+    stats: Sequence[str],
+    delay: int = 0,
+    lateness: int = 0,
+) -> GroupedWindow:
+    """Returns the window of a stream, grouping, set of statistics and lateness,
+    shared by the connections of the stream, counting the connection."""
+    spec = (stream, tuple(fields), tuple(stats), delay, lateness)
+    connections[spec] = connections.get(spec, 0) + 1
+    if spec not in windows:
+        # the global window, of the single empty group, is never idle
+        windows[spec] = GroupedWindow(
+            10,
+            idle=None if fields else sys.maxsize,
+            stats=stats or None,
+            delay=delay,
+            lateness=lateness,
+        )
+    return windows[spec]
+
+
+def release_window(
+    stream: str,
+    fields: Sequence[str],
+    stats: Sequence[str],
+    delay: int = 0,
+    lateness: int = 0,
+) -> bool:
+    """Uncounts a connection of a window, returning whether it was the last, so
+    that the window is only flushed once no connection consumes into it."""
+    spec = (stream, tuple(fields), tuple(stats), delay, lateness)
+    connections[spec] -= 1
+    if connections[spec]:
+        return False
+    del connections[spec]
+    return True
+
+
+def interval_bins(text: str) -> int:
+    """Parses a delay or lateness, such as `2m`, as the `calculate` options do, to a
+    whole number of bins, 0 if empty."""
+    if not text:
+        return 0
+    us = parse_interval(text)
+    if us % MINUTE_US:
+        raise ValueError("The delay and lateness must be whole numbers of bins.")
+    return us // MINUTE_US
+
+
+def group_label(fields: Sequence[str], key: Sequence[str], stream: str = "") -> str:
+    """Labels a group key for the metrics table, e.g. `client_name=airliberty`, or
+    `stream=a,client_name=airliberty` for a stream."""
+    if stream:
+        fields, key = ["stream", *fields], [stream, *key]
+    return ",".join(f"{field}={value}" for field, value in zip(fields, key))
+
+
+@app.on_event("startup")
+async def startup():
+    global pool, snapshotter
+    pool = db.connect_pool()
+    snapshot = read_snapshot(SNAPSHOT_PATH)
+    if snapshot is not None:
+        # resumes without replaying events
+        state, latest = snapshot
+        windows.update(state)
+        offsets.update(latest)
+    if SNAPSHOT_INTERVAL > 0:
+        snapshotter = asyncio.ensure_future(snapshot_periodically())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if snapshotter is not None:
+        snapshotter.cancel()
+    await checkpoint()
+    # waits for the running calls, off the event loop
+    await asyncio.get_running_loop().run_in_executor(None, pool.close)
+
+
+async def save_snapshot(data: bytes):
+    """Writes a snapshot of the windows and offsets of every stream, off the event
+    loop."""
+    await asyncio.get_running_loop().run_in_executor(
+        None, write_snapshot, SNAPSHOT_PATH, data
+    )
+
+
+async def checkpoint():
+    """Writes the bins buffered by the sinks, then a snapshot of the windows that
+    produced them, unless some failed to be written."""
+    # the bins produced until the snapshot are written first, as they aren't
+    # produced again after a restore; they are taken along with the snapshot,
+    # without awaiting, as other connections keep consuming meanwhile
+    taken = [(sink, sink.take()) for sink in list(sinks)]
+    data = dump_snapshot(windows, offsets)
+    written = True
+    for sink, rows in taken:
+        try:
+            await flush(sink, rows)
+        except Exception as e:
+            print(e)
+            written = False
+    if written:
+        await save_snapshot(data)
+
+
+async def snapshot_periodically():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        await checkpoint()
+
+
+async def flush(sink: WriteBehindSink, rows: Optional[Dict] = None):
+    """Writes the buffered bins of a sink, or rows taken from it, on the pool's
+    executor, buffering them again if that fails."""
+    if rows is None:
+        rows = sink.take()
+    if not rows:
+        return
+    start = perf_counter()
+    try:
+        await pool.run(sink.write, rows)
+    except Exception:
+        sink.restore(rows)
+        raise
+    metrics.FLUSH.observe(perf_counter() - start)
+    metrics.FLUSH_ROWS.observe(len(rows))
+
+
+async def flush_periodically(sink: WriteBehindSink):
+    """Writes the buffered bins once they are older than the sink's `max_age`,
+    even if no more events arrive."""
+    while True:
+        await asyncio.sleep(sink.max_age)
+        if sink.due():
+            try:
+                await flush(sink)
+            except Exception as e:
+                # the rows are kept, and written on the next flush
+                print(e)
 
 
 @app.get("/db_conn_test")
 async def test_db():
     try:
-        psql = PSQLConnector()
-        psql.test_insert()
-        psql.clear()
+        await pool.run(db.test_insert)
+        await pool.run(db.clear)
         return {"status": 200}
     except Exception as e:
         return {"status": 404, "message": str(e)}
@@ -23,29 +230,198 @@ async def test_db():
 @app.get("/create_db")
 async def create_db():
     try:
-        psql = PSQLConnector()
-        psql.create_db()
+        await pool.run(db.create_db)
         return {"status": 200}
     except Exception as e:
         return {"status": 404, "message": str(e)}
 
 
+@app.get("/averages")
+async def get_averages(
+    start: str = Query(MIN_DATE, alias="from"),
+    end: str = Query(MAX_DATE, alias="to"),
+    group: str = "",
+):
+    start, end = start.replace("T", " "), end.replace("T", " ")
+    bins = ring.get(group, start, end)
+    source = "memory"
+    if bins is None:
+        oldest = ring.oldest(group)
+        # ranges ending before the ring are no longer produced, thus cached
+        cached = oldest is not None and end < oldest
+        bins = cache.get((group, start, end)) if cached else None
+        source = "cache"
+        if bins is None:
+            bins = await pool.run(db.select_averages, group, start, end)
+            source = "db"
+            if cached:
+                cache.put((group, start, end), bins)
+        if oldest is not None and end >= oldest:
+            # the ring holds bins not yet written, or produced again
+            latest = dict(bins)
+            latest.update(ring.get(group, oldest, end))
+            bins = sorted(latest.items())
+    return {
+        "group": group,
+        "source": source,
+        "bins": [{"date": date, **values} for date, values in bins],
+    }
+
+
+@app.websocket("/averages/ws")
+async def subscribe_averages(websocket: WebSocket, group: str = ""):
+    # pushes the bins of a group as they are produced
+    await websocket.accept()
+    queue = ring.subscribe(group)
+    try:
+        while True:
+            date, values = await queue.get()
+            await websocket.send_json({"date": date, **values})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ring.unsubscribe(group, queue)
+
+
+@app.get("/offsets")
+async def get_offsets():
+    # producers resume after the latest consumed event of their stream
+    return offsets
+
+
+@app.get("/pool_stats")
+async def pool_stats():
+    return {
+        "pool": pool.stats(),
+        "sinks": {
+            "open": len(sinks),
+            "pending": sum(len(sink.pending) for sink in sinks),
+            "rows_written": sum(sink.rows_written for sink in sinks),
+            "flushes": sum(sink.flushes for sink in sinks),
+        },
+    }
+
+
 @app.websocket("/ws")
-async def websocket_create(websocket: WebSocket):
-    psql = PSQLConnector()
+async def websocket_create(
+    websocket: WebSocket,
+    group_by: str = "",
+    stats: str = "",
+    delay: str = "",
+    lateness: str = "",
+    protocol: int = 1,
+    stream: str = "",
+):
     await websocket.accept()
+    shard = shard_of(stream, SHARD_COUNT)
+    if shard != SHARD_INDEX:
+        # the windows of the stream are held by another process
+        await websocket.close(WRONG_SHARD + shard)
+        return
     try:
+        stat_names = parse_stats(stats.split(",")) if stats else []
+        delay_bins, lateness_bins = interval_bins(delay), interval_bins(lateness)
+        if stat_names and (delay_bins or lateness_bins):
+            raise ValueError("Late observations are only supported for the mean.")
+    except ValueError as e:
+        await websocket.close(INVALID, str(e))
+        return
+    metrics.CONNECTIONS.inc()
+    fields = group_by.split(",") if group_by else []
+    columns: List[str] = [stat_column(s) for s in stat_names or ["mean"]]
+    await pool.run(db.add_columns, columns)
+    spec = (stream, fields, stat_names, delay_bins, lateness_bins)
+    # late events produce their bins again, which overwrite the stored ones
+    window = get_window(*spec)
+    sink = db.new_sink()
+    sinks.add(sink)
+    flusher = asyncio.ensure_future(flush_periodically(sink))
+    weighted = "wmean" in stat_names
+    batched = not fields and not stat_names and not delay_bins and not lateness_bins
+
+    async def insert(rows):
+        metrics.BINS.inc(len(rows))
+        # rows of the global statistics have an empty group key
+        for ts, *row in rows:
+            group = group_label(fields, row[: len(fields)], stream)
+            values = dict(zip(columns, row[len(fields) :]))
+            sink.add(ts, values, group)
+            ring.add(group, ts, values)
+        if sink.ready():
+            await flush(sink)
+
+    def consume(line):
+        # the event is parsed before it is consumed, and the window raises before
+        # changing, so a failing event is not consumed
+        start = perf_counter()
+        us, duration = parse(line)
+        key = parse.fields(line, fields)
+        words = parse.number(line, WORDS_FIELD) if weighted else 1
+        rows = window.consume_tick(key, us // MINUTE_US, duration, words)
+        offsets[stream] = max(offsets.get(stream, 0), us)
+        metrics.CONSUME.observe(perf_counter() - start)
+        return rows
+
+    def consume_many(lines):
+        # the events of a frame of the global mean are parsed and consumed at once,
+        # and only the closed bins are formatted; the whole frame is parsed, and
+        # rejected if any line is not an event, before any event is consumed
+        start = perf_counter()
+        us, durations = txt_to_arrays("\n".join(lines), bin_us=1)
+        if len(us) != len(lines):
+            raise ValueError(f"Parsed {len(us)} events of {len(lines)} lines.")
+        (bins, means), rows = window.consume_many((), us // MINUTE_US, durations)
+        rows[:0] = zip(format_ticks(bins), means.tolist())
+        if len(us):
+            offsets[stream] = max(offsets.get(stream, 0), int(us.max()))
+            # events aren't timed one by one in a batch
+            metrics.CONSUME_FRAME.observe(perf_counter() - start)
+        return rows
+
+    def received(count):
+        metrics.EVENTS.inc(count)
+        metrics.FRAMES.inc()
+        metrics.FRAME_EVENTS.observe(count)
+
+    try:
+        if protocol < PROTOCOL_VERSION:
+            while True:
+                # json data, a single event per frame
+                line = await websocket.receive_text()
+                rows = consume(line)
+                received(1)
+                await insert(rows)
+
+                await websocket.send_text(ACK)
+
+        # batches of events, acknowledged by their sequence number on the
+        # connection, as the client keeps sending while frames are processed
+        seq = 0
         while True:
-            # json data
-            data = await websocket.receive_json()
-            for ts, dur in window.consume(
-                (datetime.datetime.fromisoformat(data["timestamp"]), data["duration"])
-            ):
-                psql.insert(ts, dur)
-
-            await websocket.send_text("200")
+            frame = await websocket.receive_text()
+            seq += 1
+            try:
+                lines = split_frame(frame)
+                if batched:
+                    rows, count, error = consume_many(lines), len(lines), None
+                else:
+                    # the events before a failing one stay consumed, and their
+                    # bins are written
+                    rows, count, error = consume_frame(consume, lines)
+            except (ValueError, KeyError) as e:
+                rows, count, error = [], 0, str(e)
+            if error is not None:
+                metrics.REJECTED.inc()
+            received(count)
+            await insert(rows)
+            await websocket.send_text(format_ack(seq, count, error))
     except Exception as e:
         raise e
     finally:
-        ts, dur = window.flush()[0]
-        psql.insert(ts, dur)
+        flusher.cancel()
+        # the window stays shared while other connections of the stream are open
+        if release_window(*spec):
+            await insert(window.flush())
+        await flush(sink)
+        sinks.discard(sink)
+        metrics.CONNECTIONS.dec()
@@ -1,42 +1,115 @@
-from psycopg2 import connect
+import os
+from typing import Dict, Iterable, List, Tuple
 
+from psycopg2.pool import ThreadedConnectionPool
 
-class PSQLConnector:
-    UPSERT = (
-        lambda ts, dur: f"""INSERT INTO metrics("date", average_delivery_time) VALUES('{ts}', {dur}) ON CONFLICT ("date") DO UPDATE SET average_delivery_time = {dur};"""
+from unbabel.pool import POOL_MAX, POOL_MIN, TIMEOUT, PoolRunner
+from unbabel.sink import MAX_AGE, MAX_ROWS, WriteBehindSink
+
+CONNECT_TIMEOUT = 10  # in seconds
+STATEMENT_TIMEOUT = 30_000  # in milliseconds
+
+
+def connect_pool() -> PoolRunner:
+    """Opens the connection pool shared by the whole process, configured by the
+    `DB_POOL_MIN`, `DB_POOL_MAX`, `DB_CONNECT_TIMEOUT`, `DB_STATEMENT_TIMEOUT`
+    and `DB_TIMEOUT` environment variables."""
+    size = int(os.environ.get("DB_POOL_MAX", POOL_MAX))
+    statement_timeout = int(os.environ.get("DB_STATEMENT_TIMEOUT", STATEMENT_TIMEOUT))
+    pool = ThreadedConnectionPool(
+        int(os.environ.get("DB_POOL_MIN", POOL_MIN)),
+        size,
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        password="test",
+        connect_timeout=int(os.environ.get("DB_CONNECT_TIMEOUT", CONNECT_TIMEOUT)),
+        options=f"-c statement_timeout={statement_timeout}",
     )
+    timeout = float(os.environ.get("DB_TIMEOUT", TIMEOUT))
+    return PoolRunner(pool, size, timeout or None)
 
-    def __init__(self):
-        self.conn = connect(
-            dbname="postgres", user="postgres", host="localhost", password="test"
-        )
 
-    def exe(self, query: str):
-        cur = self.conn.cursor()
-        try:
-            cur.execute(query)
-        except Exception as e:
-            print(e)
+def new_sink() -> WriteBehindSink:
+    # bins are upserted in batches through the pool, on size or age thresholds
+    return WriteBehindSink(
+        None,
+        max_rows=int(os.environ.get("SINK_MAX_ROWS", MAX_ROWS)),
+        max_age=float(os.environ.get("SINK_MAX_AGE", MAX_AGE)),
+    )
 
-        self.conn.commit()
-        cur.close()
 
-    def create_db(self):
-        self.exe(
-            """CREATE TABLE metrics( "date" TIMESTAMP PRIMARY KEY, average_delivery_time FLOAT );"""
-        )
+def exe(conn, query: str):
+    cur = conn.cursor()
+    try:
+        cur.execute(query)
+    except Exception as e:
+        print(e)
+        conn.rollback()
+
+    conn.commit()
+    cur.close()
+
 
-    def clear(self):
-        self.exe("DELETE FROM metrics;")
+def create_db(conn):
+    exe(
+        conn,
+        """CREATE TABLE IF NOT EXISTS metrics( "date" TIMESTAMP, group_key TEXT NOT NULL DEFAULT '', average_delivery_time FLOAT, PRIMARY KEY ("date", group_key) );""",
+    )
+    # tables of the global average only, keyed by date, are migrated in place
+    exe(
+        conn,
+        """ALTER TABLE metrics ADD COLUMN IF NOT EXISTS group_key TEXT NOT NULL DEFAULT '';""",
+    )
+    exe(
+        conn,
+        """DO $$ BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.key_column_usage
+                WHERE table_name = 'metrics' AND constraint_name = 'metrics_pkey'
+                AND column_name = 'group_key'
+            ) THEN
+                ALTER TABLE metrics DROP CONSTRAINT IF EXISTS metrics_pkey;
+                ALTER TABLE metrics ADD PRIMARY KEY ("date", group_key);
+            END IF;
+        END $$;""",
+    )
+
+
+def add_columns(conn, columns: Iterable[str]):
+    # statistic columns, besides the average, are added as they are requested
+    for column in columns:
+        exe(conn, f"""ALTER TABLE metrics ADD COLUMN IF NOT EXISTS "{column}" FLOAT;""")
+
+
+def select_averages(
+    conn, group: str, start: str, end: str
+) -> List[Tuple[str, Dict[str, float]]]:
+    """The stored bins of a group within a range of dates, inclusive."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """SELECT * FROM metrics WHERE group_key = %s AND "date" BETWEEN %s AND %s ORDER BY "date";""",
+            (group, start, end),
+        )
+        names = [column[0] for column in cur.description]
+        bins = []
+        for row in cur.fetchall():
+            values = dict(zip(names, row))
+            date = values.pop("date").strftime("%Y-%m-%d %H:%M:%S")
+            del values["group_key"]
+            bins.append((date, {k: v for k, v in values.items() if v is not None}))
+    finally:
+        cur.close()
+    conn.commit()
+    return bins
 
-    def test_insert(self):
-        self.exe(PSQLConnector.UPSERT("2000-01-03 00:00:00", 1.0))
 
-    def insert(self, ts: str, dur: float):
-        self.exe(PSQLConnector.UPSERT(ts, dur))
+def clear(conn):
+    exe(conn, "DELETE FROM metrics;")
 
 
-#psql = PSQLConnector()
-#psql.create_db()
-# psql.test_insert()
-# psql.test_insert()
+def test_insert(conn):
+    sink = WriteBehindSink(conn)
+    sink.add("2000-01-03 00:00:00", {"average_delivery_time": 1.0})
+    sink.flush()
@@ -0,0 +1,54 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# latencies from a microsecond, as most events are consumed in a few of them
+LATENCY_BUCKETS = (
+    1e-6,
+    2.5e-6,
+    5e-6,
+    1e-5,
+    2.5e-5,
+    5e-5,
+    1e-4,
+    2.5e-4,
+    5e-4,
+    1e-3,
+    5e-3,
+    1e-2,
+    0.1,
+)
+FLUSH_BUCKETS = (1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1, 2.5, 10)
+SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+EVENTS = Counter("unbabel_events_received", "Events received over websockets.")
+FRAMES = Counter("unbabel_frames_received", "Websocket frames received.")
+REJECTED = Counter("unbabel_frames_rejected", "Batch frames rejected.")
+BINS = Counter("unbabel_bins_emitted", "Bins produced by the windows.")
+CONSUME = Histogram(
+    "unbabel_consume_seconds",
+    "Time to parse an event and consume it in its window.",
+    buckets=LATENCY_BUCKETS,
+)
+CONSUME_FRAME = Histogram(
+    "unbabel_consume_frame_seconds",
+    "Time to parse and consume a batched frame of the global mean at once.",
+    buckets=LATENCY_BUCKETS,
+)
+FRAME_EVENTS = Histogram(
+    "unbabel_frame_events", "Events per received frame.", buckets=SIZE_BUCKETS
+)
+FLUSH = Histogram(
+    "unbabel_db_flush_seconds",
+    "Time to write a batch of bins, including the wait for a connection.",
+    buckets=FLUSH_BUCKETS,
+)
+FLUSH_ROWS = Histogram(
+    "unbabel_db_flush_rows", "Rows written per database flush.", buckets=SIZE_BUCKETS
+)
+CONNECTIONS = Gauge("unbabel_active_connections", "Open ingestion websockets.")
+GROUPS = Gauge("unbabel_window_groups", "Groups with a window in memory.")
+REORDER = Gauge(
+    "unbabel_reorder_buffer_ticks", "Ticks held in reorder buffers, after watermarks."
+)
+PENDING = Gauge("unbabel_pending_rows", "Bins buffered by sinks, not yet written.")
+POOL_IN_USE = Gauge("unbabel_db_connections_in_use", "Pool connections in use.")
+POOL_QUEUED = Gauge("unbabel_db_calls_queued", "Database calls waiting for a thread.")
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+
+def main():
+    """Runs a service process per shard, on consecutive ports from `PORT`.
+
+    Streams are assigned to shards by `unbabel.protocol.shard_of`, and each process
+    only accepts the streams of its shard, so every window is held by a single
+    process and the results are the same as with a single one. The number of
+    shards is `SHARD_COUNT`, the number of cores by default.
+    """
+    count = int(os.environ.get("SHARD_COUNT", os.cpu_count() or 1))
+    host = os.environ.get("HOST", "0.0.0.0")
+    port = int(os.environ.get("PORT", 8000))
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app"]
+            + ["--host", host, "--port", str(port + i)],
+            env={**os.environ, "SHARD_COUNT": str(count), "SHARD_INDEX": str(i)},
+        )
+        for i in range(count)
+    ]
+    try:
+        for process in processes:
+            process.wait()
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import json
+import os
+import platform
+import statistics
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from .generator import generate_events
+from .writer import write_output
+
+Case = Dict
+Report = Dict
+
+
+def make_input(input_file: Path, size: int, density: float, seed: int = 0) -> Path:
+    """Generates an input file with a given number of events per minute on average.
+
+    Args:
+        input_file (Path): The file to be written.
+        size (int): The number of events.
+        density (float): The average number of events per minute.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        Path: The written file.
+    """
+    generate_events(input_file, size, rate=density, seed=seed)
+    return input_file
+
+
+def run_once(fn: Callable[[], Iterable]) -> float:
+    """Times a single run of a strategy, including serialization of its output.
+
+    Args:
+        fn (Callable[[], Iterable]): Produces the strategy rows.
+
+    Returns:
+        float: The wall time in seconds.
+    """
+    start = perf_counter()
+    write_output(fn(), Path(os.devnull))
+    return perf_counter() - start
+
+
+def peak_memory(fn: Callable[[], Iterable]) -> int:
+    """Measures the peak of memory allocated by python during a run, with tracemalloc.
+    Done on a separate run, as tracing slows down the allocations being timed.
+
+    Args:
+        fn (Callable[[], Iterable]): Produces the strategy rows.
+
+    Returns:
+        int: The peak of traced memory in bytes.
+    """
+    tracemalloc.start()
+    try:
+        write_output(fn(), Path(os.devnull))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(
+    fn: Callable[[], Iterable], events: int, repeat: int = 5, warmup: int = 1
+) -> Case:
+    """Runs a strategy `warmup + repeat` times, and summarizes the timed runs.
+
+    Args:
+        fn (Callable[[], Iterable]): Produces the strategy rows.
+        events (int): The number of events in the input.
+        repeat (int, optional): The number of timed runs. Defaults to 5.
+        warmup (int, optional): The number of untimed runs. Defaults to 1.
+
+    Returns:
+        Case: Median, spread and throughput of the timed runs, and peak memory.
+    """
+    for _ in range(warmup):
+        run_once(fn)
+    times = [run_once(fn) for _ in range(repeat)]
+    median = statistics.median(times)
+    quartiles = statistics.quantiles(times, n=4) if repeat > 1 else [median] * 3
+    return {
+        "median": median,
+        "min": min(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if repeat > 1 else 0.0,
+        "iqr": quartiles[2] - quartiles[0],
+        "events_per_sec": events / median if median > 0 else float("inf"),
+        "peak_memory": peak_memory(fn),
+        "times": times,
+    }
+
+
+def case_key(case: Case) -> str:
+    """Identifies a case across reports, by strategy and input parameters."""
+    return "{strategy}/w{window_size}/d{density}/n{events}".format(**case)
+
+
+def run_suite(
+    strategies: Dict[str, Callable],
+    window_sizes: Sequence[int],
+    densities: Sequence[float],
+    events: int,
+    data_dir: Path,
+    repeat: int = 5,
+    warmup: int = 1,
+    log: Callable[[str], None] = print,
+) -> Report:
+    """Benchmarks every strategy, over a sweep of window sizes and event densities.
+
+    Input files are generated once into `data_dir`, and reused on later runs.
+
+    Args:
+        strategies (Dict[str, Callable]): Strategy functions by name.
+        window_sizes (Sequence[int]): Window sizes in minutes.
+        densities (Sequence[float]): Average events per minute.
+        events (int): The number of events of each input.
+        data_dir (Path): The directory holding generated inputs.
+        repeat (int, optional): The number of timed runs. Defaults to 5.
+        warmup (int, optional): The number of untimed runs. Defaults to 1.
+        log (Callable[[str], None], optional): Progress output. Defaults to print.
+
+    Returns:
+        Report: A machine-readable report of every case.
+    """
+    data_dir.mkdir(parents=True, exist_ok=True)
+    cases: List[Case] = []
+    for density in densities:
+        input_file = data_dir / f"bench_d{density}_n{events}.txt"
+        if not input_file.exists():
+            make_input(input_file, events, density)
+        for window_size in window_sizes:
+            for name, strategy_fn in strategies.items():
+                case = {
+                    "strategy": name,
+                    "window_size": window_size,
+                    "density": density,
+                    "events": events,
+                }
+                case.update(
+                    measure(
+                        lambda: strategy_fn(input_file, window_size=window_size),
+                        events,
+                        repeat=repeat,
+                        warmup=warmup,
+                    )
+                )
+                log(
+                    f"{case_key(case)}: {case['median']:.4f}s "
+                    f"(±{case['iqr']:.4f}), {case['events_per_sec']:.0f} events/s, "
+                    f"{case['peak_memory'] / 2**20:.1f}MB"
+                )
+                cases.append(case)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "cases": cases,
+    }
+
+
+def compare(report: Report, baseline: Report, threshold: float = 0.1) -> List[Dict]:
+    """Compares the median times of a report with a baseline report.
+
+    Args:
+        report (Report): The current report.
+        baseline (Report): The baseline report.
+        threshold (float, optional): Relative slowdown flagged as a regression.
+            Defaults to 0.1.
+
+    Returns:
+        List[Dict]: The cases whose median regressed above the threshold.
+    """
+    baseline_cases = {case_key(c): c for c in baseline["cases"]}
+    regressions = []
+    for case in report["cases"]:
+        base: Optional[Case] = baseline_cases.get(case_key(case))
+        if base is None:
+            continue
+        ratio = case["median"] / base["median"]
+        if ratio > 1 + threshold:
+            regressions.append({"case": case_key(case), "ratio": ratio})
+    return regressions
+
+
+def save_report(report: Report, output_file: Path):
+    """Writes a report as Json."""
+    with open(output_file, "w") as fp:
+        json.dump(report, fp, indent=2)
+
+
+def load_report(input_file: Path) -> Report:
+    """Reads a report written by `save_report`."""
+    with open(input_file, "r") as fp:
+        return json.load(fp)
@@ -0,0 +1,145 @@
+import asyncio
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+# a produced bin, its date and values by column
+Bin = Tuple[str, Dict[str, float]]
+
+RING_BINS = 24 * 60  # a day of minute bins
+CACHE_SIZE = 256
+QUEUE_SIZE = 1024
+
+
+class GroupRing:
+    __slots__ = ("dates", "values", "start")
+
+    def __init__(self):
+        """The latest bins of a group, sorted by date, in lists trimmed in halves
+        so appending is O(1) amortized and ranges are found by bisection."""
+        self.dates: List[str] = []
+        self.values: List[Dict[str, float]] = []
+        # the index of the oldest retained bin
+        self.start = 0
+
+
+class BinRing:
+    def __init__(self, capacity: int = RING_BINS, queue_size: int = QUEUE_SIZE):
+        """Keeps the latest `capacity` bins of each group in memory, as they are
+        produced, to serve reads of recent ranges without a database query, and
+        pushes them to subscribers.
+
+        Bins produced again, e.g. for late events, replace the retained ones.
+
+        Args:
+            capacity (int, optional): The number of bins kept per group. Defaults
+                to RING_BINS.
+            queue_size (int, optional): The bins queued per subscriber, the oldest
+                are dropped beyond it. Defaults to QUEUE_SIZE.
+        """
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.groups: Dict[str, GroupRing] = {}
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def add(self, group: str, date: str, values: Dict[str, float]):
+        """Retains a produced bin of a group, and pushes it to the subscribers.
+
+        Args:
+            group (str): The group label, empty for the global statistics.
+            date (str): The date of the bin, as produced.
+            values (Dict[str, float]): The values by column name.
+        """
+        ring = self.groups.get(group)
+        if ring is None:
+            ring = self.groups[group] = GroupRing()
+        dates = ring.dates
+        if not dates or date > dates[-1]:
+            dates.append(date)
+            ring.values.append(dict(values))
+        else:
+            i = bisect_left(dates, date, ring.start)
+            if i < len(dates) and dates[i] == date:
+                ring.values[i].update(values)
+            elif i > ring.start:
+                dates.insert(i, date)
+                ring.values.insert(i, dict(values))
+        if len(dates) - ring.start > self.capacity:
+            ring.start = len(dates) - self.capacity
+            if ring.start >= self.capacity:
+                del dates[: ring.start]
+                del ring.values[: ring.start]
+                ring.start = 0
+
+        for queue in self.subscribers.get(group, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((date, values))
+
+    def oldest(self, group: str) -> Optional[str]:
+        """The date of the oldest retained bin of a group, or None."""
+        ring = self.groups.get(group)
+        if ring is None or ring.start == len(ring.dates):
+            return None
+        return ring.dates[ring.start]
+
+    def get(self, group: str, start: str, end: str) -> Optional[List[Bin]]:
+        """Returns the bins of a group within a range of dates, if retained.
+
+        Args:
+            group (str): The group label.
+            start (str): The first date, inclusive.
+            end (str): The last date, inclusive.
+
+        Returns:
+            Optional[List[Bin]]: The bins, or None if the range starts before the
+                oldest retained bin.
+        """
+        oldest = self.oldest(group)
+        if oldest is None or start < oldest:
+            return None
+        ring = self.groups[group]
+        lo = bisect_left(ring.dates, start, ring.start)
+        hi = bisect_right(ring.dates, end, lo)
+        return [(ring.dates[i], dict(ring.values[i])) for i in range(lo, hi)]
+
+    def subscribe(self, group: str) -> asyncio.Queue:
+        """Returns a queue receiving the bins produced for a group from now on."""
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.subscribers.setdefault(group, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, group: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(group, set())
+        queues.discard(queue)
+        if not queues:
+            self.subscribers.pop(group, None)
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        """A bounded mapping evicting the least recently used entries, e.g. for
+        database reads of ranges older than the ring.
+
+        Args:
+            maxsize (int, optional): The number of entries. Defaults to CACHE_SIZE.
+        """
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
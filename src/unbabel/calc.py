@@ -1,18 +1,56 @@
+import copy
 import datetime
 import json
-from pathlib import Path
-from typing import Iterable, List, Optional, Tuple, Union
-
-import pandas as pd
+import logging
+import re
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .parse import (
+    EPOCH,
+    MINUTE_US,
+    SECOND_US,
+    WORDS_FIELD,
+    EventParser,
+    GroupKey,
+    parse_timestamp,
+    to_epoch_us,
+)
+from .reader import Inputs, read_blocks, read_lines
+from .stats import MonotonicDeque, QuantileSketch, parse_stats, percentile
+
+# pandas is only imported by the pandas strategy, as it dominates the startup time
+if TYPE_CHECKING:
+    import pandas as pd
 
 JSONString = str
 Number = Union[float, int]
-TimeStamp = Union[datetime.datetime, pd.Timestamp]
+TimeStamp = Union[datetime.datetime, "pd.Timestamp"]
 TimeData = Tuple[TimeStamp, Number]
 JsonValidTimeData = Tuple[str, Number]
+# the date, followed by the values of the group key, and the moving average of a bin
+GroupedTimeData = Tuple
+# the epoch ticks of produced bins, and their moving averages
+Bins = Tuple[np.ndarray, np.ndarray]
+
+MINUTE = datetime.timedelta(minutes=1)
+
+logger = logging.getLogger(__name__)
+
+# `YYYY-MM-DD HH:` prefixes by epoch hour, and `MM:SS` suffixes by second of the hour
+HOUR_PREFIXES: Dict[int, str] = {}
+HOUR_CACHE_SIZE = 1 << 16
+MINUTES_SECONDS = [f"{m:02d}:{s:02d}" for m in range(60) for s in range(60)]
 
+TIMESTAMP_RE = re.compile(r'"timestamp":\s*"([^"]*)"')
+DURATION_RE = re.compile(r'"duration":\s*([-+.\deE]+)')
 
-def txt_to_csv(txt: str) -> pd.DataFrame:
+CHUNK_SIZE = 4 << 20  # 4MB of input per pandas chunk
+
+
+def txt_to_csv(txt: str) -> "pd.DataFrame":
     """Helper function to turn a txt file with a Json object at each line,
     to a pandas Dataframe.
 
@@ -22,14 +60,29 @@ def txt_to_csv(txt: str) -> pd.DataFrame:
     Returns:
         pd.DataFrame: A dataframe indexed on timestamp, with the duration of the events.
     """
-    data = []
-    for l in txt.split("\n"):
-        if l.strip():
-            datum = json.loads(l)
-            data.append((pd.Timestamp(datum["timestamp"]), datum["duration"]))
-    return pd.DataFrame(data=data, columns=["timestamp", "duration"]).set_index(
-        "timestamp"
-    )
+    return lines_to_frame(l for l in txt.split("\n") if l.strip())
+
+
+def lines_to_frame(lines: Iterable[str]) -> "pd.DataFrame":
+    """Helper function to turn lines with a Json object each, to a pandas Dataframe.
+
+    Args:
+        lines (Iterable[str]): The lines to be parsed.
+
+    Returns:
+        pd.DataFrame: A dataframe indexed on timestamp, with the duration of the events.
+    """
+    import pandas as pd
+
+    parse = EventParser()
+    timestamps: List[int] = []
+    durations: List[Number] = []
+    for l in lines:
+        us, dur = parse(l)
+        timestamps.append(us)
+        durations.append(dur)
+    index = pd.to_datetime(timestamps, unit="us").rename("timestamp")
+    return pd.DataFrame({"duration": durations}, index=index)
 
 
 def leftmostts(ts: datetime.datetime) -> datetime.datetime:
@@ -60,6 +113,75 @@ def rightmostts(ts: datetime.datetime) -> datetime.datetime:
     return leftmostts(ts) + datetime.timedelta(minutes=1)
 
 
+def to_epoch_minute(ts: TimeStamp) -> int:
+    """Converts a timestamp to the number of whole minutes since the unix epoch.
+
+    i.e. to_epoch_minute(1970-01-01 00:02:12.123123) = 2
+
+    Args:
+        ts (datetime.datetime | pd.Timestamp): A timestamp
+
+    Returns:
+        int: The epoch minute the timestamp falls in.
+    """
+    return (ts.replace(tzinfo=None) - EPOCH) // MINUTE
+
+
+def from_epoch_minute(minute: int) -> datetime.datetime:
+    """Inverse of `to_epoch_minute`, returns the timestamp at the start of the minute.
+
+    Args:
+        minute (int): Number of minutes since the unix epoch.
+
+    Returns:
+        datetime.datetime: The timestamp of the minute.
+    """
+    return EPOCH + minute * MINUTE
+
+
+def format_tick(tick: int, bin_us: int = MINUTE_US) -> str:
+    """Formats an epoch tick to the date at the start of its bin, the same as
+    `str(from_epoch_minute(tick))` for 1-min bins, without allocating a datetime.
+
+    The `YYYY-MM-DD HH:` prefix of each hour is cached, and the minutes and seconds
+    are looked up in a table.
+
+    Args:
+        tick (int): Number of bins since the unix epoch.
+        bin_us (int, optional): The width of a bin in microseconds, a whole number
+            of seconds. Defaults to 1 minute.
+
+    Returns:
+        str: The `YYYY-MM-DD HH:MM:SS` date of the bin.
+    """
+    hour, second = divmod(tick * bin_us // SECOND_US, 3600)
+    prefix = HOUR_PREFIXES.get(hour)
+    if prefix is None:
+        if len(HOUR_PREFIXES) >= HOUR_CACHE_SIZE:
+            HOUR_PREFIXES.clear()
+        prefix = EPOCH + datetime.timedelta(hours=hour)
+        prefix = HOUR_PREFIXES[hour] = prefix.strftime("%Y-%m-%d %H:")
+    return prefix + MINUTES_SECONDS[second]
+
+
+def format_ticks(ticks: np.ndarray, bin_us: int = MINUTE_US) -> List[str]:
+    """Formats epoch ticks to the dates at the start of their bins, as
+    `format_tick`, at once.
+
+    Args:
+        ticks (np.ndarray): Numbers of bins since the unix epoch.
+        bin_us (int, optional): The width of a bin in microseconds, a whole number
+            of seconds. Defaults to 1 minute.
+
+    Returns:
+        List[str]: The `YYYY-MM-DD HH:MM:SS` dates of the bins.
+    """
+    dates = np.datetime_as_string(
+        (np.asarray(ticks) * bin_us).astype("datetime64[us]"), unit="s"
+    )
+    return [date.replace("T", " ") for date in dates.tolist()]
+
+
 def produce_json(
     date: TimeStamp, duration: float
 ) -> JSONString:
@@ -115,45 +237,223 @@ def parse_json_line(line: JSONString) -> TimeData:
     return (datetime.datetime.fromisoformat((c["timestamp"])), c["duration"])
 
 
-def moving_window_pandas(df: pd.DataFrame, window_size: int = 10) -> pd.DataFrame:
-    """Calculate a moving average of a dataframe with given window size in minutes
+def moving_window_pandas(
+    df: "pd.DataFrame", window_size: int = 10, bin_us: int = MINUTE_US
+) -> "pd.DataFrame":
+    """Calculate a moving average of a dataframe with given window size in bins
 
     NOTE: According to the provided examples in the challenges README,
-    1 minute bins are assumed.
+    1 minute bins are assumed by default.
 
     Args:
         df (pd.DataFrame): A Dataframe that holds the metrics to be rolled over.
-        window_size (int, optional): The size of the rolling window in minutes. Defaults to 10.
+        window_size (int, optional): The size of the rolling window in bins. Defaults to 10.
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1 minute.
 
     Returns:
         pd.DataFrame: A dataframe with rolling averages of provided metrics.
     """
     # We use `label=right` to denote that we want the resampling operation to be
-    # resample the points to the left of the timestamp.
+    # resample the points to the left of the timestamp. Bins are aligned to the epoch,
+    # as the ticks of the other strategies.
+    import pandas as pd
+
+    width = pd.Timedelta(bin_us, unit="us")
     return (
-        df.resample("1T", label="right").mean().rolling(window=f"{window_size}T").mean()
+        df.resample(width, label="right", origin="epoch")
+        .mean()
+        .rolling(window=window_size * width)
+        .mean()
     )
 
 
-def strategy_pandas(input_file: Path, window_size: int) -> Iterable[JSONString]:
+def strategy_pandas(
+    input_file: Inputs,
+    window_size: int,
+    bin_us: int = MINUTE_US,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterable[JsonValidTimeData]:
     """Greedy algorithmic approach, for baseline measurements.
-    Uses in-memory pandas calculations to do a rolling average of a metric.
+    Uses pandas calculations to do a rolling average of a metric, as
+    `moving_window_pandas`, over chunks of the input.
+
+    Each chunk is parsed with vectorized regexes, resampled and rolled over after
+    the last `window_size` bins of the previous one, so the rolling means are
+    those of the whole input, up to float rounding. The events of the last bin of a chunk are carried
+    over to the next one, as it might hold more events of that bin. Memory is thus
+    bounded by the chunk size.
+
+    Downsides:
+    1. Is not an incremental algorithm, as each chunk is recomputed at once.
+    2. Events must be ordered by bin across chunks, as bins are produced once a
+    chunk is processed.
+
+    Args:
+        input_file (Inputs): The file, or time-sorted files, to read Json lines
+            from, plain or compressed, see `read_lines`.
+        window_size (int): The rolling window size in bins (minutes by default).
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1
+            minute.
+        chunk_size (int, optional): The bytes of input per chunk. Defaults to
+            CHUNK_SIZE.
+
+    Raises:
+        ValueError: If an event belongs to a bin of a previous chunk.
+
+    Yields:
+        JsonValidTimeData: A tuple with the date and moving average of a bin.
+    """
+    import pandas as pd
+
+    width = pd.Timedelta(bin_us, unit="us")
+    # the events of the open bin, and the bin means of the last window
+    held_us = np.empty(0, np.int64)
+    held_durations = np.empty(0)
+    tail = pd.Series([], dtype=np.float64, index=pd.DatetimeIndex([]))
+    blocks = read_blocks(input_file, block_size=chunk_size)
+    while True:
+        block = next(blocks, None)
+        if block is not None:
+            us, durations = txt_to_arrays(block, bin_us=1)
+            us = np.concatenate((held_us, us))
+            durations = np.concatenate((held_durations, durations))
+            if len(us) == 0:
+                continue
+            ticks = us // bin_us
+            if len(tail) and ticks.min() < tail.index[-1].value // 1000 // bin_us:
+                raise ValueError(
+                    f"Out of order observation at {format_tick(int(ticks.min()), bin_us)}"
+                )
+            held = ticks == ticks.max()
+            held_us, held_durations = us[held], durations[held]
+            us, durations = us[~held], durations[~held]
+        else:
+            us, durations = held_us, held_durations
+        if len(us):
+            index = pd.to_datetime(us, unit="us").rename("timestamp")
+            means = (
+                pd.Series(durations, index=index)
+                .resample(width, label="right", origin="epoch")
+                .mean()
+            )
+            # bins without events between chunks are produced as well
+            series = pd.concat([tail, means]).asfreq(width)
+            rolled = series.rolling(window=window_size * width).mean()[len(tail) :]
+            dates = np.datetime_as_string(rolled.index.values, unit="s")
+            for date, mean in zip(dates.tolist(), rolled.tolist()):
+                yield (date.replace("T", " "), mean)
+            tail = series[-window_size:]
+        if block is None:
+            return
+
+
+def has_offsets(timestamps: List[str]) -> bool:
+    """Whether some ISO 8601 timestamps may have a UTC offset, which numpy would
+    convert to UTC. Dates have 2 dashes, so any other one is of a negative offset.
+    """
+    joined = "".join(timestamps)
+    return "+" in joined or "Z" in joined or joined.count("-") != 2 * len(timestamps)
+
+
+def txt_to_arrays(txt: str, bin_us: int = MINUTE_US) -> Tuple[np.ndarray, np.ndarray]:
+    """Helper function to turn a txt file with a Json object at each line,
+    to numpy arrays of epoch ticks and durations.
+
+    Only the timestamp and duration fields are extracted, with a regex over the whole
+    text. If the fields can't be matched one to one, or to the lines, every line is
+    parsed as Json, so malformed lines raise rather than being skipped.
+    Timestamps are decoded by numpy, unless some have a UTC offset, which is then
+    dropped as by `EventParser`, see `parse_timestamp`.
+
+    Args:
+        txt (str): The read file contents
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1 minute.
+
+    Raises:
+        ValueError: If a line is not Json.
+        KeyError: If an event has no timestamp or duration.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: int64 epoch ticks and float64 durations.
+    """
+    timestamps = TIMESTAMP_RE.findall(txt)
+    durations = DURATION_RE.findall(txt)
+    lines = txt.count("\n") + (not txt.endswith("\n"))
+    if not len(timestamps) == len(durations) == lines:
+        data = [json.loads(l) for l in txt.split("\n") if l.strip()]
+        timestamps = [d["timestamp"] for d in data]
+        durations = [d["duration"] for d in data]
+    if has_offsets(timestamps):
+        epoch_us = np.array([parse_timestamp(ts) for ts in timestamps], np.int64)
+    else:
+        epoch_us = np.array(timestamps, dtype="datetime64[us]").astype(np.int64)
+    return epoch_us // bin_us, np.array(durations, dtype=np.float64)
+
+
+def moving_window_numpy(
+    ticks: np.ndarray, durations: np.ndarray, window_size: int = 10
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Calculate a moving average over events with a given window size in bins.
+
+    Per-bin sums and counts are aggregated over a dense tick axis, and the
+    rolling window is taken as the difference of their cumulative sums.
+    Produces the same bins as `BucketWindow`: a 0-valued bin for the tick of the
+    first event, and then every bin until the one after the last event.
+
+    Args:
+        ticks (np.ndarray): The epoch tick of each event.
+        durations (np.ndarray): The duration of each event.
+        window_size (int, optional): The size of the rolling window in bins. Defaults to 10.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The epoch tick of each bin, and its moving average.
+    """
+    first = ticks.min()
+    idx = ticks - first
+    sums = np.bincount(idx, weights=durations)
+    counts = np.bincount(idx)
+
+    # the bin labelled `t` holds the buckets within [t - window_size, t - 1]
+    csums = np.concatenate(([0.0], np.cumsum(sums)))
+    ccounts = np.concatenate(([0], np.cumsum(counts)))
+    t = np.arange(1, len(sums) + 1)
+    lo = np.maximum(t - window_size, 0)
+    wsums = csums[t] - csums[lo]
+    wcounts = ccounts[t] - ccounts[lo]
+    means = np.divide(wsums, wcounts, out=np.zeros_like(wsums), where=wcounts > 0)
+    return first + np.concatenate(([0], t)), np.concatenate(([0.0], means))
+
+
+def strategy_numpy(
+    input_file: Inputs, window_size: int, bin_us: int = MINUTE_US
+) -> Iterable[JsonValidTimeData]:
+    """Vectorized batch approach, for offline recomputation of large files.
+    Uses numpy arrays to aggregate events in per-bin buckets and roll the window.
 
     Downsides:
-    1. Needs to hold the whole file in-memory, so it is not suitable for big workloads.
-    2. Is not an incremental algorithm, thus we need to hold all values in a DataFrame.
+    1. Needs to hold all events in-memory, as the pandas strategy, although only
+    as two arrays.
+    2. Is not an incremental algorithm.
 
     Args:
-        input_file (Path): The file to read Json lines from.
-        window_size (int): The rolling window size in minutes.
+        input_file (Inputs): The file, or time-sorted files, to read Json lines
+            from, plain or compressed, see `read_lines`.
+        window_size (int): The rolling window size in bins (minutes by default).
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1
+            minute.
 
     Yields:
-        JSONString: A JSONString ready to be appended to a file.
+        JsonValidTimeData: A tuple with the date and moving average of a bin.
     """
-    df = txt_to_csv(open(input_file, "r").read())
-    df = moving_window_pandas(df, window_size=window_size)
-    for _, row in df.iterrows():
-        yield produce_json(row.name, row["duration"])
+    arrays = [txt_to_arrays(block, bin_us) for block in read_blocks(input_file)]
+    ticks = np.concatenate([t for t, _ in arrays] or [np.empty(0, np.int64)])
+    durations = np.concatenate([d for _, d in arrays] or [np.empty(0)])
+    if len(ticks) == 0:
+        return
+    bins, means = moving_window_numpy(ticks, durations, window_size=window_size)
+    dates = np.datetime_as_string((bins * bin_us).astype("datetime64[us]"), unit="s")
+    for date, mean in zip(dates.tolist(), means.tolist()):
+        yield (date.replace("T", " "), mean)
 
 
 class SlidingWindow:
@@ -253,7 +553,7 @@ class SlidingWindow:
                 its += datetime.timedelta(minutes=1)
 
                 # if our first value on the stack is out of bounds then pop it
-                if its - self.tss[0] > datetime.timedelta(minutes=10):
+                if its - self.tss[0] > datetime.timedelta(minutes=self.window):
                     # if window is bust, then we have to pop values from our stacks
                     self.pop()
         return results
@@ -268,21 +568,906 @@ class SlidingWindow:
         return [produce_timedata(rightmostts(self.last), self.mean(self.stack))]
 
 
-def strategy_sliding_window(input_file: Path, window_size: int) -> Iterable[JSONString]:
+class BucketWindow:
+    __slots__ = (
+        "window",
+        "size",
+        "bin_us",
+        "ticks",
+        "sums",
+        "counts",
+        "total",
+        "count",
+        "next_bin",
+    )
+
+    def __init__(self, window: int, bin_us: int = MINUTE_US):
+        """Constant-time implementation of the sliding window algorithm.
+
+        Time is handled as integer epoch ticks, the number of whole bins since the
+        unix epoch, and ticks are only formatted to dates when a bin is produced.
+        Instead of holding every observation within the window, observations are
+        aggregated into one (sum, count) bucket per tick. Buckets live in a ring
+        with room for `window + 1` ticks, and a running total of the closed buckets
+        within the window is kept, so consuming an event and producing a bin are both
+        O(1), and memory depends on the window size only.
+
+        With 1-min bins, produces the same bins as `SlidingWindow`, which is kept as
+        the reference implementation.
+
+        Args:
+            window (int): The size of the rolling window in bins.
+            bin_us (int, optional): The width of a bin in microseconds, a whole number
+                of seconds. Defaults to 1 minute.
+        """
+        self.window = window  # in bins
+        self.bin_us = bin_us
+        self.size = window + 1
+
+        # ring of per-tick buckets, indexed by `tick % size`
+        self.ticks: List[Optional[int]] = [None] * self.size
+        self.sums: List[Number] = [0] * self.size
+        self.counts: List[int] = [0] * self.size
+
+        # running totals of the closed buckets within the window
+        self.total: Number = 0
+        self.count = 0
+
+        # the next bin to be produced (epoch tick)
+        self.next_bin: Optional[int] = None
+
+    def mean(self) -> float:
+        """Calculates the mean of the values within the rolling-window.
+
+        Returns:
+            float: Mean value of the window.
+        """
+        if self.count == 0:
+            return 0.0
+        return float(self.total / self.count)
+
+    def bucket(self, tick: int) -> Tuple[Number, int]:
+        """Returns the (sum, count) bucket of a tick, if it is still in the ring.
+
+        Args:
+            tick (int): The epoch tick of the bucket.
+
+        Returns:
+            Tuple[Number, int]: The sum and count of observations within the bin.
+        """
+        slot = tick % self.size
+        if self.ticks[slot] != tick:
+            return 0, 0
+        return self.sums[slot], self.counts[slot]
+
+    def add(self, tick: int, total: Number, count: int = 1):
+        """Adds observations to the bucket of their tick.
+
+        Args:
+            tick (int): The epoch tick of the observations.
+            total (Number): The sum of the observed values.
+            count (int, optional): The number of observations. Defaults to 1.
+        """
+        slot = tick % self.size
+        if self.ticks[slot] != tick:
+            self.ticks[slot] = tick
+            self.sums[slot] = 0
+            self.counts[slot] = 0
+        self.sums[slot] += total
+        self.counts[slot] += count
+
+    def close(self, tick: int):
+        """Adds the bucket of a tick that will receive no more observations to the
+        running totals.
+
+        Args:
+            tick (int): The epoch tick to be closed.
+        """
+        total, count = self.bucket(tick)
+        self.total += total
+        self.count += count
+
+    def evict(self, tick: int):
+        """Removes the bucket of a tick that fell out of the rolling-window.
+
+        Args:
+            tick (int): The epoch tick to be evicted.
+        """
+        total, count = self.bucket(tick)
+        if count == 0:
+            return
+        self.total -= total
+        self.count -= count
+        slot = tick % self.size
+        self.ticks[slot] = None
+        self.sums[slot] = 0
+        self.counts[slot] = 0
+        # avoid accumulating floating point error once the window is empty
+        if self.count == 0:
+            self.total = 0
+
+    def advance(self, tick: int) -> List[JsonValidTimeData]:
+        """Produces the bins until the given tick, sliding the window one
+        bucket at a time.
+
+        Args:
+            tick (int): The epoch tick of the next observations.
+
+        Raises:
+            ValueError: If the tick was already produced.
+
+        Returns:
+            List[JsonValidTimeData]: The bins closed until the tick.
+        """
+        results: List[JsonValidTimeData] = []
+        if self.next_bin is None:
+            # the first observation has no samples before it, thus the value is 0
+            results.append(self.produce(tick))
+            self.next_bin = tick + 1
+        elif tick < self.next_bin - 1:
+            raise ValueError(
+                f"Out of order observation at {format_tick(tick, self.bin_us)}, bins "
+                f"were already produced until {format_tick(self.next_bin - 1, self.bin_us)}."
+            )
+
+        while self.next_bin <= tick:
+            self.close(self.next_bin - 1)
+            self.evict(self.next_bin - self.size)
+            results.append(self.produce(self.next_bin))
+            self.next_bin += 1
+        return results
+
+    def produce(self, tick: int) -> JsonValidTimeData:
+        """Produces the bin of a tick, from the current state of the window."""
+        return (format_tick(tick, self.bin_us), self.mean())
+
+    def consume_tick(self, tick: int, dur: Number) -> List[JsonValidTimeData]:
+        """Consumes an observation already converted to its epoch tick.
+
+        Args:
+            tick (int): The epoch tick of the observation.
+            dur (Number): The observed value.
+
+        Raises:
+            ValueError: If the observation belongs to a tick that was already produced.
+
+        Returns:
+            List[JsonValidTimeData]: The bins closed by this observation.
+        """
+        results = self.advance(tick)
+        self.add(tick, dur)
+        return results
+
+    def consume_bucket(
+        self, tick: int, total: Number, count: int
+    ) -> List[JsonValidTimeData]:
+        """Consumes observations already aggregated into a bucket of their tick.
+
+        Args:
+            tick (int): The epoch tick of the observations.
+            total (Number): The sum of the observed values.
+            count (int): The number of observations.
+
+        Raises:
+            ValueError: If the observations belong to a tick that was already produced.
+
+        Returns:
+            List[JsonValidTimeData]: The bins closed by these observations.
+        """
+        results = self.advance(tick)
+        self.add(tick, total, count)
+        return results
+
+    def consume_many(self, ticks: np.ndarray, durations: np.ndarray) -> Bins:
+        """Consumes a batch of observations already converted to their epoch ticks,
+        and returns the bins they closed as arrays, so dates are only formatted by
+        sinks that need them as text, see `format_ticks`.
+
+        Observations are summed per tick with `np.bincount`, in their order, after
+        the sum of the open bucket, so the bins are exactly those of consuming them
+        one by one with `consume_tick`.
+
+        Args:
+            ticks (np.ndarray): The epoch tick of each observation, in order.
+            durations (np.ndarray): The observed values.
+
+        Raises:
+            ValueError: If an observation belongs to a tick that was already produced,
+                before any is consumed.
+
+        Returns:
+            Bins: The int64 epoch ticks of the closed bins, and their float64 means.
+        """
+        ticks = np.asarray(ticks, dtype=np.int64)
+        durations = np.asarray(durations, dtype=np.float64)
+        if len(ticks) == 0:
+            return np.empty(0, np.int64), np.empty(0)
+        floor = int(ticks[0]) if self.next_bin is None else self.next_bin - 1
+        late = np.flatnonzero(ticks < np.maximum.accumulate(ticks))
+        if ticks[0] < floor or len(late):
+            tick = int(ticks[late[0]] if len(late) else ticks[0])
+            raise ValueError(
+                f"Out of order observation at {format_tick(tick, self.bin_us)}."
+            )
+
+        means: List[float] = []
+        start = floor
+        if self.next_bin is None:
+            means.append(0.0)
+            self.next_bin = start + 1
+        else:
+            start += 1
+        # the open bucket is summed first, as its observations were consumed first
+        open_total, open_count = self.bucket(floor)
+        idx = ticks - floor
+        if open_count:
+            idx = np.concatenate(([0], idx))
+            durations = np.concatenate(([open_total], durations))
+        sums = np.bincount(idx, weights=durations).tolist()
+        counts = np.bincount(idx).tolist()
+        if open_count:
+            counts[0] += open_count - 1
+
+        size = self.size
+        for i in np.flatnonzero(counts).tolist():
+            tick = floor + i
+            while self.next_bin <= tick:
+                self.close(self.next_bin - 1)
+                self.evict(self.next_bin - size)
+                means.append(self.mean())
+                self.next_bin += 1
+            slot = tick % size
+            self.ticks[slot] = tick
+            self.sums[slot] = sums[i]
+            self.counts[slot] = counts[i]
+        return np.arange(start, self.next_bin, dtype=np.int64), np.array(means)
+
+    def consume(self, c: TimeData) -> List[JsonValidTimeData]:
+        ts, dur = c
+        return self.consume_tick(to_epoch_us(ts) // self.bin_us, dur)
+
+    def flush(self) -> List[JsonValidTimeData]:
+        # Same as `SlidingWindow.flush`, produce the bin after the last observation,
+        # as if the window advanced one more bin, but without altering its state.
+        assert self.next_bin is not None
+        last_total, last_count = self.bucket(self.next_bin - 1)
+        expired_total, expired_count = self.bucket(self.next_bin - self.size)
+        total = self.total + last_total - expired_total
+        count = self.count + last_count - expired_count
+        mean = float(total / count) if count else 0.0
+        return [(format_tick(self.next_bin, self.bin_us), mean)]
+
+    def drain(self) -> List[JsonValidTimeData]:
+        """Produces the bins after the last observation, until the window is empty.
+
+        Returns:
+            List[JsonValidTimeData]: The bins until the first 0-valued one.
+        """
+        assert self.next_bin is not None
+        return self.advance(self.next_bin - 1 + self.size)
+
+
+class StatsWindow(BucketWindow):
+    __slots__ = (
+        "stats",
+        "qs",
+        "wsums",
+        "words",
+        "lows",
+        "highs",
+        "sketches",
+        "wtotal",
+        "wcount",
+        "low",
+        "high",
+        "sketch",
+    )
+
+    def __init__(self, window: int, stats: Sequence[str], bin_us: int = MINUTE_US):
+        """`BucketWindow` producing a set of statistics for each bin, instead of the
+        mean only, all updated incrementally.
+
+        Each per-bin bucket holds, besides the (sum, count) of its observations,
+        the state needed by the requested statistics only:
+        - `wmean`: the sums of `duration * nr_words` and of `nr_words`, rolled as the
+        sum and count;
+        - `min`, `max`: the extreme values of the bin, rolled with a monotonic
+        deque over the closed buckets;
+        - `pNN`: a quantile sketch of the bin, merged into (and subtracted from)
+        a sketch of the window, so no percentile is computed from raw values.
+
+        Bins hold the statistics in the requested order. Empty windows produce 0 for
+        every statistic, as for the mean.
+
+        Args:
+            window (int): The size of the rolling window in bins.
+            stats (Sequence[str]): The statistics, see `stats.parse_stats`.
+            bin_us (int, optional): The width of a bin in microseconds, a whole number
+                of seconds. Defaults to 1 minute.
+        """
+        super().__init__(window, bin_us)
+        self.stats = parse_stats(stats)
+        self.qs = [q for q in map(percentile, self.stats) if q is not None]
+
+        self.wsums: List[Number] = [0] * self.size
+        self.words: List[Number] = [0] * self.size
+        self.lows: List[Number] = [0] * self.size
+        self.highs: List[Number] = [0] * self.size
+        self.sketches: List[Dict[int, int]] = [{} for _ in range(self.size)]
+
+        # running state of the closed buckets within the window
+        self.wtotal: Number = 0
+        self.wcount: Number = 0
+        self.low = MonotonicDeque(maximum=False)
+        self.high = MonotonicDeque(maximum=True)
+        self.sketch = QuantileSketch()
+
+    def add(self, tick: int, total: Number, count: int = 1):
+        slot = tick % self.size
+        if self.ticks[slot] != tick:
+            self.wsums[slot] = 0
+            self.words[slot] = 0
+            self.sketches[slot] = {}
+        super().add(tick, total, count)
+
+    def close(self, tick: int):
+        super().close(tick)
+        slot = tick % self.size
+        if self.ticks[slot] != tick or self.counts[slot] == 0:
+            return
+        self.wtotal += self.wsums[slot]
+        self.wcount += self.words[slot]
+        self.low.push(tick, self.lows[slot])
+        self.high.push(tick, self.highs[slot])
+        if self.qs:
+            self.sketch.merge(self.sketches[slot])
+
+    def evict(self, tick: int):
+        self.low.evict(tick)
+        self.high.evict(tick)
+        slot = tick % self.size
+        if self.ticks[slot] == tick and self.counts[slot]:
+            self.wtotal -= self.wsums[slot]
+            self.wcount -= self.words[slot]
+            if self.qs:
+                self.sketch.merge(self.sketches[slot], sign=-1)
+        super().evict(tick)
+        if self.count == 0:
+            self.wtotal = 0
+            self.wcount = 0
+
+    def values(self) -> List[Number]:
+        """Calculates the statistics of the values within the rolling-window.
+
+        Returns:
+            List[Number]: The value of each statistic.
+        """
+        quantiles = iter(self.sketch.quantiles(self.qs) if self.qs else [])
+        results: List[Number] = []
+        for stat in self.stats:
+            if stat == "mean":
+                results.append(self.mean())
+            elif stat == "wmean":
+                results.append(float(self.wtotal / self.wcount) if self.wcount else 0.0)
+            elif stat == "count":
+                results.append(self.count)
+            elif stat == "min":
+                results.append(self.low.peek())
+            elif stat == "max":
+                results.append(self.high.peek())
+            else:
+                results.append(next(quantiles))
+        return results
+
+    def produce(self, tick: int) -> GroupedTimeData:
+        return (format_tick(tick, self.bin_us), *self.values())
+
+    def consume_tick(
+        self, tick: int, dur: Number, words: Number = 1
+    ) -> List[GroupedTimeData]:
+        """Consumes an observation already converted to its epoch tick.
+
+        Args:
+            tick (int): The epoch tick of the observation.
+            dur (Number): The observed value.
+            words (Number, optional): The weight of the value in `wmean`, its
+                `nr_words`. Defaults to 1.
+
+        Raises:
+            ValueError: If the observation belongs to a tick that was already produced.
+
+        Returns:
+            List[GroupedTimeData]: The bins closed by this observation.
+        """
+        results = self.advance(tick)
+        self.add(tick, dur)
+        slot = tick % self.size
+        if self.counts[slot] == 1:
+            self.lows[slot] = self.highs[slot] = dur
+        elif dur < self.lows[slot]:
+            self.lows[slot] = dur
+        elif dur > self.highs[slot]:
+            self.highs[slot] = dur
+        self.wsums[slot] += dur * words
+        self.words[slot] += words
+        if self.qs:
+            sketch = self.sketches[slot]
+            key = self.sketch.key(dur)
+            sketch[key] = sketch.get(key, 0) + 1
+        return results
+
+    def consume_bucket(
+        self, tick: int, total: Number, count: int
+    ) -> List[GroupedTimeData]:
+        # the low, high, weighted sums and sketches need the observations
+        raise ValueError("Buckets of observations are only supported for the mean.")
+
+    def flush(self) -> List[GroupedTimeData]:
+        # Same as `BucketWindow.flush`, on a copy of the window, as the state of
+        # the deques and sketch can't be derived without altering them.
+        assert self.next_bin is not None
+        return copy.deepcopy(self).advance(self.next_bin)
+
+
+class WatermarkWindow:
+    def __init__(
+        self,
+        window: int,
+        delay: int = 0,
+        lateness: int = 0,
+        bin_us: int = MINUTE_US,
+    ):
+        """`BucketWindow` tolerating out-of-order and late observations.
+
+        The watermark trails the latest observed tick by `delay` bins. Observations
+        after the watermark are held in a reorder buffer of per-tick (sum, count)
+        buckets, and released to the window in tick order as the watermark passes
+        them, so disorder within `delay` bins produces the same bins as ordered
+        input, only later.
+
+        Observations whose bins were already produced are late. Up to `lateness` bins
+        late, they are added to the window, and only the bins holding them, at most
+        `window` bins, are recomputed and produced again, from a history of the
+        released buckets. Later observations are counted in `dropped` and ignored.
+
+        Args:
+            window (int): The size of the rolling window in bins.
+            delay (int, optional): The bins the watermark trails the latest observation
+                by. Defaults to 0.
+            lateness (int, optional): The bins late observations are accepted for,
+                after the watermark. Defaults to 0.
+            bin_us (int, optional): The width of a bin in microseconds, a whole number
+                of seconds. Defaults to 1 minute.
+        """
+        self.inner = BucketWindow(window, bin_us)
+        self.delay = delay
+        self.lateness = lateness
+
+        # per-tick (sum, count) buckets, after the watermark
+        self.buffer: Dict[int, List[Number]] = {}
+        # per-tick (sum, count) buckets released to the window, from `history_start`
+        self.history: Dict[int, List[Number]] = {}
+        self.history_start: Optional[int] = None
+
+        self.max_tick: Optional[int] = None
+        # the first produced bin, and nothing is produced before it
+        self.first_bin: Optional[int] = None
+        self.late = 0
+        self.dropped = 0
+
+    @property
+    def next_bin(self) -> Optional[int]:
+        # as for `BucketWindow`, the tick after the latest observation
+        return None if self.max_tick is None else self.max_tick + 1
+
+    def remember(self, tick: int, total: Number, count: int):
+        """Adds observations to the history of released buckets."""
+        bucket = self.history.setdefault(tick, [0, 0])
+        bucket[0] += total
+        bucket[1] += count
+
+    def prune(self):
+        """Forgets the released buckets older than any bin late observations may
+        change."""
+        assert self.inner.next_bin is not None and self.history_start is not None
+        oldest = self.inner.next_bin - 1 - self.lateness - self.inner.window
+        while self.history_start < oldest:
+            self.history.pop(self.history_start, None)
+            self.history_start += 1
+
+    def release(self, until: int) -> List[JsonValidTimeData]:
+        """Feeds the buffered buckets until a tick to the window, in tick order,
+        and produces the bins until the tick.
+
+        Args:
+            until (int): The epoch tick of the watermark.
+
+        Returns:
+            List[JsonValidTimeData]: The bins closed until the tick.
+        """
+        results: List[JsonValidTimeData] = []
+        for tick in sorted(t for t in self.buffer if t <= until):
+            total, count = self.buffer.pop(tick)
+            if self.first_bin is None:
+                self.first_bin = tick
+                # late observations may still precede the first bin
+                self.history_start = tick - self.lateness - self.inner.window
+            results.extend(self.inner.consume_bucket(tick, total, count))
+            self.remember(tick, total, count)
+        if self.inner.next_bin is not None:
+            if until >= self.inner.next_bin:
+                results.extend(self.inner.advance(until))
+            self.prune()
+        return results
+
+    def amend(self, tick: int, dur: Number) -> List[JsonValidTimeData]:
+        """Adds a late observation to the window, and recomputes the produced bins
+        holding it.
+
+        Args:
+            tick (int): The epoch tick of the observation.
+            dur (Number): The observed value.
+
+        Returns:
+            List[JsonValidTimeData]: The recomputed bins.
+        """
+        inner = self.inner
+        assert inner.next_bin is not None and self.first_bin is not None
+        # the buckets within the window are closed, and part of its running totals
+        if tick >= inner.next_bin - inner.size:
+            inner.add(tick, dur)
+            inner.total += dur
+            inner.count += 1
+        self.remember(tick, dur, 1)
+
+        # the bins labelled `t` hold the buckets within [t - window, t - 1]
+        lo = max(tick + 1, self.first_bin)
+        hi = min(tick + inner.window, inner.next_bin - 1)
+        total: Number = 0
+        count = 0
+        for t in range(lo - inner.window, lo):
+            bucket = self.history.get(t)
+            if bucket is not None:
+                total += bucket[0]
+                count += bucket[1]
+        results: List[JsonValidTimeData] = []
+        for t in range(lo, hi + 1):
+            if t > lo:
+                for sign, bucket in (
+                    (1, self.history.get(t - 1)),
+                    (-1, self.history.get(t - 1 - inner.window)),
+                ):
+                    if bucket is not None:
+                        total += sign * bucket[0]
+                        count += sign * bucket[1]
+            mean = float(total / count) if count else 0.0
+            results.append((format_tick(t, inner.bin_us), mean))
+        return results
+
+    def consume_tick(self, tick: int, dur: Number) -> List[JsonValidTimeData]:
+        """Consumes an observation already converted to its epoch tick, in any order.
+
+        Args:
+            tick (int): The epoch tick of the observation.
+            dur (Number): The observed value.
+
+        Returns:
+            List[JsonValidTimeData]: The bins closed by the watermark, or recomputed
+                for a late observation.
+        """
+        next_bin = self.inner.next_bin
+        if next_bin is not None and tick < next_bin - 1:
+            if tick < next_bin - 1 - self.lateness:
+                self.dropped += 1
+                return []
+            self.late += 1
+            return self.amend(tick, dur)
+
+        bucket = self.buffer.setdefault(tick, [0, 0])
+        bucket[0] += dur
+        bucket[1] += 1
+        if self.max_tick is None or tick > self.max_tick:
+            self.max_tick = tick
+        elif tick > self.max_tick - self.delay:
+            return []
+        return self.release(self.max_tick - self.delay)
+
+    def flush(self) -> List[JsonValidTimeData]:
+        # Releases the reorder buffer, and then same as `BucketWindow.flush`.
+        assert self.max_tick is not None
+        return self.release(self.max_tick) + self.inner.flush()
+
+    def drain(self) -> List[JsonValidTimeData]:
+        """Releases the reorder buffer, see `BucketWindow.drain`."""
+        assert self.max_tick is not None
+        return self.release(self.max_tick) + self.inner.drain()
+
+
+# the per-group windows of `GroupedWindow`
+Window = Union[BucketWindow, WatermarkWindow]
+
+
+class GroupedWindow:
+    def __init__(
+        self,
+        window: int,
+        idle: Optional[int] = None,
+        stats: Optional[Sequence[str]] = None,
+        bin_us: int = MINUTE_US,
+        delay: int = 0,
+        lateness: int = 0,
+    ):
+        """Sliding windows over groups of observations, such as per client or
+        language pair, all computed in one pass.
+
+        Each group key maps to its own `BucketWindow`, created on the first
+        observation of the group. Groups without observations for `idle` bins,
+        as of the latest observation of any group, are drained and evicted, so memory
+        depends on the number of active groups, not on the number of observations.
+        A group observed again after its eviction starts over with a 0-valued bin,
+        as on its first observation, and the empty bins in between are skipped.
+
+        Args:
+            window (int): The size of the rolling window in bins.
+            idle (Optional[int], optional): The bins without observations before
+                a group is evicted. Defaults to `window + 1`, once its window is empty.
+            stats (Optional[Sequence[str]], optional): The statistics of each group,
+                with a `StatsWindow`, instead of the mean only. Defaults to None.
+            bin_us (int, optional): The width of a bin in microseconds, a whole number
+                of seconds. Defaults to 1 minute.
+            delay (int, optional): The reorder delay of each group, with a
+                `WatermarkWindow`. Defaults to 0.
+            lateness (int, optional): The allowed lateness of each group, with a
+                `WatermarkWindow`. Defaults to 0.
+
+        Raises:
+            ValueError: If both statistics and a delay or lateness are given.
+        """
+        if stats and (delay or lateness):
+            raise ValueError("Late observations are only supported for the mean.")
+        self.window = window  # in bins
+        self.bin_us = bin_us
+        self.delay = delay
+        self.lateness = lateness
+        self.idle = window + 1 if idle is None else idle
+        self.stats = parse_stats(stats) if stats else None
+
+        # windows by key, from the least to the most recently observed
+        self.windows: "OrderedDict[GroupKey, Window]" = OrderedDict()
+        # the latest observed tick
+        self.clock: Optional[int] = None
+
+    def rows(
+        self, key: GroupKey, bins: List[JsonValidTimeData]
+    ) -> List[GroupedTimeData]:
+        """Inserts the group key into the bins of a group."""
+        return [(date, *key, *values) for date, *values in bins]
+
+    def evict(self) -> List[GroupedTimeData]:
+        """Drains and removes the windows of the groups that became idle.
+
+        Returns:
+            List[GroupedTimeData]: The last bins of the evicted groups.
+        """
+        results: List[GroupedTimeData] = []
+        assert self.clock is not None
+        while self.windows:
+            key, window = next(iter(self.windows.items()))
+            assert window.next_bin is not None
+            if window.next_bin - 1 + self.idle >= self.clock:
+                break
+            del self.windows[key]
+            results.extend(self.rows(key, window.drain()))
+        return results
+
+    def open(self, key: GroupKey) -> Window:
+        """Creates the window of a group, on its first observation."""
+        window: Window
+        if self.stats:
+            window = StatsWindow(self.window, self.stats, self.bin_us)
+        elif self.delay or self.lateness:
+            window = WatermarkWindow(
+                self.window, self.delay, self.lateness, self.bin_us
+            )
+        else:
+            window = BucketWindow(self.window, self.bin_us)
+        self.windows[key] = window
+        return window
+
+    def consume_tick(
+        self, key: GroupKey, tick: int, dur: Number, words: Number = 1
+    ) -> List[GroupedTimeData]:
+        """Consumes an observation of a group, already converted to its epoch tick.
+
+        Args:
+            key (GroupKey): The values of the fields the observation is grouped by.
+            tick (int): The epoch tick of the observation.
+            dur (Number): The observed value.
+            words (Number, optional): The weight of the value in `wmean`, see
+                `StatsWindow`. Defaults to 1.
+
+        Raises:
+            ValueError: If the observation belongs to a tick that was already
+                produced for its group.
+
+        Returns:
+            List[GroupedTimeData]: The bins closed by this observation, in
+                its group and in the groups it made idle.
+        """
+        window = self.windows.get(key)
+        if window is None:
+            window = self.open(key)
+        else:
+            self.windows.move_to_end(key)
+        if self.stats:
+            bins = window.consume_tick(tick, dur, words)
+        else:
+            bins = window.consume_tick(tick, dur)
+        results = self.rows(key, bins)
+        if self.clock is None or tick > self.clock:
+            self.clock = tick
+            results.extend(self.evict())
+        return results
+
+    def consume_many(
+        self, key: GroupKey, ticks: np.ndarray, durations: np.ndarray
+    ) -> Tuple[Bins, List[GroupedTimeData]]:
+        """Consumes a batch of observations of a group, for the mean only, see
+        `BucketWindow.consume_many`.
+
+        Args:
+            key (GroupKey): The values of the fields the observations are grouped by.
+            ticks (np.ndarray): The epoch tick of each observation, in order.
+            durations (np.ndarray): The observed values.
+
+        Raises:
+            ValueError: If statistics or late observations are computed, or an
+                observation belongs to a tick that was already produced for its
+                group.
+
+        Returns:
+            Tuple[Bins, List[GroupedTimeData]]: The bins closed in the group, as
+                arrays, and the last bins of the groups it made idle.
+        """
+        if self.stats or self.delay or self.lateness:
+            raise ValueError("Batches are only supported for the mean, in order.")
+        window = self.windows.get(key)
+        if window is None:
+            window = self.open(key)
+        else:
+            self.windows.move_to_end(key)
+        assert isinstance(window, BucketWindow)
+        bins = window.consume_many(ticks, durations)
+        evicted: List[GroupedTimeData] = []
+        if len(ticks) and (self.clock is None or ticks[-1] > self.clock):
+            self.clock = int(ticks[-1])
+            evicted = self.evict()
+        return bins, evicted
+
+    def flush(self) -> List[GroupedTimeData]:
+        # Same as `BucketWindow.flush`, for every group still in memory.
+        results: List[GroupedTimeData] = []
+        for key, window in self.windows.items():
+            results.extend(self.rows(key, window.flush()))
+        return results
+
+
+def strategy_sliding_window(
+    input_file: Inputs,
+    window_size: int,
+    stats: Optional[Sequence[str]] = None,
+    bin_us: int = MINUTE_US,
+    delay: int = 0,
+    lateness: int = 0,
+) -> Iterable[JsonValidTimeData]:
     """Main routine for incremental calculation of moving-averages using a sliding window.
 
     Args:
-        input_file (Path): The file to read Json lines from.
-        window_size (int): The rolling window size in minutes.
+        input_file (Inputs): The file, or time-sorted files, to read Json lines
+            from, plain or compressed, see `read_lines`.
+        window_size (int): The rolling window size in bins (minutes by default).
+        stats (Optional[Sequence[str]], optional): The statistics of each bin, see
+            `StatsWindow`, instead of the mean only. Defaults to None.
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1
+            minute.
+        delay (int, optional): The reorder delay in bins, see `WatermarkWindow`.
+            Defaults to 0.
+        lateness (int, optional): The allowed lateness in bins, see
+            `WatermarkWindow`. Defaults to 0.
+
+    Raises:
+        ValueError: If both statistics and a delay or lateness are given.
 
     Yields:
-        JSONString: A JSONString ready to be appended to a file.
+        JsonValidTimeData: A tuple with the date and moving average of a bin, or
+            the date and each statistic. Bins recomputed for late events are
+            produced again.
     """
-    window = SlidingWindow(window_size)
-    fp = open(input_file, "r")
-    while (c := fp.readline()) != "":
-        d = parse_json_line(c)
-        for ts, dur in window.consume(d):
-            yield produce_json(ts, dur)
-    ts, dur = window.flush()[0]
-    yield produce_json(ts, dur)
+    parse = EventParser()
+    if stats and (delay or lateness):
+        raise ValueError("Late observations are only supported for the mean.")
+    if stats:
+        window = StatsWindow(window_size, stats, bin_us)
+        weighted = "wmean" in window.stats
+        for line in read_lines(input_file):
+            us, duration = parse(line)
+            words = parse.number(line, WORDS_FIELD) if weighted else 1
+            yield from window.consume_tick(us // bin_us, duration, words)
+        yield from window.flush()
+        return
+
+    if delay or lateness:
+        late = WatermarkWindow(window_size, delay, lateness, bin_us)
+        for line in read_lines(input_file):
+            us, duration = parse(line)
+            yield from late.consume_tick(us // bin_us, duration)
+        yield from late.flush()
+        if late.dropped:
+            logger.warning(
+                "Dropped %d events beyond the allowed lateness.", late.dropped
+            )
+        return
+
+    # blocks of lines are parsed and consumed at once, and only the closed bins
+    # are formatted
+    window = BucketWindow(window_size, bin_us)
+    for block in read_blocks(input_file):
+        ticks, durations = txt_to_arrays(block, bin_us)
+        bins, means = window.consume_many(ticks, durations)
+        yield from zip(format_ticks(bins, bin_us), means.tolist())
+    if window.next_bin is not None:
+        yield from window.flush()
+
+
+def strategy_grouped(
+    input_file: Inputs,
+    window_size: int,
+    group_by: Sequence[str],
+    idle: Optional[int] = None,
+    stats: Optional[Sequence[str]] = None,
+    bin_us: int = MINUTE_US,
+    delay: int = 0,
+    lateness: int = 0,
+) -> Iterable[GroupedTimeData]:
+    """Incremental calculation of moving-averages per group of events, such as per
+    client or language pair, with a sliding window per group.
+
+    Args:
+        input_file (Inputs): The file, or time-sorted files, to read Json lines
+            from, plain or compressed, see `read_lines`.
+        window_size (int): The rolling window size in bins (minutes by default).
+        group_by (Sequence[str]): The names of the fields events are grouped by.
+        idle (Optional[int], optional): The bins without events before a group
+            is evicted, see `GroupedWindow`. Defaults to None.
+        stats (Optional[Sequence[str]], optional): The statistics of each bin, see
+            `StatsWindow`, instead of the mean only. Defaults to None.
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1
+            minute.
+        delay (int, optional): The reorder delay in bins, see `WatermarkWindow`.
+            Defaults to 0.
+        lateness (int, optional): The allowed lateness in bins, see
+            `WatermarkWindow`. Defaults to 0.
+
+    Raises:
+        ValueError: If both statistics and a delay or lateness are given.
+
+    Yields:
+        GroupedTimeData: A tuple with the date, group key and moving average of a bin,
+            or each statistic.
+    """
+    window = GroupedWindow(
+        window_size,
+        idle=idle,
+        stats=stats,
+        bin_us=bin_us,
+        delay=delay,
+        lateness=lateness,
+    )
+    weighted = window.stats is not None and "wmean" in window.stats
+    parse = EventParser()
+    for line in read_lines(input_file):
+        us, duration = parse(line)
+        key = parse.fields(line, group_by)
+        words = parse.number(line, WORDS_FIELD) if weighted else 1
+        yield from window.consume_tick(key, us // bin_us, duration, words)
+    yield from window.flush()
@@ -1,14 +1,21 @@
-import asyncio
 from enum import Enum
+from functools import partial
 from pathlib import Path
 from time import time
-from typing import Dict, Tuple
+from typing import List, Optional
 
 import typer
-import websockets
 
-from .calc import strategy_pandas, strategy_sliding_window
-from .data import TranslationEvent
+from .generator import Profile, generate_events
+from .parse import MINUTE_US, parse_interval
+from .protocol import BATCH_SIZE, INFLIGHT
+from .reader import POLL, expand_inputs, is_compressed
+from .stats import parse_stats, stat_column
+from .strategies import load_strategy
+from .writer import Format, write_output
+
+# modules only used by some commands, or options, such as pandas, websockets or
+# pydantic, are imported by them, so the startup of `calculate` stays short
 
 app = typer.Typer()
 
@@ -16,27 +23,38 @@ app = typer.Typer()
 class Strategy(str, Enum):
     PANDAS = "pandas"
     ALGO = "algo"
+    NUMPY = "numpy"
     SERVICE = "service"
 
 
-STRATEGY_FN = {
-    Strategy.PANDAS: strategy_pandas,
-    Strategy.ALGO: strategy_sliding_window,
-}
-
-
 @app.command()
 def generate(
     output_file: Path,
     test_size: int = 1000,
+    profile: Profile = Profile.UNIFORM,
+    rate: float = 1.0,
+    seed: Optional[int] = None,
+    clients: int = 1,
+    languages: int = 3,
 ):
     """Generate a file with given size, of translation event data.
+
+    Use --profile to select the shape of the traffic, and --rate for the average
+    number of events per minute.\n
+    Use --clients and --languages to set the number of distinct clients and
+    languages.\n
+    Use --seed for reproducible files.\n
     """
     print(f"Generating an input file with size {test_size}")
-
-    with open(output_file, "w") as fp:
-        for d in TranslationEvent.generate(size=test_size):
-            fp.write(d.json() + "\n")
+    generate_events(
+        output_file,
+        test_size,
+        profile=profile,
+        rate=rate,
+        seed=seed,
+        clients=clients,
+        languages=languages,
+    )
 
 
 @app.command()
@@ -50,73 +68,257 @@ def generate_benchmark():
         ("dev/input_1M.txt", 1000000),
     ]:
         output_path = Path(output_file)
-        generate(output_path, test_size)
+        generate(output_path, test_size, seed=0)
 
 
 @app.command()
 def calculate(
-    input_file: Path,
+    input_files: List[Path],
     output_file: Path,
     window_size: int = 10,
-    strategy: Strategy = Strategy.PANDAS,
+    strategy: str = Strategy.PANDAS.value,
+    workers: int = 1,
+    output_format: Format = typer.Option(Format.JSONL, "--format"),
+    append: bool = False,
+    group_by: Optional[str] = None,
+    stats: Optional[str] = None,
+    window: Optional[str] = None,
+    bin_width: str = typer.Option("1m", "--bin"),
+    delay: Optional[str] = None,
+    lateness: Optional[str] = None,
+    profile: bool = False,
+    profile_output: Optional[Path] = None,
+    trace_malloc: int = 0,
+    follow: bool = False,
+    checkpoint: Optional[Path] = None,
+    poll: float = POLL,
 ):
-    """Calculate moving-averages over an input file.
+    """Calculate moving-averages over input files.
 
-    Use --strategy to select the method of calculating the statistic.\n
+    Input files can be compressed (.gz, .bz2 or .xz), and several time-sorted
+    files, or glob patterns such as `"events.log*"`, are merged by timestamp.\n
+    Use --strategy to select the method of calculating the statistic, pandas, algo
+    or numpy, or one registered by an installed package under the
+    `unbabel.strategies` entry point group.\n
     Use --test-size to increase the default sample size of the input file.\n
-    Alter --window-size to modify the moving-average in minutes.\n
+    Alter --window-size to modify the moving-average in minutes, or --window to set
+    it in any unit, such as `--window 90s` or `--window 2h`.\n
+    Use --bin to set the width of the bins, such as `--bin 10s` or `--bin 5m`.\n
+    Use --workers to split the calculation over multiple processes (algo only).\n
+    Use --format to select the output format, and --append to append to the output
+    file instead of overwriting it.\n
+    Use --group-by to calculate moving-averages per group of events, such as
+    `--group-by client_name,target_language` (algo only, in a single process).\n
+    Use --stats to calculate other statistics than the mean, such as
+    `--stats mean,p50,p95,p99,min,max,count,wmean` (algo only, in a single process),
+    where `wmean` is the mean weighted by `nr_words`.\n
+    Use --delay to reorder events up to a delay behind the latest one, such as
+    `--delay 2m`, and --lateness to recompute the bins of events up to that late
+    after the delay, produced again (algo only, in a single process, mean only).\n
+    Use --profile to report the time and calls of each stage, such as parsing or
+    window maintenance, --profile-output to dump cProfile stats to a file, and
+    --trace-malloc to report the top allocation sites, such as `--trace-malloc 10`.\n
+    Use --follow to tail a growing input file, as `tail -F`, appending the bins as
+    they close until interrupted, and resuming from a --checkpoint of the window
+    and offset, `OUTPUT_FILE.ckpt` by default (algo only, in a single process).\n
     """
     start = time()
-    strategy_fn = STRATEGY_FN[strategy]
-    fhandle = open(output_file, "a")
-    for d in strategy_fn(input_file, window_size=window_size):
-        fhandle.write(d + "\n")
+    try:
+        bin_us = parse_interval(bin_width)
+        window_us = parse_interval(window) if window else window_size * MINUTE_US
+        delay_us = parse_interval(delay) if delay else 0
+        lateness_us = parse_interval(lateness) if lateness else 0
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    if window_us % bin_us:
+        raise typer.BadParameter("The window must be a whole number of bins.")
+    try:
+        input_paths = expand_inputs(input_files)
+    except FileNotFoundError as e:
+        raise typer.BadParameter(str(e))
+    input_file = input_paths[0] if len(input_paths) == 1 else input_paths
+    if (workers > 1 or follow) and (len(input_paths) > 1 or is_compressed(input_file)):
+        raise typer.BadParameter("Only supported for a single uncompressed file.")
+    if delay_us % bin_us or lateness_us % bin_us:
+        raise typer.BadParameter(
+            "The delay and lateness must be whole numbers of bins."
+        )
+    try:
+        strategy_fn = load_strategy(strategy)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    groups = group_by.split(",") if group_by else []
+    try:
+        stat_names = parse_stats(stats.split(",")) if stats else []
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    late = {"delay": delay_us // bin_us, "lateness": lateness_us // bin_us}
+    if groups or stat_names or delay_us or lateness_us:
+        if strategy != Strategy.ALGO or workers > 1:
+            raise typer.BadParameter("Only supported with --strategy algo.")
+        if stat_names and (delay_us or lateness_us):
+            raise typer.BadParameter("Late events are only supported for the mean.")
+        from .calc import strategy_grouped, strategy_sliding_window
+
+        if groups:
+            strategy_fn = partial(
+                strategy_grouped, group_by=groups, stats=stat_names or None, **late
+            )
+        else:
+            strategy_fn = partial(strategy_sliding_window, stats=stat_names, **late)
+    if workers > 1:
+        if strategy != Strategy.ALGO:
+            raise typer.BadParameter("Only supported with --strategy algo.")
+        from .parallel import strategy_parallel
+
+        strategy_fn = partial(strategy_parallel, workers=workers)
+    if (append or follow) and output_format == Format.NPY:
+        raise typer.BadParameter("Can't append to a npy file.")
+    run = partial(
+        strategy_fn, input_file, window_size=window_us // bin_us, bin_us=bin_us
+    )
+    write = partial(
+        write_output,
+        fmt=output_format,
+        append=append,
+        columns=["date", *map(stat_column, stat_names or ["mean"])],
+        groups=groups,
+    )
+    if follow:
+        from .follow import follow as follow_log
+
+        if strategy != Strategy.ALGO or workers > 1:
+            raise typer.BadParameter("Only supported with --strategy algo.")
+        config = {
+            "window_size": window_us // bin_us,
+            "group_by": groups,
+            "stats": stat_names or None,
+            "bin_us": bin_us,
+            **late,
+        }
+        checkpoint = checkpoint or output_file.with_name(output_file.name + ".ckpt")
+        if not append and not checkpoint.exists():
+            output_file.write_text("")
+        try:
+            for rows in follow_log(input_file, checkpoint, config, poll):
+                if rows:
+                    write(rows, output_file, append=True)
+        except KeyboardInterrupt:
+            pass
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+    elif profile or profile_output or trace_malloc:
+        from .profile import profiled
+
+        with profiled(profile, profile_output, trace_malloc) as profiler:
+            bins = profiler.wrap_iter("strategy", run())
+            profiler.wrap("write", write)(bins, output_file)
+    else:
+        write(run(), output_file)
     print(f"Took {time() - start} seconds")
 
 
 @app.command()
-def benchmark():
-    """Benchmark the algorithms versus the various file sizes. Use generate-benchmark before-hand."""
-    results: Dict[Tuple[Strategy, str], float] = {}
-    for strat in [Strategy.PANDAS, Strategy.ALGO]:
-        for input_file in [
-            "dev/input.txt",
-            "dev/input_1K.txt",
-            "dev/input_10K.txt",
-            "dev/input_100K.txt",
-            "dev/input_1M.txt",
-        ]:
-            print(strat, input_file)
-            input_path = Path(input_file)
-            start = time()
-            strategy_fn = STRATEGY_FN[strat]
-            for _ in strategy_fn(input_path, window_size=10):
-                pass
-            total_time = time() - start
-            print(f"Took {total_time} seconds.")
-            results[(strat, input_file)] = total_time
-    print(results)
+def benchmark(
+    strategies: str = "pandas,algo,numpy",
+    window_sizes: str = "10",
+    densities: str = "0.1,1,10",
+    events: int = 100000,
+    repeat: int = 5,
+    warmup: int = 1,
+    data_dir: Path = Path("dev/bench"),
+    output_file: Path = Path("benchmark.json"),
+    compare: Optional[Path] = None,
+    threshold: float = 0.1,
+):
+    """Benchmark the strategies over a sweep of window sizes and event densities
+    (events per minute). Inputs are generated in --data-dir on the first run.
+
+    Use --compare to flag regressions of the median time above --threshold,
+    versus a previous report.\n
+    """
+    from . import bench
+
+    try:
+        strategy_fns = {s: load_strategy(s) for s in strategies.split(",")}
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    report = bench.run_suite(
+        strategy_fns,
+        window_sizes=[int(w) for w in window_sizes.split(",")],
+        densities=[float(d) for d in densities.split(",")],
+        events=events,
+        data_dir=data_dir,
+        repeat=repeat,
+        warmup=warmup,
+    )
+    bench.save_report(report, output_file)
+    print(f"Report written to {output_file}")
+    if compare is not None:
+        regressions = bench.compare(report, bench.load_report(compare), threshold)
+        for r in regressions:
+            print(f"Regression: {r['case']} is {r['ratio']:.2f}x slower")
+        if regressions:
+            raise typer.Exit(code=1)
 
 
 async def ingestws(
     test_size: int = 1000,
+    group_by: Optional[str] = None,
+    stats: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    inflight: int = INFLIGHT,
+    stream: str = "",
+    shards: int = 1,
+    port: int = 8000,
 ):
+    import websockets
+
+    from .data import TranslationEvent
+    from .protocol import batch_frames, send_pipelined, shard_of
+
     # window = SlidingWindow(window_size)
-    async with websockets.connect("ws://localhost:8000/ws") as websocket:
-        for i, d in enumerate(TranslationEvent.generate(size=test_size)):
-            print(f"{i} / {test_size}", end='\r')
-            await websocket.send(d.json())
-            _ = await websocket.recv()
+    params = {"group_by": group_by, "stats": stats, "protocol": 2, "stream": stream}
+    query = "&".join(f"{k}={v}" for k, v in params.items() if v)
+    # each shard of the service listens on its own port
+    port += shard_of(stream, shards)
+    uri = f"ws://localhost:{port}/ws" + (f"?{query}" if query else "")
+    events = (d.json() for d in TranslationEvent.generate(size=test_size))
+    async with websockets.connect(uri) as websocket:
+        count = await send_pipelined(
+            websocket, batch_frames(events, batch_size), inflight
+        )
+    print(f"{count} / {test_size}")
 
 
 @app.command()
 def ingest(
     test_size: int = 1000,
+    group_by: Optional[str] = None,
+    stats: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    inflight: int = INFLIGHT,
+    stream: str = "",
+    shards: int = 1,
+    port: int = 8000,
 ):
     """Generates random events, calculates statistics and ingests them to
     a Postgres database.
+
+    Use --group-by to have the service calculate statistics per group of events,
+    and --stats to select the statistics, as for `calculate`.\n
+    Use --batch-size to set the number of events per websocket frame, and
+    --inflight the number of frames sent before their acknowledgement.\n
+    Use --stream to send the events of a stream (or tenant) with windows of its own,
+    to the service shard listening on --port plus its shard, out of --shards.\n
     """
-    asyncio.get_event_loop().run_until_complete(ingestws(test_size))
+    if batch_size < 1 or inflight < 1:
+        raise typer.BadParameter("The batch size and frames in flight must be >= 1.")
+    import asyncio
+
+    asyncio.get_event_loop().run_until_complete(
+        ingestws(test_size, group_by, stats, batch_size, inflight, stream, shards, port)
+    )
 
 def main():
     app()
@@ -0,0 +1,261 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .calc import BucketWindow, GroupedWindow, StatsWindow, WatermarkWindow
+from .parse import MINUTE_US, WORDS_FIELD, EventParser
+from .reader import BLOCK_SIZE, POLL
+from .snapshot import dump_snapshot, read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# the device and inode of a file, which are kept when it is renamed
+FileId = Optional[tuple]
+
+
+def file_id(stat: os.stat_result) -> tuple:
+    return (stat.st_dev, stat.st_ino)
+
+
+class Follower:
+    def __init__(self, path: Path, block_size: int = BLOCK_SIZE):
+        """Tails a growing file, as `tail -F`, reading the complete lines appended
+        to it.
+
+        Rotations are followed by file identity: once the followed file is
+        renamed, or deleted, and read to its end, the new file at the same path is
+        read from its start. A file truncated in place (copytruncate) is read
+        again from its start.
+
+        Args:
+            path (Path): The followed file.
+            block_size (int, optional): The number of bytes per read. Defaults to
+                BLOCK_SIZE.
+        """
+        self.path = Path(path)
+        self.block_size = block_size
+        self.fp = None
+        self.file: FileId = None
+        # the byte offset after the last complete line read
+        self.offset = 0
+        self.rest = b""
+
+    @property
+    def position(self) -> Dict[str, Any]:
+        """Where the lines read so far end, to resume from, see `seek`."""
+        return {"file": self.file, "offset": self.offset}
+
+    def seek(self, position: Dict[str, Any]):
+        """Resumes after the lines read up to a position.
+
+        When the followed path holds another file, the file of the position is
+        looked up among its rotated siblings, e.g. `events.log.1`, and read to
+        its end first, otherwise the new file is read from its start.
+
+        Args:
+            position (Dict[str, Any]): The position, from `position`.
+        """
+        self.close()
+        try:
+            current = file_id(os.stat(self.path))
+        except FileNotFoundError:
+            current = None
+        path = self.path
+        offset = position["offset"]
+        if position["file"] != current:
+            path = self.rotated(position["file"])
+            if path is None:
+                logger.warning(
+                    "%s was rotated, and its previous file is gone: reading the "
+                    "new file from its start.",
+                    self.path,
+                )
+                path = self.path
+                offset = 0
+        self.open(path, offset)
+
+    def rotated(self, file: FileId) -> Optional[Path]:
+        """The sibling of the followed path holding a file, if any."""
+        for path in self.path.parent.glob(f"{self.path.name}?*"):
+            try:
+                if file_id(os.stat(path)) == file:
+                    return path
+            except FileNotFoundError:
+                continue
+        return None
+
+    def open(self, path: Path, offset: int = 0) -> bool:
+        try:
+            self.fp = open(path, "rb", buffering=0)
+        except FileNotFoundError:
+            self.fp = None
+            return False
+        stat = os.fstat(self.fp.fileno())
+        self.file = file_id(stat)
+        # a file smaller than the offset was truncated since
+        self.offset = offset if offset <= stat.st_size else 0
+        self.fp.seek(self.offset)
+        self.rest = b""
+        return True
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+    def read(self) -> List[str]:
+        """Reads the complete lines appended since the last read, up to a block.
+
+        Returns:
+            List[str]: The non-empty lines, none if the file didn't grow.
+        """
+        if self.fp is None and not self.open(self.path):
+            return []
+        block = self.fp.read(self.block_size)
+        if block:
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:
+                self.rest += block
+                return []
+            data = self.rest + block[:cut]
+            self.rest = block[cut:]
+            self.offset += len(data)
+            return [line for line in data.decode().split("\n") if line.strip()]
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # rotated, but not created again yet
+            return []
+        if file_id(stat) != self.file:
+            # the rotated file was written to its end, including its last line
+            lines = [self.rest.decode()] if self.rest.strip() else []
+            self.close()
+            self.open(self.path)
+            return lines
+        if stat.st_size < self.offset + len(self.rest):
+            logger.warning("%s was truncated: reading it from its start.", self.path)
+            self.fp.seek(0)
+            self.offset = 0
+            self.rest = b""
+        return []
+
+
+def new_window(
+    window_size: int,
+    group_by: Sequence[str] = (),
+    stats: Optional[Sequence[str]] = None,
+    bin_us: int = MINUTE_US,
+    delay: int = 0,
+    lateness: int = 0,
+):
+    """The window of `strategy_sliding_window`, or `strategy_grouped` if grouped."""
+    if group_by:
+        return GroupedWindow(
+            window_size, stats=stats, bin_us=bin_us, delay=delay, lateness=lateness
+        )
+    if stats:
+        if delay or lateness:
+            raise ValueError("Late observations are only supported for the mean.")
+        return StatsWindow(window_size, stats, bin_us)
+    if delay or lateness:
+        return WatermarkWindow(window_size, delay, lateness, bin_us)
+    return BucketWindow(window_size, bin_us)
+
+
+def line_consumer(
+    window, group_by: Sequence[str] = (), bin_us: int = MINUTE_US
+) -> Callable[[str], Iterable[Any]]:
+    """Parses lines and consumes them in a window from `new_window`.
+
+    Args:
+        window: The window.
+        group_by (Sequence[str], optional): The names of the fields events are
+            grouped by. Defaults to ().
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1
+            minute.
+
+    Returns:
+        Callable[[str], Iterable[Any]]: Consumes a line, returning the rows of the
+            bins it closed.
+    """
+    parse = EventParser()
+    stats = getattr(window, "stats", None)
+    weighted = stats is not None and "wmean" in stats
+
+    def consume(line: str) -> Iterable[Any]:
+        us, duration = parse(line)
+        words = parse.number(line, WORDS_FIELD) if weighted else 1
+        if group_by:
+            key = parse.fields(line, group_by)
+            return window.consume_tick(key, us // bin_us, duration, words)
+        if stats:
+            return window.consume_tick(us // bin_us, duration, words)
+        return window.consume_tick(us // bin_us, duration)
+
+    return consume
+
+
+def follow(
+    input_file: Path,
+    checkpoint_file: Path,
+    config: Dict[str, Any],
+    poll: float = POLL,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Iterator[List[Any]]:
+    """Tails a growing event log, see `Follower`, consuming its new lines in a
+    window restored from a checkpoint, so each run only reads the new events.
+
+    The rows of the bins closed by each read are yielded, and the window and the
+    byte offset are checkpointed once the caller resumes the generator, thus
+    after it has written them. A restarted run therefore resumes from the last
+    written bins, and at worst writes those of a read again.
+
+    Args:
+        input_file (Path): The followed file.
+        checkpoint_file (Path): The checkpoint, written atomically.
+        config (Dict[str, Any]): The arguments of `new_window`, which must be
+            those of the checkpoint, if any.
+        poll (float, optional): The seconds to wait for new lines. Defaults to
+            POLL.
+        sleep (Callable[[float], None], optional): Waits. Defaults to time.sleep.
+
+    Raises:
+        ValueError: If the checkpoint is of another configuration, or corrupted.
+
+    Yields:
+        List[Any]: The rows of the bins closed by a read, none if idle.
+    """
+    follower = Follower(input_file)
+    snapshot = read_snapshot(checkpoint_file)
+    if snapshot is None:
+        window = new_window(**config)
+    else:
+        (saved, window), position = snapshot
+        if saved != config:
+            raise ValueError(
+                f"The checkpoint {checkpoint_file} is of another configuration: "
+                f"{saved}."
+            )
+        follower.seek(position)
+    consume = line_consumer(
+        window, config.get("group_by", ()), config.get("bin_us", MINUTE_US)
+    )
+    try:
+        while True:
+            lines = follower.read()
+            if not lines:
+                yield []
+                sleep(poll)
+                continue
+            rows = []
+            for line in lines:
+                rows.extend(consume(line))
+            yield rows
+            write_snapshot(
+                checkpoint_file, dump_snapshot((config, window), follower.position)
+            )
+    finally:
+        follower.close()
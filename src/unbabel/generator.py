@@ -0,0 +1,261 @@
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
+
+# numpy is only imported to generate events, so the CLI starts without it
+if TYPE_CHECKING:
+    import numpy as np
+
+CHUNK_SIZE = 1_000_000
+START = "2018-12-26T18:11:08.509654"
+MINUTE_US = 60_000_000
+DAY_US = 24 * 60 * MINUTE_US
+
+# ISO 639-1 codes, the first `languages` are used
+LANGUAGES = [
+    "en",
+    "pt",
+    "fr",
+    "es",
+    "de",
+    "it",
+    "nl",
+    "pl",
+    "ru",
+    "tr",
+    "ar",
+    "zh",
+    "ja",
+    "ko",
+]
+LINE = (
+    '{"timestamp": "%s","translation_id": "%010x%010x",'
+    '"source_language": "%s","target_language": "%s",'
+    '"client_name": "%s","event_name": "translation_delivered",'
+    '"nr_words": %d, "duration": %d}\n'
+)
+
+
+class Profile(str, Enum):
+    UNIFORM = "uniform"
+    BURSTY = "bursty"
+    SAME_MINUTE = "same-minute"
+    GAPS = "gaps"
+    DIURNAL = "diurnal"
+
+
+def uniform_gaps(rng: "np.random.Generator", n: int, rate: float) -> "np.ndarray":
+    """Inter-arrival times of a constant rate (Poisson) process.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        n (int): The number of events.
+        rate (float): The average number of events per minute.
+
+    Returns:
+        np.ndarray: Inter-arrival times in microseconds.
+    """
+    import numpy as np
+
+    return rng.exponential(MINUTE_US / rate, n).astype(np.int64)
+
+
+def bursty_gaps(
+    rng: "np.random.Generator", n: int, rate: float, burst: int = 50
+) -> "np.ndarray":
+    """Inter-arrival times of bursts of events, 50 times denser than the average
+    rate, separated by quiet periods that keep the average rate.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        n (int): The number of events.
+        rate (float): The average number of events per minute.
+        burst (int, optional): The average number of events per burst. Defaults to 50.
+
+    Returns:
+        np.ndarray: Inter-arrival times in microseconds.
+    """
+    import numpy as np
+
+    mean = MINUTE_US / rate
+    inner = mean / burst
+    p = 1 / burst
+    outer = (mean - (1 - p) * inner) / p
+    starts = rng.random(n) < p
+    return rng.exponential(np.where(starts, outer, inner)).astype(np.int64)
+
+
+def same_minute_times(
+    rng: "np.random.Generator", n: int, rate: float, group: int = 1000
+) -> "np.ndarray":
+    """Arrival times of groups of events sharing the same minute, with groups spaced
+    to keep the average rate.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        n (int): The number of events.
+        rate (float): The average number of events per minute.
+        group (int, optional): The number of events per minute. Defaults to 1000.
+
+    Returns:
+        np.ndarray: Arrival times in microseconds, from the start of a minute.
+    """
+    import numpy as np
+
+    groups = -(-n // group)
+    minutes = np.arange(groups, dtype=np.int64) * max(round(group / rate), 1)
+    offsets = np.sort(rng.integers(0, MINUTE_US, (groups, group)), axis=1)
+    return (minutes[:, None] * MINUTE_US + offsets).ravel()[:n]
+
+
+def long_gaps(
+    rng: "np.random.Generator", n: int, rate: float, p: float = 0.001
+) -> "np.ndarray":
+    """Inter-arrival times of a constant rate process, with occasional gaps of 1 to 12
+    hours without events.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        n (int): The number of events.
+        rate (float): The average number of events per minute, outside of gaps.
+        p (float, optional): The probability of a gap after each event. Defaults to 0.001.
+
+    Returns:
+        np.ndarray: Inter-arrival times in microseconds.
+    """
+    gaps = uniform_gaps(rng, n, rate)
+    long = rng.random(n) < p
+    gaps[long] += rng.integers(60 * MINUTE_US, 12 * 60 * MINUTE_US, long.sum())
+    return gaps
+
+
+def diurnal_times(
+    rng: "np.random.Generator",
+    n: int,
+    rate: float,
+    offset: float,
+    amplitude: float = 0.9,
+) -> Tuple["np.ndarray", float]:
+    """Arrival times of a process whose rate follows a daily cycle,
+    `rate * (1 + amplitude * sin(2 pi t / day))`, by time-rescaling of a unit rate
+    process through the inverse of the cumulative rate.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        n (int): The number of events.
+        rate (float): The average number of events per minute.
+        offset (float): The cumulative rate at the start, to continue a previous chunk.
+        amplitude (float, optional): The relative amplitude of the cycle. Defaults to 0.9.
+
+    Returns:
+        Tuple[np.ndarray, float]: Arrival times in microseconds, and the cumulative
+            rate at the last arrival.
+    """
+    import numpy as np
+
+    u = offset + np.cumsum(rng.exponential(1.0, n))
+    r = rate / MINUTE_US
+
+    def cumulative(t: np.ndarray) -> "np.ndarray":
+        cycle = 1 - np.cos(2 * np.pi * t / DAY_US)
+        return r * (t + amplitude * DAY_US / (2 * np.pi) * cycle)
+
+    # the cumulative rate is within `r * amplitude * day / pi` of `r * t`, so the
+    # arrival times are bounded, and interpolated over a grid of 1 point per minute
+    lo = max(u[0] / r - amplitude * DAY_US / np.pi, 0)
+    hi = u[-1] / r
+    grid = np.linspace(lo, hi, int((hi - lo) / MINUTE_US) + 2)
+    return np.interp(u, cumulative(grid), grid).astype(np.int64), u[-1]
+
+
+def generate_lines(
+    size: int,
+    profile: Profile = Profile.UNIFORM,
+    rate: float = 1.0,
+    seed: Optional[int] = None,
+    clients: int = 1,
+    languages: int = 3,
+    start: str = START,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    """Generates translation event lines, in chunks built from vectorized random arrays.
+
+    Args:
+        size (int): The number of events.
+        profile (Profile, optional): The shape of the traffic. Defaults to Profile.UNIFORM.
+        rate (float, optional): The average number of events per minute. Defaults to 1.0.
+        seed (Optional[int], optional): The random seed. Defaults to None.
+        clients (int, optional): The number of distinct clients, picked with a
+            Zipf-like skew. Defaults to 1.
+        languages (int, optional): The number of distinct languages. Defaults to 3.
+        start (str, optional): The timestamp of the first event. Defaults to START.
+        chunk_size (int, optional): The number of events per chunk. Defaults to 1M.
+
+    Yields:
+        str: A chunk of event lines.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    langs = np.array(LANGUAGES[: max(2, min(languages, len(LANGUAGES)))])
+    names = np.array(["airliberty"] + [f"client-{i}" for i in range(1, clients)])
+    weights = 1 / np.arange(1, clients + 1)
+    weights /= weights.sum()
+
+    origin = np.datetime64(start, "us").astype(np.int64)
+    last = origin
+    cumulative = 0.0
+    for done in range(0, size, chunk_size):
+        n = min(chunk_size, size - done)
+        if profile == Profile.DIURNAL:
+            ts, cumulative = diurnal_times(rng, n, rate, cumulative)
+            ts += origin
+        elif profile == Profile.SAME_MINUTE:
+            # groups start at the minute after the last event
+            base = (last // MINUTE_US + (done > 0)) * MINUTE_US
+            ts = base + same_minute_times(rng, n, rate)
+        else:
+            gaps = {
+                Profile.UNIFORM: uniform_gaps,
+                Profile.BURSTY: bursty_gaps,
+                Profile.GAPS: long_gaps,
+            }[profile](rng, n, rate)
+            if done == 0:
+                gaps[0] = 0
+            ts = last + np.cumsum(gaps)
+        last = ts[-1]
+
+        source = rng.integers(0, len(langs), n)
+        target = (source + rng.integers(1, len(langs), n)) % len(langs)
+        lines: List[str] = list(
+            map(
+                LINE.__mod__,
+                zip(
+                    np.datetime_as_string(ts.astype("datetime64[us]")).tolist(),
+                    rng.integers(0, 1 << 40, n).tolist(),
+                    rng.integers(0, 1 << 40, n).tolist(),
+                    langs[source].tolist(),
+                    langs[target].tolist(),
+                    names[rng.choice(clients, n, p=weights)].tolist(),
+                    rng.integers(1, 500, n).tolist(),
+                    rng.integers(1, 101, n).tolist(),
+                ),
+            )
+        )
+        yield "".join(lines)
+
+
+def generate_events(output_file: Path, size: int, **kwargs) -> int:
+    """Writes generated translation events to a file, see `generate_lines`.
+
+    Args:
+        output_file (Path): The file to be written.
+        size (int): The number of events.
+
+    Returns:
+        int: The number of events written.
+    """
+    with open(output_file, "w") as fp:
+        for chunk in generate_lines(size, **kwargs):
+            fp.write(chunk)
+    return size
@@ -0,0 +1,137 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .calc import BucketWindow, JsonValidTimeData, Number, format_tick, txt_to_arrays
+from .parse import MINUTE_US
+from .reader import partition, read_blocks
+
+# (tick, sum, count) aggregates of consecutive bins
+Buckets = List[List[Number]]
+# the epoch tick and values of the leading observations of a range, that might
+# belong to the same bucket as the last observations of the previous range
+Head = Tuple[Optional[int], List[Number]]
+
+
+def aggregate_range(
+    input_file: Path, start: int, end: int, bin_us: int = MINUTE_US
+) -> Tuple[Head, Buckets]:
+    """Aggregates the observations within a byte range of a file into per-bin
+    (sum, count) partial aggregates.
+
+    The observations of the first bin of the range are kept as they are, so they
+    can be summed in order after the bucket of the previous range, and the merged
+    sums are exactly the ones of a single pass over the file. The range is parsed
+    in blocks with `txt_to_arrays`, and the following bins are summed with
+    `np.bincount`, in order, as `BucketWindow.consume_many`.
+
+    Args:
+        input_file (Path): The file to read Json lines from.
+        start (int): The byte offset of the range start.
+        end (int): The byte offset of the range end.
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1
+            minute.
+
+    Raises:
+        ValueError: If observations are not ordered by bin.
+
+    Returns:
+        Tuple[Head, Buckets]: The leading observations and the following buckets.
+    """
+    arrays = [
+        txt_to_arrays(block, bin_us)
+        for block in read_blocks(input_file, start=start, end=end)
+    ]
+    ticks = np.concatenate([t for t, _ in arrays] or [np.empty(0, np.int64)])
+    durations = np.concatenate([d for _, d in arrays] or [np.empty(0)])
+    if len(ticks) == 0:
+        return (None, []), []
+    late = np.flatnonzero(np.diff(ticks) < 0)
+    if len(late):
+        tick = int(ticks[late[0] + 1])
+        raise ValueError(f"Out of order observation at {format_tick(tick, bin_us)}")
+
+    # the bin of each observation, counted from the first one
+    bins = np.concatenate(([0], np.cumsum(np.diff(ticks) != 0)))
+    split = int(np.searchsorted(bins, 1))
+    head = durations[:split].tolist()
+    bins = bins[split:] - 1
+    sums = np.bincount(bins, weights=durations[split:]).tolist()
+    counts = np.bincount(bins).tolist()
+    starts = ticks[split:][np.flatnonzero(np.diff(bins, prepend=-1))].tolist()
+    buckets: Buckets = [list(bucket) for bucket in zip(starts, sums, counts)]
+    return (int(ticks[0]), head), buckets
+
+
+def merge_partials(
+    partials: Iterable[Tuple[Head, Buckets]], bin_us: int = MINUTE_US
+) -> Buckets:
+    """Merges the partial aggregates of consecutive byte ranges.
+
+    Args:
+        partials (Iterable[Tuple[Head, Buckets]]): The partial aggregates of each range,
+            in file order.
+        bin_us (int, optional): The width of a bin in microseconds, for errors.
+            Defaults to 1 minute.
+
+    Raises:
+        ValueError: If observations are not ordered by bin across ranges.
+
+    Returns:
+        Buckets: The (tick, sum, count) aggregates of the whole file.
+    """
+    merged: Buckets = []
+    for (head_tick, head), buckets in partials:
+        if head_tick is None:
+            continue
+        if not merged or merged[-1][0] != head_tick:
+            if merged and head_tick < merged[-1][0]:
+                raise ValueError(
+                    f"Out of order observation at {format_tick(head_tick, bin_us)}"
+                )
+            merged.append([head_tick, 0, 0])
+        for dur in head:
+            merged[-1][1] += dur
+            merged[-1][2] += 1
+        merged.extend(buckets)
+    return merged
+
+
+def strategy_parallel(
+    input_file: Path, window_size: int, workers: int, bin_us: int = MINUTE_US
+) -> Iterable[JsonValidTimeData]:
+    """Sliding window calculation of moving-averages, split over multiple processes.
+
+    The file is split into byte ranges aligned to lines, each process aggregates its
+    range into per-bin buckets, and the window is rolled once over the merged
+    buckets. Produces the same output as `strategy_sliding_window`.
+
+    Args:
+        input_file (Path): The file to read Json lines from.
+        window_size (int): The rolling window size in bins (minutes by default).
+        workers (int): The number of processes.
+        bin_us (int, optional): The width of a bin in microseconds. Defaults to 1
+            minute.
+
+    Yields:
+        JsonValidTimeData: A tuple with the date and moving average of a bin.
+    """
+    ranges = partition(input_file, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = pool.map(
+            aggregate_range,
+            [input_file] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+            [bin_us] * len(ranges),
+        )
+        buckets = merge_partials(partials, bin_us)
+    if not buckets:
+        return
+
+    window = BucketWindow(window_size, bin_us)
+    for tick, total, count in buckets:
+        yield from window.consume_bucket(tick, total, count)
+    yield from window.flush()
@@ -0,0 +1,279 @@
+import datetime
+import json
+import re
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+Number = Union[float, int]
+EpochData = Tuple[int, Number]
+GroupKey = Tuple[str, ...]
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MINUTE_US = 60_000_000
+SECOND_US = 1_000_000
+
+SECONDS_US = {f":{s:02d}": s * SECOND_US for s in range(60)}
+
+INTERVAL_RE = re.compile(r"(\d+)\s*([smhd])")
+INTERVAL_US = {
+    "s": SECOND_US,
+    "m": MINUTE_US,
+    "h": 60 * MINUTE_US,
+    "d": 1440 * MINUTE_US,
+}
+
+TIMESTAMP_KEY = '"timestamp"'
+DURATION_KEY = '"duration"'
+WORDS_FIELD = "nr_words"
+DURATION_CACHE_SIZE = 1024
+
+
+def to_epoch_us(ts: datetime.datetime) -> int:
+    """Converts a timestamp to the number of microseconds since the unix epoch.
+
+    Args:
+        ts (datetime.datetime): A timestamp
+
+    Returns:
+        int: Microseconds since the unix epoch.
+    """
+    return (ts.replace(tzinfo=None) - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def parse_timestamp(ts: str) -> int:
+    """Decodes an ISO 8601 timestamp to epoch microseconds. The UTC offset of a
+    timestamp with one is dropped, as bins are of the local times of the events.
+
+    Args:
+        ts (str): The timestamp string, such as `2018-12-26 18:11:08.509654+01:00`.
+
+    Raises:
+        ValueError: If the timestamp is not recognized.
+
+    Returns:
+        int: Microseconds since the unix epoch.
+    """
+    return to_epoch_us(datetime.datetime.fromisoformat(ts))
+
+
+def parse_interval(text: str) -> int:
+    """Parses an interval such as `10s`, `1m`, `5m`, `2h` or `1d` to microseconds.
+
+    Args:
+        text (str): A positive whole number of seconds, minutes, hours or days.
+
+    Raises:
+        ValueError: If the interval is not recognized.
+
+    Returns:
+        int: The interval in microseconds.
+    """
+    match = INTERVAL_RE.fullmatch(text.strip())
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(
+            f"Invalid interval {text!r}, expected a number of seconds, minutes, hours "
+            "or days, such as 10s, 1m or 2h."
+        )
+    return int(match.group(1)) * INTERVAL_US[match.group(2)]
+
+
+def parse_json_event(line: str) -> EpochData:
+    """Parses an event line with a full Json decode. Used as the fallback of
+    `EventParser`, for lines it doesn't recognize.
+
+    Args:
+        line (str): A string value that holds a json-valid object.
+
+    Returns:
+        EpochData: A tuple with the epoch microseconds and duration of the event.
+    """
+    c = json.loads(line)
+    return (parse_timestamp(c["timestamp"]), c["duration"])
+
+
+def parse_json_fields(line: str, names: Sequence[str]) -> GroupKey:
+    """Extracts fields of an event line with a full Json decode. Used as the fallback
+    of `EventParser.fields`.
+
+    Args:
+        line (str): A string value that holds a json-valid object.
+        names (Sequence[str]): The names of the fields.
+
+    Returns:
+        GroupKey: The values of the fields as strings, empty for missing fields.
+    """
+    c = json.loads(line)
+    return tuple(str(c.get(name, "")) for name in names)
+
+
+def parse_json_number(line: str, name: str) -> Number:
+    """Extracts a number field of an event line with a full Json decode. Used as the
+    fallback of `EventParser.number`.
+
+    Args:
+        line (str): A string value that holds a json-valid object.
+        name (str): The name of the field.
+
+    Returns:
+        Number: The value of the field, 0 if it is missing.
+    """
+    return json.loads(line).get(name, 0)
+
+
+class EventParser:
+    def __init__(self):
+        """Fast-path parser for translation event lines.
+
+        Only the `timestamp` and `duration` fields are extracted, with string searches
+        instead of a full Json decode. Consecutive events mostly share the same
+        minute, so the `YYYY-MM-DD HH:MM` prefix of the last timestamp is cached, and
+        only the seconds are decoded for each event. Durations are mostly a handful of
+        distinct values, so their decoded values are cached as well.
+
+        Lines that don't look like the expected format fall back to `parse_json_event`.
+        """
+        self.prefix: Optional[str] = None
+        self.prefix_us = 0
+        self.durations: Dict[str, Number] = {}
+        self.fallbacks = 0
+
+    def timestamp(self, ts: str) -> Optional[int]:
+        """Decodes a `YYYY-MM-DD HH:MM:SS[.ffffff]` timestamp to epoch microseconds.
+
+        Args:
+            ts (str): The timestamp string.
+
+        Returns:
+            Optional[int]: Epoch microseconds, or None if the format is not recognized.
+        """
+        prefix = ts[:16]
+        if prefix != self.prefix:
+            if len(prefix) != 16:
+                return None
+            try:
+                minute = datetime.datetime.fromisoformat(prefix)
+            except ValueError:
+                return None
+            self.prefix = prefix
+            self.prefix_us = to_epoch_us(minute)
+
+        seconds = SECONDS_US.get(ts[16:19])
+        if seconds is None:
+            return None
+        fraction = ts[20:]
+        if not fraction:
+            return self.prefix_us + seconds if len(ts) == 19 else None
+        if ts[19] != "." or len(fraction) > 6 or not fraction.isdigit():
+            return None
+        return self.prefix_us + seconds + int(fraction.ljust(6, "0"))
+
+    def duration(self, tail: str) -> Optional[Number]:
+        """Decodes the duration field of an event line, and caches its value when
+        it is the last field of the line, as the tail of the line then repeats.
+
+        Args:
+            tail (str): The event line after the duration key.
+
+        Returns:
+            Optional[Number]: The duration, or None if the field is not found.
+        """
+        start = tail.find(":") + 1
+        if start == 0:
+            return None
+        end = tail.find(",", start)
+        if end == -1:
+            end = tail.find("}", start)
+        raw = tail[start:end]
+        try:
+            value = int(raw)
+        except ValueError:
+            try:
+                value = float(raw)
+            except ValueError:
+                return None
+        if len(self.durations) < DURATION_CACHE_SIZE and len(tail) < 32:
+            self.durations[tail] = value
+        return value
+
+    def __call__(self, line: str) -> EpochData:
+        """Parses an event line into its epoch microseconds and duration.
+
+        Args:
+            line (str): A string value that holds a json-valid object.
+
+        Returns:
+            EpochData: A tuple with the epoch microseconds and duration of the event.
+        """
+        start = line.find(TIMESTAMP_KEY)
+        if start != -1:
+            start = line.find('"', start + len(TIMESTAMP_KEY)) + 1
+            ts = line[start : line.find('"', start)]
+            # fast path, for full precision timestamps within the cached minute
+            seconds = SECONDS_US.get(ts[16:19])
+            if ts[:16] == self.prefix and seconds is not None and len(ts) == 26:
+                fraction = ts[20:]
+                us = (
+                    self.prefix_us + seconds + int(fraction)
+                    if ts[19] == "." and fraction.isdigit()
+                    else None
+                )
+            else:
+                us = self.timestamp(ts)
+
+            tail = line.rpartition(DURATION_KEY)[2]
+            dur = self.durations.get(tail)
+            if dur is None:
+                dur = self.duration(tail)
+            if us is not None and dur is not None:
+                return (us, dur)
+        self.fallbacks += 1
+        return parse_json_event(line)
+
+    def fields(self, line: str, names: Sequence[str]) -> GroupKey:
+        """Extracts string fields of an event line, such as the ones events are
+        grouped by, with the same string searches as the timestamp.
+
+        Lines with missing, non-string or escaped values fall back to
+        `parse_json_fields`.
+
+        Args:
+            line (str): A string value that holds a json-valid object.
+            names (Sequence[str]): The names of the fields.
+
+        Returns:
+            GroupKey: The values of the fields as strings.
+        """
+        values = []
+        for name in names:
+            key = f'"{name}"'
+            start = line.find(key)
+            if start != -1:
+                start += len(key)
+                quote = line.find('"', start)
+                if line[start:quote].strip() == ":":
+                    value = line[quote + 1 : line.find('"', quote + 1)]
+                    if "\\" not in value:
+                        values.append(value)
+                        continue
+            self.fallbacks += 1
+            return parse_json_fields(line, names)
+        return tuple(values)
+
+    def number(self, line: str, name: str) -> Number:
+        """Extracts a number field of an event line, such as `nr_words`.
+
+        Lines with a missing or non-number value fall back to `parse_json_number`.
+
+        Args:
+            line (str): A string value that holds a json-valid object.
+            name (str): The name of the field.
+
+        Returns:
+            Number: The value of the field.
+        """
+        start = line.find(f'"{name}"')
+        if start != -1:
+            value = self.duration(line[start + len(name) + 2 :])
+            if value is not None:
+                return value
+        self.fallbacks += 1
+        return parse_json_number(line, name)
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+POOL_MIN = 1
+POOL_MAX = 8
+TIMEOUT = 30.0  # in seconds
+
+
+class PoolRunner:
+    def __init__(
+        self, pool, workers: int = POOL_MAX, timeout: Optional[float] = TIMEOUT
+    ):
+        """Runs blocking database work on a dedicated thread pool, with connections
+        of a shared connection pool, so the event loop never waits on the database.
+
+        There are as many threads as connections, thus a thread always gets a
+        connection, and calls beyond them wait in the executor queue.
+
+        Args:
+            pool: A connection pool with `getconn`, `putconn` and `closeall`, such as
+                psycopg2's `ThreadedConnectionPool`.
+            workers (int, optional): The number of threads, the size of the pool.
+                Defaults to POOL_MAX.
+            timeout (Optional[float], optional): The seconds a call may wait and run
+                before it fails, or None. Defaults to TIMEOUT.
+        """
+        self.pool = pool
+        self.workers = workers
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="db")
+        self.lock = threading.Lock()
+
+        self.queued = 0
+        self.in_use = 0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.busy_time = 0.0
+
+    def run_sync(
+        self, fn: Callable[..., T], *args, queued_at: Optional[float] = None
+    ) -> T:
+        """Calls `fn(conn, *args)` with a connection of the pool, in this thread.
+
+        The transaction is rolled back if the call fails, and the connection
+        returned to the pool.
+
+        Args:
+            fn (Callable[..., T]): The database work, taking a connection first.
+            queued_at (Optional[float], optional): When the call was submitted, for
+                the wait time statistics. Defaults to None.
+
+        Returns:
+            T: The result of the call.
+        """
+        start = perf_counter()
+        with self.lock:
+            self.calls += 1
+            if queued_at is not None:
+                self.queued -= 1
+                wait = start - queued_at
+                self.wait_time += wait
+                self.max_wait_time = max(self.max_wait_time, wait)
+        try:
+            conn = self.pool.getconn()
+        except Exception:
+            with self.lock:
+                self.errors += 1
+            raise
+        with self.lock:
+            self.in_use += 1
+        try:
+            return fn(conn, *args)
+        except Exception:
+            with self.lock:
+                self.errors += 1
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+            with self.lock:
+                self.in_use -= 1
+                self.busy_time += perf_counter() - start
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Calls `fn(conn, *args)` with a connection of the pool, on the executor.
+
+        Args:
+            fn (Callable[..., T]): The database work, taking a connection first.
+
+        Raises:
+            asyncio.TimeoutError: If the call didn't complete within the timeout.
+                It still completes in its thread, as threads can't be interrupted.
+
+        Returns:
+            T: The result of the call.
+        """
+        with self.lock:
+            self.queued += 1
+        future = self.executor.submit(
+            self.run_sync, fn, *args, queued_at=perf_counter()
+        )
+        future.add_done_callback(self.dequeue_cancelled)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            raise
+
+    def dequeue_cancelled(self, future: Future):
+        # a call cancelled while queued, on a timeout, never runs `run_sync`, which
+        # otherwise counts it out of the queue
+        if future.cancelled():
+            with self.lock:
+                self.queued -= 1
+
+    def stats(self) -> Dict[str, float]:
+        """The current state of the pool, and totals since it was created."""
+        with self.lock:
+            return {
+                "size": self.workers,
+                "in_use": self.in_use,
+                "queued": self.queued,
+                "calls": self.calls,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+                "busy_time": self.busy_time,
+            }
+
+    def close(self):
+        """Waits for the submitted calls, and closes every connection."""
+        self.executor.shutdown(wait=True)
+        self.pool.closeall()
@@ -0,0 +1,218 @@
+import cProfile
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import calc, writer
+from .calc import BucketWindow, GroupedWindow, StatsWindow, WatermarkWindow
+from .parse import EventParser
+
+# the functions timed by `calculate --profile`: owner, attribute, stage, and
+# whether they return an iterator, whose items are timed instead
+Target = Tuple[Any, str, str, bool]
+STAGES: List[Target] = [
+    (calc, "read_lines", "read", True),
+    (calc, "read_blocks", "read", True),
+    (EventParser, "__call__", "parse", False),
+    (EventParser, "fields", "parse", False),
+    (EventParser, "number", "parse", False),
+    (calc, "txt_to_arrays", "parse", False),
+    (BucketWindow, "consume_tick", "window", False),
+    (BucketWindow, "consume_many", "window", False),
+    (StatsWindow, "consume_tick", "window", False),
+    (WatermarkWindow, "consume_tick", "window", False),
+    (GroupedWindow, "consume_tick", "window", False),
+    (calc, "format_ticks", "serialize", False),
+    (writer, "format_jsonl", "serialize", False),
+    (writer, "format_csv", "serialize", False),
+]
+
+
+class StageProfiler:
+    def __init__(self, clock: Callable[[], float] = perf_counter):
+        """Measures the wall time and calls of the stages of a pipeline, such as
+        parsing, window maintenance or serialization.
+
+        Stages are timed by wrapping their functions, only while profiling, so
+        there is no cost otherwise. The time of a stage excludes the stages it
+        calls, thus the stages add up to the total time.
+
+        Args:
+            clock (Callable[[], float], optional): The time in seconds. Defaults to
+                time.perf_counter.
+        """
+        self.clock = clock
+        self.totals: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        # the time spent in nested stages, for each running stage
+        self.stack: List[float] = []
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        """Times the calls of a function as a stage.
+
+        Args:
+            stage (str): The stage name.
+            fn (Callable): The function.
+
+        Returns:
+            Callable: The timed function.
+        """
+        clock = self.clock
+        stack = self.stack
+        totals = self.totals
+        calls = self.calls
+
+        def timed(*args, **kwargs):
+            stack.append(0.0)
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                totals[stage] += elapsed - stack.pop()
+                calls[stage] += 1
+                if stack:
+                    stack[-1] += elapsed
+
+        return timed
+
+    def wrap_iter(self, stage: str, items: Iterable) -> Iterator:
+        """Times the production of each item of an iterator as a stage.
+
+        Args:
+            stage (str): The stage name.
+            items (Iterable): The items, e.g. of a generator.
+
+        Yields:
+            Any: The items.
+        """
+        next_item = self.wrap(stage, iter(items).__next__)
+        while True:
+            try:
+                item = next_item()
+            except StopIteration:
+                return
+            yield item
+
+    @contextmanager
+    def patch(self, targets: Iterable[Target] = STAGES):
+        """Replaces the functions of the targets by timed ones, until exited.
+
+        Args:
+            targets (Iterable[Target], optional): The functions to time. Defaults
+                to STAGES.
+        """
+        originals = []
+        try:
+            for owner, name, stage, is_iter in targets:
+                fn = owner.__dict__[name]
+                originals.append((owner, name, fn))
+                if is_iter:
+                    timed = self.iter_stage(stage, fn)
+                else:
+                    timed = self.wrap(stage, fn)
+                setattr(owner, name, timed)
+            yield self
+        finally:
+            for owner, name, fn in reversed(originals):
+                setattr(owner, name, fn)
+
+    def iter_stage(self, stage: str, fn: Callable[..., Iterable]) -> Callable:
+        """Times the items of the iterators returned by a function."""
+        return lambda *args, **kwargs: self.wrap_iter(stage, fn(*args, **kwargs))
+
+    def report(self, wall: float) -> str:
+        """Formats the time of each stage, from the slowest.
+
+        Args:
+            wall (float): The total wall time in seconds.
+
+        Returns:
+            str: A table of stages, with their calls, time, share and time per call.
+        """
+        lines = [
+            f"{'stage':<12}{'calls':>12}{'time (s)':>12}{'share':>8}{'us/call':>12}"
+        ]
+        for stage, total in sorted(self.totals.items(), key=lambda kv: -kv[1]):
+            calls = self.calls[stage]
+            lines.append(
+                f"{stage:<12}{calls:>12}{total:>12.4f}{total / wall:>8.1%}"
+                f"{total / calls * 1e6 if calls else 0:>12.2f}"
+            )
+        other = wall - sum(self.totals.values())
+        lines.append(f"{'other':<12}{'':>12}{other:>12.4f}{other / wall:>8.1%}")
+        return "\n".join(lines)
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, limit: int) -> str:
+    """Formats the lines of code that allocated most of the traced memory.
+
+    Args:
+        snapshot (tracemalloc.Snapshot): The snapshot of traced allocations.
+        limit (int): The number of lines.
+
+    Returns:
+        str: A line per allocation site, with its size and number of blocks.
+    """
+    stats = snapshot.filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    ).statistics("lineno")
+    lines = [f"Top {limit} allocations:"]
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"{frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KiB "
+            f"in {stat.count} blocks"
+        )
+    return "\n".join(lines)
+
+
+@contextmanager
+def profiled(
+    stages: bool = True,
+    output_file: Optional[Path] = None,
+    trace_malloc: int = 0,
+    log: Callable[[str], None] = print,
+):
+    """Profiles the enclosed run, and logs the reports once it completes.
+
+    Args:
+        stages (bool, optional): Time the pipeline stages, see `StageProfiler`.
+            Defaults to True.
+        output_file (Optional[Path], optional): Dump cProfile stats to this file,
+            for `pstats` or snakeviz. Defaults to None.
+        trace_malloc (int, optional): Report the top allocation sites, tracing
+            memory with tracemalloc. Defaults to 0, not traced.
+        log (Callable[[str], None], optional): Reports output. Defaults to print.
+
+    Yields:
+        StageProfiler: The stage profiler, to time more stages.
+    """
+    profiler = StageProfiler()
+    profile = cProfile.Profile() if output_file is not None else None
+    if trace_malloc:
+        tracemalloc.start()
+    start = perf_counter()
+    try:
+        with profiler.patch(STAGES if stages else ()):
+            if profile is not None:
+                profile.enable()
+            try:
+                yield profiler
+            finally:
+                if profile is not None:
+                    profile.disable()
+        wall = perf_counter() - start
+        if stages:
+            log(profiler.report(wall))
+        if trace_malloc:
+            log(top_allocations(tracemalloc.take_snapshot(), trace_malloc))
+        if profile is not None:
+            profile.dump_stats(str(output_file))
+            log(f"cProfile stats written to {output_file}")
+    finally:
+        if trace_malloc:
+            tracemalloc.stop()
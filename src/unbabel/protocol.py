@@ -0,0 +1,164 @@
+import json
+import zlib
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# frames of protocol 1 hold a single event, acknowledged by "200" before the next
+# one is sent; frames of protocol 2 hold a batch of events, acknowledged by
+# sequence number, with several frames in flight
+PROTOCOL_VERSION = 2
+ACK = "200"
+BATCH_SIZE = 500
+INFLIGHT = 8
+
+
+def shard_of(stream: str, shards: int) -> int:
+    """The shard of a stream, the same in every process, unlike `hash`.
+
+    Args:
+        stream (str): The stream, or tenant, ID.
+        shards (int): The number of shards.
+
+    Returns:
+        int: The shard index, in [0, shards).
+    """
+    return zlib.crc32(stream.encode()) % shards
+
+
+def split_frame(frame: str) -> List[str]:
+    """Splits a batch frame into the Json lines of its events.
+
+    A frame is either newline delimited Json (NDJSON), or a Json array of events,
+    which are serialized again, so both are parsed as lines.
+
+    Args:
+        frame (str): The frame text.
+
+    Raises:
+        ValueError: If an array frame is not valid Json.
+
+    Returns:
+        List[str]: The Json line of each event.
+    """
+    frame = frame.strip()
+    if frame.startswith("["):
+        return [json.dumps(event) for event in json.loads(frame)]
+    return [line for line in frame.split("\n") if line.strip()]
+
+
+def consume_frame(
+    consume: Callable[[str], Iterable[Any]], lines: Sequence[str]
+) -> Tuple[List[Any], int, Optional[str]]:
+    """Consumes the events of a batch frame in order, until one fails.
+
+    The events before a failing one have already advanced the window, so the rows
+    they produced are kept, to be written, and acknowledged with their count and
+    the error.
+
+    Args:
+        consume (Callable[[str], Iterable[Any]]): Consumes the Json line of an
+            event, returning the rows of the bins it closed, or raises a
+            ValueError or KeyError before consuming it.
+        lines (Sequence[str]): The Json lines of the events.
+
+    Returns:
+        Tuple[List[Any], int, Optional[str]]: The rows produced, the number of
+            events consumed, and why the next one failed, if any.
+    """
+    rows: List[Any] = []
+    for count, line in enumerate(lines):
+        try:
+            rows.extend(consume(line))
+        except (ValueError, KeyError) as e:
+            return rows, count, str(e)
+    return rows, len(lines), None
+
+
+def join_frame(lines: Iterable[str]) -> str:
+    """Joins the Json lines of events into a NDJSON batch frame."""
+    return "\n".join(line.rstrip("\n") for line in lines)
+
+
+def batch_frames(lines: Iterable[str], size: int = BATCH_SIZE) -> Iterator[str]:
+    """Groups the Json lines of events into NDJSON frames of up to `size` events.
+
+    Args:
+        lines (Iterable[str]): The Json lines of the events.
+        size (int, optional): The number of events per frame. Defaults to
+            BATCH_SIZE.
+
+    Yields:
+        str: A batch frame.
+    """
+    batch: List[str] = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == size:
+            yield join_frame(batch)
+            batch = []
+    if batch:
+        yield join_frame(batch)
+
+
+def format_ack(seq: int, count: int, error: Optional[str] = None) -> str:
+    """Serializes the acknowledgement of a frame.
+
+    Args:
+        seq (int): The sequence number of the frame, from 1 on each connection.
+        count (int): The number of events consumed from the frame.
+        error (Optional[str], optional): Why the frame was rejected. Defaults to
+            None.
+
+    Returns:
+        str: The acknowledgement, e.g. `{"seq": 3, "count": 500}`.
+    """
+    ack = {"seq": seq, "count": count}
+    if error is not None:
+        ack["error"] = error
+    return json.dumps(ack)
+
+
+async def send_pipelined(
+    websocket, frames: Iterable[str], inflight: int = INFLIGHT
+) -> int:
+    """Sends batch frames over a websocket, with up to `inflight` frames not yet
+    acknowledged, so throughput is not bound by the round trip time.
+
+    Acknowledgements received while sending are buffered by the websocket, and
+    only read once the window of frames in flight is full.
+
+    Args:
+        websocket: A connected websocket, with `send` and `recv` coroutines.
+        frames (Iterable[str]): The batch frames.
+        inflight (int, optional): The number of unacknowledged frames. Defaults to
+            INFLIGHT.
+
+    Raises:
+        ValueError: If a frame is rejected, or acknowledged out of sequence.
+
+    Returns:
+        int: The number of events acknowledged.
+    """
+    sent = 0
+    acked = 0
+    count = 0
+
+    async def receive():
+        nonlocal acked, count
+        ack = json.loads(await websocket.recv())
+        if ack.get("error") is not None:
+            raise ValueError(f"Frame {ack['seq']} was rejected: {ack['error']}")
+        if ack["seq"] != acked + 1:
+            raise ValueError(
+                f"Expected the ack of frame {acked + 1}, got {ack['seq']}."
+            )
+        acked += 1
+        count += ack["count"]
+
+    for frame in frames:
+        if sent - acked >= inflight:
+            await receive()
+        await websocket.send(frame)
+        sent += 1
+    while acked < sent:
+        await receive()
+    return count
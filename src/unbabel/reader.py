@@ -0,0 +1,335 @@
+import bz2
+import glob
+import gzip
+import heapq
+import lzma
+import os
+import threading
+from operator import itemgetter
+from pathlib import Path
+from queue import Empty, Full, Queue
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from .parse import EventParser
+
+BLOCK_SIZE = 1 << 20  # 1MB
+PREFETCH = 4  # blocks decompressed ahead of the consumer
+POLL = 1.0  # in seconds, between reads of a followed file without new lines
+
+# decompressing openers by file extension
+COMPRESSED: Dict[str, Callable[[Path], IO[bytes]]] = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+# a file, or several time-sorted files to be merged
+Inputs = Union[Path, Sequence[Path]]
+
+T = TypeVar("T")
+
+
+def is_compressed(input_file: Path) -> bool:
+    return Path(input_file).suffix in COMPRESSED
+
+
+def expand_inputs(patterns: Iterable[Union[str, Path]]) -> List[Path]:
+    """Expands glob patterns, such as `logs/events.log*`, into the sorted paths
+    they match. Other paths are kept as they are.
+
+    Args:
+        patterns (Iterable[Union[str, Path]]): The paths or patterns.
+
+    Raises:
+        FileNotFoundError: If a pattern matches no file.
+
+    Returns:
+        List[Path]: The paths.
+    """
+    paths: List[Path] = []
+    for pattern in map(str, patterns):
+        if not glob.has_magic(pattern) or os.path.exists(pattern):
+            paths.append(Path(pattern))
+            continue
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            raise FileNotFoundError(f"No files match {pattern}")
+        paths.extend(map(Path, matches))
+    return paths
+
+
+def prefetch(items: Iterable[T], depth: int = PREFETCH) -> Iterator[T]:
+    """Produces items in a background thread, up to `depth` ahead of the consumer,
+    so I/O and decompression, which release the GIL, overlap with the consumer.
+
+    Errors of the producer are raised to the consumer, and the producer is stopped
+    once the consumer stops.
+
+    Args:
+        items (Iterable[T]): The items, such as decompressed blocks.
+        depth (int, optional): The number of items produced ahead. Defaults to
+            PREFETCH.
+
+    Yields:
+        T: The items.
+    """
+    queue: Queue = Queue(depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((None, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+        try:
+            while True:
+                queue.get_nowait()
+        except Empty:
+            pass
+        thread.join()
+
+
+def complete_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Trims chunks of bytes to complete lines, carrying the partial line at the
+    end of each chunk over to the next one.
+
+    Args:
+        chunks (Iterable[bytes]): The chunks, e.g. consecutive reads of a file.
+
+    Yields:
+        str: A block of complete lines, and the partial last line, if any.
+    """
+    rest = b""
+    for block in chunks:
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            rest += block
+            continue
+        yield (rest + block[:cut]).decode() if rest else block[:cut].decode()
+        rest = block[cut:]
+    if rest:
+        yield rest.decode()
+
+
+def read_chunks(
+    fp: IO[bytes], block_size: int, remaining: Optional[int] = None
+) -> Iterator[bytes]:
+    """Reads a file in chunks of `block_size` bytes, up to `remaining` bytes."""
+    while block := fp.read(
+        block_size if remaining is None else min(block_size, remaining)
+    ):
+        if remaining is not None:
+            remaining -= len(block)
+        yield block
+
+
+def read_compressed(input_file: Path, block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """Decompresses a file in a streaming fashion, in a background thread, and
+    yields blocks of complete lines, so it is never fully decompressed.
+
+    Args:
+        input_file (Path): A `.gz`, `.bz2` or `.xz` file.
+        block_size (int, optional): The number of decompressed bytes per read.
+            Defaults to 1MB.
+
+    Yields:
+        str: A block of complete lines.
+    """
+
+    def blocks():
+        with COMPRESSED[Path(input_file).suffix](input_file) as fp:
+            yield from complete_lines(read_chunks(fp, block_size))
+
+    yield from prefetch(blocks())
+
+
+def merge_lines(
+    input_files: Sequence[Path], block_size: int = BLOCK_SIZE
+) -> Iterator[str]:
+    """Merges the lines of time-sorted files into a single time-sorted stream,
+    with a k-way heap merge on the timestamp of each line.
+
+    Args:
+        input_files (Sequence[Path]): The files, such as rotated logs, in any order.
+        block_size (int, optional): The number of bytes per read. Defaults to 1MB.
+
+    Yields:
+        str: A line of any of the files.
+    """
+
+    def keyed(input_file: Path) -> Iterator[Tuple[int, str]]:
+        # a parser per file, as the minute of its last timestamp is cached
+        parse = EventParser()
+        for line in read_lines(input_file, block_size=block_size):
+            yield parse(line)[0], line
+
+    merged = heapq.merge(*map(keyed, input_files), key=itemgetter(0))
+    return map(itemgetter(1), merged)
+
+
+def read_blocks(
+    input_file: Inputs,
+    block_size: int = BLOCK_SIZE,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[str]:
+    """Reads a file in fixed-size blocks, and yields them trimmed to complete lines.
+
+    The partial line at the end of each block is carried over to the next one, so
+    memory is bounded by the block size, regardless of the size of the file.
+    Compressed files are decompressed as they are read, see `read_compressed`, and
+    several files are merged into blocks of time-sorted lines, see `merge_lines`.
+
+    Args:
+        input_file (Inputs): The file, or files, to read lines from.
+        block_size (int, optional): The number of bytes per read. Defaults to 1MB.
+        start (int, optional): The byte offset to start reading from. Defaults to 0.
+        end (Optional[int], optional): The byte offset to stop reading at. Defaults
+            to the end of the file.
+
+    Raises:
+        ValueError: If a byte range of several or compressed files is given.
+
+    Yields:
+        str: A block of complete lines.
+    """
+    multiple = not isinstance(input_file, (str, Path))
+    if start or end is not None:
+        if multiple or is_compressed(input_file):
+            raise ValueError("Byte ranges are only supported for uncompressed files.")
+    if multiple:
+        batch: List[str] = []
+        size = 0
+        for line in merge_lines(input_file, block_size):
+            batch.append(line)
+            size += len(line) + 1
+            if size >= block_size:
+                yield "\n".join(batch) + "\n"
+                batch = []
+                size = 0
+        if batch:
+            yield "\n".join(batch) + "\n"
+        return
+    if is_compressed(input_file):
+        yield from read_compressed(input_file, block_size)
+        return
+
+    with open(input_file, "rb", buffering=0) as fp:
+        fp.seek(start)
+        remaining = end - start if end is not None else None
+        yield from complete_lines(read_chunks(fp, block_size, remaining))
+
+
+def read_batches(
+    input_file: Inputs,
+    block_size: int = BLOCK_SIZE,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[List[str]]:
+    """Reads a file in fixed-size blocks, and yields the non-empty lines of each block.
+
+    Args:
+        input_file (Inputs): The file, or files, to read lines from.
+        block_size (int, optional): The number of bytes per read. Defaults to 1MB.
+        start (int, optional): The byte offset to start reading from. Defaults to 0.
+        end (Optional[int], optional): The byte offset to stop reading at. Defaults
+            to the end of the file.
+
+    Yields:
+        List[str]: The lines of a block.
+    """
+    for block in read_blocks(input_file, block_size=block_size, start=start, end=end):
+        yield [line for line in block.split("\n") if line.strip()]
+
+
+def read_lines(
+    input_file: Inputs,
+    block_size: int = BLOCK_SIZE,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[str]:
+    """Reads a file in fixed-size blocks, and yields its non-empty lines one by one.
+
+    Several files are merged into a single time-sorted stream of lines, see
+    `merge_lines`.
+
+    Args:
+        input_file (Inputs): The file, or files, to read lines from.
+        block_size (int, optional): The number of bytes per read. Defaults to 1MB.
+        start (int, optional): The byte offset to start reading from. Defaults to 0.
+        end (Optional[int], optional): The byte offset to stop reading at. Defaults
+            to the end of the file.
+
+    Yields:
+        str: A line of the file.
+    """
+    if not isinstance(input_file, (str, Path)):
+        if start or end is not None:
+            raise ValueError("Byte ranges are only supported for uncompressed files.")
+        yield from merge_lines(input_file, block_size)
+        return
+    for batch in read_batches(input_file, block_size=block_size, start=start, end=end):
+        yield from batch
+
+
+def partition(input_file: Path, n: int) -> List[Tuple[int, int]]:
+    """Splits a file into (at most) `n` byte ranges of similar size, aligned to the
+    start of lines.
+
+    Args:
+        input_file (Path): The file to be split.
+        n (int): The number of ranges.
+
+    Returns:
+        List[Tuple[int, int]]: The (start, end) byte offsets of each range.
+    """
+    size = os.path.getsize(input_file)
+    offsets = [0]
+    with open(input_file, "rb") as fp:
+        for i in range(1, n):
+            # move to the start of the line after the one holding the boundary byte
+            fp.seek(max(size * i // n - 1, 0))
+            fp.readline()
+            offset = fp.tell()
+            if offsets[-1] < offset < size:
+                offsets.append(offset)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
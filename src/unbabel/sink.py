@@ -0,0 +1,206 @@
+import re
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# buffered rows by (date, group key), coalescing the values of each column
+RowKey = Tuple[str, str]
+Values = Dict[str, float]
+
+TABLE = "metrics"
+MAX_ROWS = 5000
+MAX_AGE = 1.0  # in seconds
+ROWS_PER_STATEMENT = 500
+COLUMN_RE = re.compile(r"[a-z][a-z0-9_]*")
+
+
+def upsert_query(
+    table: str,
+    columns: Sequence[str],
+    rows: int,
+    placeholder: str = "%s",
+) -> str:
+    """Builds a parameterized multi-row upsert of the metrics of (date, group key)
+    rows, which overwrites the given columns of the rows already stored.
+
+    Args:
+        table (str): The table name.
+        columns (Sequence[str]): The value columns, after the date and group key.
+        rows (int): The number of rows of the statement.
+        placeholder (str, optional): The parameter placeholder of the driver, `%s`
+            for psycopg2 or `?` for sqlite3. Defaults to "%s".
+
+    Raises:
+        ValueError: If a name is not a lowercase identifier, as names can't be
+            parameters.
+
+    Returns:
+        str: The statement, taking `rows * (len(columns) + 2)` parameters.
+    """
+    for name in (table, *columns):
+        if not COLUMN_RE.fullmatch(name):
+            raise ValueError(f"Invalid column name {name!r}.")
+    names = ", ".join(['"date"', "group_key", *(f'"{c}"' for c in columns)])
+    row = "(" + ", ".join([placeholder] * (len(columns) + 2)) + ")"
+    updates = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in columns)
+    return (
+        f"INSERT INTO {table} ({names}) VALUES {', '.join([row] * rows)} "
+        f'ON CONFLICT ("date", group_key) DO UPDATE SET {updates}'
+    )
+
+
+class WriteBehindSink:
+    def __init__(
+        self,
+        conn,
+        table: str = TABLE,
+        max_rows: int = MAX_ROWS,
+        max_age: float = MAX_AGE,
+        rows_per_statement: int = ROWS_PER_STATEMENT,
+        placeholder: str = "%s",
+        clock: Callable[[], float] = monotonic,
+    ):
+        """Buffers the produced bins in memory, and writes them to the metrics
+        table in batches, instead of a statement and a commit per bin.
+
+        Updates of the same (date, group key) row are coalesced, so a bin produced
+        again, e.g. for a late event, is written once with its latest values.
+        Buffered rows are written with parameterized multi-row upserts, and a single
+        commit, once `max_rows` are buffered, the oldest row is `max_age` seconds
+        old, or on `flush`.
+
+        Without a connection, rows are only buffered, and written by the caller
+        with `take` and `write`, e.g. on another thread, once `ready`.
+
+        Args:
+            conn: A DB-API connection, such as psycopg2's or sqlite3's, or None.
+            table (str, optional): The table name. Defaults to TABLE.
+            max_rows (int, optional): The buffered rows that trigger a flush.
+                Defaults to MAX_ROWS.
+            max_age (float, optional): The age in seconds of the oldest buffered
+                row that triggers a flush. Defaults to MAX_AGE.
+            rows_per_statement (int, optional): The rows of each upsert statement.
+                Defaults to ROWS_PER_STATEMENT.
+            placeholder (str, optional): The parameter placeholder of the driver.
+                Defaults to "%s".
+            clock (Callable[[], float], optional): The time in seconds. Defaults to
+                time.monotonic.
+        """
+        self.conn = conn
+        self.table = table
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.rows_per_statement = rows_per_statement
+        self.placeholder = placeholder
+        self.clock = clock
+
+        self.pending: Dict[RowKey, Values] = {}
+        # when the oldest pending row was buffered
+        self.since: Optional[float] = None
+
+        self.rows_added = 0
+        self.rows_written = 0
+        self.statements = 0
+        self.flushes = 0
+
+    def add(self, ts: str, values: Values, group: str = ""):
+        """Buffers the values of a row, and flushes if a threshold is reached.
+
+        Args:
+            ts (str): The date of the bin.
+            values (Values): The values by column name.
+            group (str, optional): The group key, empty for the global statistics.
+                Defaults to "".
+        """
+        row = self.pending.get((ts, group))
+        if row is None:
+            self.pending[(ts, group)] = dict(values)
+        else:
+            row.update(values)
+        if self.since is None:
+            self.since = self.clock()
+        self.rows_added += 1
+        if self.conn is not None and self.ready():
+            self.flush()
+
+    def due(self) -> bool:
+        """Whether the oldest buffered row is older than `max_age`."""
+        return self.since is not None and self.clock() - self.since >= self.max_age
+
+    def ready(self) -> bool:
+        """Whether the buffered rows reached a threshold, and should be written."""
+        return len(self.pending) >= self.max_rows or self.due()
+
+    def take(self) -> Dict[RowKey, Values]:
+        """Removes the buffered rows, to be written with `write`."""
+        rows = self.pending
+        self.pending = {}
+        self.since = None
+        return rows
+
+    def restore(self, rows: Dict[RowKey, Values]):
+        """Buffers again rows that failed to be written, under the values buffered
+        since they were taken."""
+        if not rows:
+            return
+        pending = {key: dict(values) for key, values in rows.items()}
+        for key, values in self.pending.items():
+            pending.setdefault(key, {}).update(values)
+        self.pending = pending
+        self.since = self.clock()
+
+    def flush(self) -> int:
+        """Writes the buffered rows with the sink's connection, in a single
+        transaction. On failure the rows stay buffered.
+
+        Returns:
+            int: The number of rows written.
+        """
+        rows = self.take()
+        try:
+            return self.write(self.conn, rows)
+        except Exception:
+            self.restore(rows)
+            raise
+
+    def write(self, conn, rows: Dict[RowKey, Values]) -> int:
+        """Writes rows, in a single transaction, which is rolled back on failure.
+
+        Args:
+            conn: A DB-API connection.
+            rows (Dict[RowKey, Values]): The rows, from `take`.
+
+        Returns:
+            int: The number of rows written.
+        """
+        if not rows:
+            return 0
+        # rows of the same columns share statements
+        by_columns: Dict[Tuple[str, ...], List[Tuple]] = {}
+        for (ts, group), values in rows.items():
+            by_columns.setdefault(tuple(values), []).append(
+                (ts, group, *values.values())
+            )
+
+        statements = 0
+        cur = conn.cursor()
+        try:
+            for columns, batch in by_columns.items():
+                for i in range(0, len(batch), self.rows_per_statement):
+                    chunk = batch[i : i + self.rows_per_statement]
+                    query = upsert_query(
+                        self.table, columns, len(chunk), self.placeholder
+                    )
+                    cur.execute(query, [v for row in chunk for v in row])
+                    statements += 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        n = len(rows)
+        self.rows_written += n
+        self.statements += statements
+        self.flushes += 1
+        return n
@@ -0,0 +1,102 @@
+import os
+import pickle
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+# magic, format version, crc32 and length of the compressed payload
+HEADER = struct.Struct("<4sHIQ")
+MAGIC = b"UBSN"
+VERSION = 1
+
+
+def dump_snapshot(state: Any, offset: Any = None) -> bytes:
+    """Serializes the state of windows, and the offset of the last consumed
+    observations, as a compressed binary snapshot.
+
+    Args:
+        state (Any): The windows, e.g. `GroupedWindow`s by key.
+        offset (Any, optional): Where to resume consuming, e.g. the latest
+            timestamps, or a byte offset. Defaults to None.
+
+    Returns:
+        bytes: The snapshot.
+    """
+    payload = zlib.compress(
+        pickle.dumps((state, offset), protocol=pickle.HIGHEST_PROTOCOL), 1
+    )
+    return HEADER.pack(MAGIC, VERSION, zlib.crc32(payload), len(payload)) + payload
+
+
+def load_snapshot(data: bytes) -> Tuple[Any, Any]:
+    """Deserializes a snapshot written by `dump_snapshot`.
+
+    Args:
+        data (bytes): The snapshot.
+
+    Raises:
+        ValueError: If the snapshot is truncated, corrupted, or of another version.
+
+    Returns:
+        Tuple[Any, Any]: The state of the windows, and the offset.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated snapshot.")
+    magic, version, crc, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a snapshot of version {VERSION}.")
+    payload = data[HEADER.size :]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError("Corrupted snapshot.")
+    return pickle.loads(zlib.decompress(payload))
+
+
+def write_snapshot(path: Path, data: bytes):
+    """Writes a snapshot atomically, to a temporary file in the same directory
+    that replaces the previous snapshot once it is synced to disk, so a crash
+    leaves either the previous or the new snapshot.
+
+    Args:
+        path (Path): The snapshot file.
+        data (bytes): The snapshot, from `dump_snapshot`.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as fp:
+            fp.write(data)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    # persists the rename
+    fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_snapshot(path: Path) -> Optional[Tuple[Any, Any]]:
+    """Reads the snapshot of a file, see `load_snapshot`.
+
+    Args:
+        path (Path): The snapshot file.
+
+    Raises:
+        ValueError: If the snapshot is truncated, corrupted, or of another version.
+
+    Returns:
+        Optional[Tuple[Any, Any]]: The state of the windows and the offset, or None
+            if there is no snapshot.
+    """
+    try:
+        with open(path, "rb") as fp:
+            data = fp.read()
+    except FileNotFoundError:
+        return None
+    return load_snapshot(data)
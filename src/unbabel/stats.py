@@ -0,0 +1,195 @@
+import math
+import re
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+Number = Union[float, int]
+
+# statistics over the values within a rolling window, besides percentiles `pNN`
+STATS = ("mean", "wmean", "count", "min", "max")
+PERCENTILE_RE = re.compile(r"p([1-9]\d?(?:\.\d+)?)")
+COLUMNS = {
+    "mean": "average_delivery_time",
+    "wmean": "words_weighted_delivery_time",
+    "count": "event_count",
+}
+
+# the sketch key of non-positive values, which are all estimated as 0
+ZERO_KEY = -(1 << 31)
+SKETCH_ACCURACY = 0.01
+KEY_CACHE_SIZE = 4096
+
+
+def parse_stats(names: Sequence[str]) -> List[str]:
+    """Validates the names of the statistics to be computed.
+
+    Args:
+        names (Sequence[str]): Statistic names, from `STATS`, or percentiles such as
+            `p50`, `p95` or `p99.9`.
+
+    Raises:
+        ValueError: If a name is not recognized, or repeated.
+
+    Returns:
+        List[str]: The statistic names.
+    """
+    stats = [name.strip() for name in names]
+    for name in stats:
+        if name not in STATS and not PERCENTILE_RE.fullmatch(name):
+            raise ValueError(
+                f"Unknown statistic {name!r}, expected one of {', '.join(STATS)} "
+                "or a percentile such as p95."
+            )
+    if len(set(stats)) != len(stats):
+        raise ValueError("Repeated statistics.")
+    return stats
+
+
+def stat_column(name: str) -> str:
+    """The output column name of a statistic, e.g. `p95_delivery_time`."""
+    return COLUMNS.get(name) or f"{name.replace('.', '_')}_delivery_time"
+
+
+def percentile(name: str) -> Optional[float]:
+    """The quantile of a percentile statistic, e.g. 0.95 for `p95`, or None."""
+    match = PERCENTILE_RE.fullmatch(name)
+    return float(match.group(1)) / 100 if match else None
+
+
+class QuantileSketch:
+    __slots__ = ("gamma", "log_gamma", "counts", "n", "keys", "cache")
+
+    def __init__(self, accuracy: float = SKETCH_ACCURACY):
+        """Mergeable quantile sketch, with a bounded relative error (as DDSketch).
+
+        Values are counted in logarithmic buckets, `gamma^(k-1) < value <= gamma^k`,
+        so any quantile is estimated within `accuracy` of its true value, with a
+        number of buckets that depends on the range of values, not their count.
+        As buckets are plain counts, sketches are merged and subtracted exactly,
+        which is what a rolling window needs, by summing per-bin buckets.
+
+        Args:
+            accuracy (float, optional): The relative error of the estimated
+                quantiles. Defaults to 1%.
+        """
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts: Dict[int, int] = {}
+        self.n = 0
+
+        # the sorted bucket keys, reset when a key is added or removed
+        self.keys: Optional[List[int]] = None
+        # keys of already seen values, as values mostly repeat
+        self.cache: Dict[Number, int] = {}
+
+    def __getstate__(self):
+        # the sorted keys and the key cache are rebuilt, and left out of snapshots
+        return self.gamma, self.log_gamma, self.counts, self.n
+
+    def __setstate__(self, state):
+        self.gamma, self.log_gamma, self.counts, self.n = state
+        self.keys = None
+        self.cache = {}
+
+    def key(self, value: Number) -> int:
+        """Returns the bucket key of a value.
+
+        Args:
+            value (Number): The value.
+
+        Returns:
+            int: The key of the bucket holding the value.
+        """
+        key = self.cache.get(value)
+        if key is None:
+            key = math.ceil(math.log(value) / self.log_gamma) if value > 0 else ZERO_KEY
+            if len(self.cache) < KEY_CACHE_SIZE:
+                self.cache[value] = key
+        return key
+
+    def value(self, key: int) -> float:
+        """Estimates the values within a bucket, with the least relative error."""
+        if key == ZERO_KEY:
+            return 0.0
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def merge(self, counts: Dict[int, int], sign: int = 1):
+        """Adds (or subtracts) the bucket counts of another sketch.
+
+        Args:
+            counts (Dict[int, int]): Counts by bucket key.
+            sign (int, optional): 1 to add, -1 to subtract. Defaults to 1.
+        """
+        for key, count in counts.items():
+            total = self.counts.get(key, 0) + sign * count
+            if total:
+                if key not in self.counts:
+                    self.keys = None
+                self.counts[key] = total
+            else:
+                del self.counts[key]
+                self.keys = None
+            self.n += sign * count
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """Estimates quantiles, in a single pass over the sorted buckets.
+
+        Args:
+            qs (Sequence[float]): The quantiles, in [0, 1].
+
+        Returns:
+            List[float]: The estimated values, 0 if the sketch is empty.
+        """
+        if self.n == 0:
+            return [0.0] * len(qs)
+        if self.keys is None:
+            self.keys = sorted(self.counts)
+        # the rank of each quantile, over the lower values (as numpy's `lower`)
+        ranks = sorted((int(q * (self.n - 1)), i) for i, q in enumerate(qs))
+        results = [0.0] * len(qs)
+        seen = 0
+        j = 0
+        for key in self.keys:
+            seen += self.counts[key]
+            while j < len(ranks) and ranks[j][0] < seen:
+                results[ranks[j][1]] = self.value(key)
+                j += 1
+            if j == len(ranks):
+                break
+        return results
+
+
+class MonotonicDeque:
+    __slots__ = ("items", "sign")
+
+    def __init__(self, maximum: bool = True):
+        """Sliding window maximum (or minimum), over values pushed in tick order.
+
+        Values that can no longer be the maximum, as a greater value was pushed after
+        them, are dropped, so the deque is decreasing and its first item is the
+        maximum of the window. Each value is pushed and popped at most once, thus
+        the cost is O(1) amortized per value.
+
+        Args:
+            maximum (bool, optional): Track the maximum, otherwise the minimum.
+                Defaults to True.
+        """
+        self.items: Deque[Tuple[int, Number]] = deque()
+        self.sign = 1 if maximum else -1
+
+    def push(self, tick: int, value: Number):
+        """Appends the extreme value of a bin, by its epoch tick."""
+        items = self.items
+        while items and self.sign * items[-1][1] <= self.sign * value:
+            items.pop()
+        items.append((tick, value))
+
+    def evict(self, tick: int):
+        """Removes the values of bins that fell out of the window, until `tick`."""
+        items = self.items
+        while items and items[0][0] <= tick:
+            items.popleft()
+
+    def peek(self) -> float:
+        """The maximum (or minimum) within the window, 0 if it is empty."""
+        return float(self.items[0][1]) if self.items else 0.0
@@ -0,0 +1,60 @@
+import importlib
+from typing import Callable, Dict, Iterable, List
+
+# the entry point group of third-party strategies, such as
+# `[tool.poetry.plugins."unbabel.strategies"] mine = "my_package:strategy_mine"`
+ENTRY_POINT_GROUP = "unbabel.strategies"
+
+# the built-in strategies, as `module:function` of this package, imported on use so
+# a strategy only pays for the modules it needs, e.g. pandas
+BUILTIN: Dict[str, str] = {
+    "pandas": "calc:strategy_pandas",
+    "algo": "calc:strategy_sliding_window",
+    "numpy": "calc:strategy_numpy",
+}
+
+# strategy functions take the input file(s), the window size and the bin width,
+# and produce the rows of the bins, see `strategy_sliding_window`
+StrategyFn = Callable[..., Iterable]
+
+
+def entry_points() -> Dict[str, "importlib.metadata.EntryPoint"]:
+    """The strategies registered by installed packages, by name."""
+    from importlib import metadata
+
+    try:
+        found = metadata.entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # python < 3.10
+        found = metadata.entry_points().get(ENTRY_POINT_GROUP, [])
+    return {entry_point.name: entry_point for entry_point in found}
+
+
+def strategy_names() -> List[str]:
+    """The names of the built-in and registered strategies."""
+    return [*BUILTIN, *(name for name in entry_points() if name not in BUILTIN)]
+
+
+def load_strategy(name: str) -> StrategyFn:
+    """Imports a strategy function by name, from this package, or from the entry
+    points of installed packages, which are only looked up for other names.
+
+    Args:
+        name (str): The strategy name, such as `algo`.
+
+    Raises:
+        ValueError: If no strategy has this name.
+
+    Returns:
+        StrategyFn: The strategy function.
+    """
+    spec = BUILTIN.get(name)
+    if spec is not None:
+        module, _, attr = spec.partition(":")
+        return getattr(importlib.import_module(f".{module}", __package__), attr)
+    entry_point = entry_points().get(name)
+    if entry_point is None:
+        raise ValueError(
+            f"Unknown strategy {name!r}, expected one of {', '.join(strategy_names())}."
+        )
+    return entry_point.load()
@@ -0,0 +1,217 @@
+import json
+import re
+from enum import Enum
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+Row = Tuple
+COLUMNS = ("date", "average_delivery_time")
+BATCH_SIZE = 8192
+BUFFER_SIZE = 1 << 20  # 1MB
+
+# `repr` of non-finite floats, and their Json (as in `json.dumps`) counterparts
+NON_FINITE_RE = re.compile(r": (-?)(nan|inf)(?=[,}])")
+NON_FINITE = {"nan": "NaN", "inf": "Infinity"}
+
+
+class Format(str, Enum):
+    JSONL = "jsonl"
+    CSV = "csv"
+    NPY = "npy"
+
+
+def batched(rows: Iterable[Row], size: int = BATCH_SIZE) -> Iterator[List[Row]]:
+    """Groups rows into lists of a given size.
+
+    Args:
+        rows (Iterable[Row]): The rows to be grouped.
+        size (int, optional): The size of each batch. Defaults to BATCH_SIZE.
+
+    Yields:
+        List[Row]: A batch of rows.
+    """
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def quote_csv(value: str) -> str:
+    """Quotes a CSV field, if it holds separators or quotes."""
+    if "," in value or '"' in value or "\n" in value or "\r" in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def quote_groups(
+    batch: List[Row], groups: int, quote: Callable[[str], str]
+) -> List[Row]:
+    """Quotes the group key columns of a batch of rows, which follow the date.
+
+    Args:
+        batch (List[Row]): The rows to be quoted.
+        groups (int): The number of group key columns.
+        quote (Callable[[str], str]): Quotes a single value, cached as keys repeat.
+
+    Returns:
+        List[Row]: The rows, with their group key columns quoted.
+    """
+    end = groups + 1
+    return [(row[0], *map(quote, row[1:end]), *row[end:]) for row in batch]
+
+
+def jsonl_template(columns: Sequence[str], groups: Sequence[str] = ()) -> str:
+    """Builds the %-format template of a Json line, with a string date column,
+    string group key columns, and number value columns.
+
+    Args:
+        columns (Sequence[str]): The column names, starting with the date.
+        groups (Sequence[str], optional): The group key column names, following the
+            date, whose values are expected already quoted. Defaults to ().
+
+    Returns:
+        str: The line template.
+    """
+    date, *values = columns
+    fields = (
+        [f'"{date}": "%s"']
+        + [f'"{c}": %s' for c in groups]
+        + [f'"{c}": %r' for c in values]
+    )
+    return "{" + ", ".join(fields) + "}\n"
+
+
+def format_jsonl(batch: List[Row], template: str) -> str:
+    """Serializes a batch of rows to Json lines, identical to `json.dumps` of each row.
+
+    Args:
+        batch (List[Row]): The rows to be serialized.
+        template (str): The line template, from `jsonl_template`.
+
+    Returns:
+        str: The serialized rows.
+    """
+    text = "".join([template % row for row in batch])
+    if "nan" in text or "inf" in text:
+        text = NON_FINITE_RE.sub(
+            lambda m: f": {m.group(1)}{NON_FINITE[m.group(2)]}", text
+        )
+    return text
+
+
+def format_csv(batch: List[Row], template: str) -> str:
+    """Serializes a batch of rows to CSV lines.
+
+    Args:
+        batch (List[Row]): The rows to be serialized.
+        template (str): The line template.
+
+    Returns:
+        str: The serialized rows.
+    """
+    return "".join([template % row for row in batch])
+
+
+def write_npy(
+    rows: Iterable[Row],
+    output_file: Path,
+    columns: Sequence[str],
+    groups: Sequence[str] = (),
+) -> int:
+    """Writes rows as a numpy structured array, with a datetime64 date column and
+    unicode group key columns as wide as their longest value.
+
+    As the `.npy` header holds the shape of the array, bins are gathered in memory
+    before writing, at 16 bytes per bin plus the group keys.
+
+    Args:
+        rows (Iterable[Row]): The rows to be written.
+        output_file (Path): The file to write to.
+        columns (Sequence[str]): The column names, starting with the date.
+        groups (Sequence[str], optional): The group key column names, following the
+            date. Defaults to ().
+
+    Returns:
+        int: The number of rows written.
+    """
+    import numpy as np
+
+    date, *values = columns
+    dtypes = {date: "datetime64[s]", **{c: "U" for c in groups}}
+    dtypes.update({c: "f8" for c in values})
+    chunks: Dict[str, List[np.ndarray]] = {c: [] for c in dtypes}
+    for batch in batched(rows):
+        for i, column in enumerate(dtypes):
+            chunks[column].append(
+                np.array([row[i] for row in batch], dtype=dtypes[column])
+            )
+    arrays = {
+        c: np.concatenate(chunks[c]) if chunks[c] else np.empty(0, dtype=dtypes[c])
+        for c in dtypes
+    }
+    array = np.empty(len(arrays[date]), dtype=[(c, a.dtype) for c, a in arrays.items()])
+    for column in arrays:
+        array[column] = arrays[column]
+    with open(output_file, "wb") as fp:
+        np.save(fp, array)
+    return len(array)
+
+
+def write_output(
+    rows: Iterable[Row],
+    output_file: Path,
+    fmt: Format = Format.JSONL,
+    append: bool = False,
+    columns: Sequence[str] = COLUMNS,
+    groups: Sequence[str] = (),
+) -> int:
+    """Writes the produced bins to a file, serializing whole batches of rows at once
+    and writing them in large buffered blocks.
+
+    Args:
+        rows (Iterable[Row]): The rows to be written, the date followed by the group
+            key, if any, and the values.
+        output_file (Path): The file to write to.
+        fmt (Format, optional): The output format. Defaults to Format.JSONL.
+        append (bool, optional): Append to the file, instead of truncating it.
+            Not supported by `Format.NPY`. Defaults to False.
+        columns (Sequence[str], optional): The column names. Defaults to COLUMNS.
+        groups (Sequence[str], optional): The names of the fields the rows are
+            grouped by. Defaults to ().
+
+    Raises:
+        ValueError: If appending to a `Format.NPY` file.
+
+    Returns:
+        int: The number of rows written.
+    """
+    if fmt == Format.NPY:
+        if append:
+            raise ValueError("Can't append to a npy file.")
+        return write_npy(rows, output_file, columns, groups)
+
+    date, *values = columns
+    if fmt == Format.CSV:
+        template = ",".join(["%s"] * (len(groups) + 1) + ["%r"] * len(values)) + "\n"
+        header = ",".join([date, *groups, *values]) + "\n"
+        serialize = format_csv
+        quote = quote_csv
+    else:
+        template = jsonl_template(columns, groups)
+        header = ""
+        serialize = format_jsonl
+        quote = json.dumps
+    if groups:
+        quote = lru_cache(maxsize=None)(quote)
+
+    n = 0
+    with open(output_file, "a" if append else "w", buffering=BUFFER_SIZE) as fp:
+        if header and fp.tell() == 0:
+            fp.write(header)
+        for batch in batched(rows):
+            if groups:
+                batch = quote_groups(batch, len(groups), quote)
+            fp.write(serialize(batch, template))
+            n += len(batch)
+    return n
@@ -105,3 +105,41 @@ def test_file_mult_within_bin_output():
 {"date": "2018-12-26 18:42:00", "average_delivery_time": 54.0}
 {"date": "2018-12-26 18:43:00", "average_delivery_time": 54.0}
 {"date": "2018-12-26 18:44:00", "average_delivery_time": 54.0}"""
+
+
+@pytest.fixture
+def test_file_mult_within_bin_bucket_output():
+    return """{"date": "2018-12-26 18:11:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:12:00", "average_delivery_time": 20.0}
+{"date": "2018-12-26 18:13:00", "average_delivery_time": 20.0}
+{"date": "2018-12-26 18:14:00", "average_delivery_time": 20.0}
+{"date": "2018-12-26 18:15:00", "average_delivery_time": 20.0}
+{"date": "2018-12-26 18:16:00", "average_delivery_time": 25.5}
+{"date": "2018-12-26 18:17:00", "average_delivery_time": 25.5}
+{"date": "2018-12-26 18:18:00", "average_delivery_time": 25.5}
+{"date": "2018-12-26 18:19:00", "average_delivery_time": 25.5}
+{"date": "2018-12-26 18:20:00", "average_delivery_time": 25.5}
+{"date": "2018-12-26 18:21:00", "average_delivery_time": 25.5}
+{"date": "2018-12-26 18:22:00", "average_delivery_time": 31.0}
+{"date": "2018-12-26 18:23:00", "average_delivery_time": 31.0}
+{"date": "2018-12-26 18:24:00", "average_delivery_time": 52.23076923076923}
+{"date": "2018-12-26 18:25:00", "average_delivery_time": 52.23076923076923}
+{"date": "2018-12-26 18:26:00", "average_delivery_time": 54.0}
+{"date": "2018-12-26 18:27:00", "average_delivery_time": 54.0}
+{"date": "2018-12-26 18:28:00", "average_delivery_time": 54.0}
+{"date": "2018-12-26 18:29:00", "average_delivery_time": 54.0}
+{"date": "2018-12-26 18:30:00", "average_delivery_time": 54.0}
+{"date": "2018-12-26 18:31:00", "average_delivery_time": 54.0}
+{"date": "2018-12-26 18:32:00", "average_delivery_time": 54.0}
+{"date": "2018-12-26 18:33:00", "average_delivery_time": 54.0}
+{"date": "2018-12-26 18:34:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:35:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:36:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:37:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:38:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:39:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:40:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:41:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:42:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:43:00", "average_delivery_time": 0.0}
+{"date": "2018-12-26 18:44:00", "average_delivery_time": 54.0}"""
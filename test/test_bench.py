@@ -0,0 +1,43 @@
+from src.unbabel import bench
+from src.unbabel.calc import strategy_numpy, strategy_sliding_window
+
+
+def test_run_suite(tmp_path):
+    report = bench.run_suite(
+        {"algo": strategy_sliding_window, "numpy": strategy_numpy},
+        window_sizes=[5, 10],
+        densities=[1, 10],
+        events=200,
+        data_dir=tmp_path,
+        repeat=3,
+        warmup=0,
+        log=lambda _: None,
+    )
+    assert len(report["cases"]) == 8
+    for case in report["cases"]:
+        assert len(case["times"]) == 3
+        assert case["min"] <= case["median"] <= case["max"]
+        assert case["peak_memory"] > 0
+
+    bench.save_report(report, tmp_path / "report.json")
+    assert bench.load_report(tmp_path / "report.json") == report
+
+
+def test_compare():
+    baseline = {
+        "cases": [
+            {
+                "strategy": "algo",
+                "window_size": 10,
+                "density": 1,
+                "events": 10,
+                "median": 1.0,
+            }
+        ]
+    }
+    report = {"cases": [dict(baseline["cases"][0], median=1.05)]}
+    assert bench.compare(report, baseline, threshold=0.1) == []
+    report["cases"][0]["median"] = 1.5
+    assert bench.compare(report, baseline, threshold=0.1) == [
+        {"case": "algo/w10/d1/n10", "ratio": 1.5}
+    ]
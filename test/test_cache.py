@@ -0,0 +1,68 @@
+import asyncio
+
+from src.unbabel.cache import BinRing, LRUCache
+from src.unbabel.calc import format_tick
+
+
+def date(minute):
+    return format_tick(minute, 60_000_000)
+
+
+def test_ring_ranges():
+    ring = BinRing(capacity=5)
+    assert ring.get("", date(0), date(10)) is None
+    for minute in range(12):
+        ring.add("", date(minute), {"average_delivery_time": float(minute)})
+    # only the latest 5 bins are retained
+    assert ring.oldest("") == date(7)
+    assert ring.get("", date(6), date(11)) is None
+    bins = ring.get("", date(8), date(9))
+    assert bins == [
+        (date(8), {"average_delivery_time": 8.0}),
+        (date(9), {"average_delivery_time": 9.0}),
+    ]
+    assert [d for d, _ in ring.get("", date(7), "9999")] == [
+        date(m) for m in range(7, 12)
+    ]
+    assert ring.get("other", date(0), date(1)) is None
+
+
+def test_ring_replaces_bins():
+    ring = BinRing(capacity=3)
+    for minute in [0, 1, 3]:
+        ring.add("a", date(minute), {"average_delivery_time": 1.0})
+    # bins produced again replace the retained ones, older ones are ignored
+    ring.add("a", date(1), {"average_delivery_time": 2.0})
+    ring.add("a", date(2), {"average_delivery_time": 3.0})
+    ring.add("a", date(0), {"average_delivery_time": 4.0})
+    assert ring.get("a", date(1), date(3)) == [
+        (date(1), {"average_delivery_time": 2.0}),
+        (date(2), {"average_delivery_time": 3.0}),
+        (date(3), {"average_delivery_time": 1.0}),
+    ]
+
+
+def test_ring_subscribe():
+    async def main():
+        ring = BinRing(queue_size=2)
+        queue = ring.subscribe("a")
+        for minute in range(3):
+            ring.add("a", date(minute), {"average_delivery_time": 1.0})
+        ring.add("b", date(0), {"average_delivery_time": 1.0})
+        # the oldest bins are dropped for slow subscribers
+        assert [(await queue.get())[0] for _ in range(2)] == [date(1), date(2)]
+        ring.unsubscribe("a", queue)
+        assert ring.subscribers == {}
+
+    asyncio.run(main())
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    assert cache.get("a") == [1]
+    cache.put("c", [3])
+    assert cache.get("b") is None
+    assert list(cache.entries) == ["a", "c"]
+    assert (cache.hits, cache.misses) == (1, 1)
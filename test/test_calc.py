@@ -1,10 +1,29 @@
+import datetime
+
+import numpy as np
+import pytest
+
 from src.unbabel.calc import (
+    BucketWindow,
+    GroupedWindow,
     SlidingWindow,
+    StatsWindow,
+    WatermarkWindow,
+    format_tick,
+    format_ticks,
+    from_epoch_minute,
     moving_window_pandas,
     parse_json_line,
     produce_json,
+    strategy_grouped,
+    strategy_numpy,
+    strategy_pandas,
+    strategy_sliding_window,
+    txt_to_arrays,
     txt_to_csv,
 )
+from src.unbabel.generator import Profile, generate_events, generate_lines
+from src.unbabel.parse import MINUTE_US, SECOND_US, EventParser
 
 
 def test_pandas(test_file, test_file_output):
@@ -15,8 +34,46 @@ def test_pandas(test_file, test_file_output):
         assert produce_json(row.name, row["duration"]) == output_tokens[i + 1]
 
 
-def generic_window(test_file, test_file_output):
-    window = SlidingWindow(10)
+@pytest.mark.parametrize("chunk_size", [2000, 1 << 20])
+@pytest.mark.parametrize("bin_us", [MINUTE_US, 10 * SECOND_US])
+def test_pandas_chunks(tmp_path, chunk_size, bin_us):
+    lines = "".join(generate_lines(500, rate=2, seed=0, profile=Profile.GAPS))
+    input_file = tmp_path / "input.txt"
+    input_file.write_text(lines)
+    df = moving_window_pandas(txt_to_csv(lines), window_size=10, bin_us=bin_us)
+    expected = list(zip(df.index.astype(str), df["duration"].tolist()))
+    chunks = list(strategy_pandas(input_file, 10, bin_us, chunk_size=chunk_size))
+    assert [date for date, _ in chunks] == [date for date, _ in expected]
+    assert np.allclose(
+        [mean for _, mean in chunks],
+        [mean for _, mean in expected],
+        rtol=1e-12,
+        equal_nan=True,
+    )
+
+
+def test_pandas_chunks_out_of_order(tmp_path, test_file):
+    input_file = tmp_path / "input.txt"
+    first, *rest = test_file.split("\n")
+    input_file.write_text("\n".join(rest + [first]) + "\n")
+    with pytest.raises(ValueError, match="Out of order"):
+        list(strategy_pandas(input_file, 10, chunk_size=300))
+
+
+def test_pandas_chunks_malformed(tmp_path):
+    lines = list(generate_lines(500, rate=2, seed=0, profile=Profile.GAPS))
+    lines.insert(400, "not json\n")
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("".join(lines))
+    chunks = strategy_pandas(input_file, 10, chunk_size=2000)
+    # the earlier chunks are produced, up to the one holding the malformed line
+    assert next(chunks)
+    with pytest.raises(ValueError):
+        list(chunks)
+
+
+def generic_window(test_file, test_file_output, window_cls=SlidingWindow):
+    window = window_cls(10)
     output_tokens = test_file_output.split("\n")
     results = []
     for c in test_file.split("\n"):
@@ -33,14 +90,14 @@ def test_window(test_file, test_file_output):
     generic_window(test_file, test_file_output)
 
 
-def window_vs_pandas(test_file):
+def window_vs_pandas(test_file, window_cls=SlidingWindow):
     # pandas
     df = txt_to_csv(test_file)
     df = moving_window_pandas(df, window_size=10)
     df = df.fillna(0)
 
     # window
-    window = SlidingWindow(10)
+    window = window_cls(10)
     results = []
     for c in test_file.split("\n"):
         d = parse_json_line(c)
@@ -77,3 +134,334 @@ def test_window_mult_within_same_bin(
     makes the rolling-window calculations wrong.
     """
     generic_window(test_file_mult_within_bin, test_file_mult_within_bin_output)
+
+
+def test_bucket_window(test_file, test_file_output):
+    generic_window(test_file, test_file_output, window_cls=BucketWindow)
+
+
+def test_bucket_window_vs_pandas(
+    test_file, test_file2, test_file_out_of_range, test_file_out_of_range_last
+):
+    for f in [
+        test_file,
+        test_file2,
+        test_file_out_of_range,
+        test_file_out_of_range_last,
+    ]:
+        window_vs_pandas(f, window_cls=BucketWindow)
+
+
+def test_bucket_window_mult_within_same_bin(
+    test_file_mult_within_bin, test_file_mult_within_bin_bucket_output
+):
+    """`SlidingWindow` pops a single observation per produced bin, so observations
+    sharing a bin linger in the window after it expires. Buckets expire as a whole.
+    """
+    generic_window(
+        test_file_mult_within_bin,
+        test_file_mult_within_bin_bucket_output,
+        window_cls=BucketWindow,
+    )
+
+
+def test_bucket_window_out_of_order(test_file):
+    window = BucketWindow(10)
+    lines = test_file.split("\n")
+    window.consume(parse_json_line(lines[1]))
+    with pytest.raises(ValueError):
+        window.consume(parse_json_line(lines[0]))
+
+
+@pytest.mark.parametrize("cuts", [[], [1, 2, 500], [700, 1400]])
+def test_bucket_window_consume_many(cuts):
+    rng = np.random.default_rng(0)
+    ticks = np.sort(rng.integers(0, 300, 2000)) + 28_000_000
+    durations = rng.integers(1, 100, 2000)
+    window = BucketWindow(10)
+    expected = []
+    for tick, dur in zip(ticks.tolist(), durations.tolist()):
+        expected += window.consume_tick(tick, dur)
+
+    batched = BucketWindow(10)
+    rows = []
+    for part in np.split(np.arange(len(ticks)), cuts):
+        bins, means = batched.consume_many(ticks[part], durations[part])
+        rows += zip(format_ticks(bins), means.tolist())
+    assert rows == expected
+    assert batched.flush() == window.flush()
+
+    with pytest.raises(ValueError, match="Out of order"):
+        batched.consume_many(np.array([ticks[-1], ticks[-1] - 1]), np.ones(2))
+    # nothing was consumed from the rejected batch
+    assert batched.flush() == window.flush()
+
+
+def test_grouped_window_consume_many():
+    window = GroupedWindow(10)
+    window.consume_tick(("a",), 100, 10)
+    (bins, means), rows = window.consume_many(("b",), np.array([105, 112]), [20, 30])
+    assert format_ticks(bins) == [
+        "1970-01-01 01:45:00",
+        *map(format_tick, range(106, 113)),
+    ]
+    assert means.tolist() == [0.0] + [20.0] * 7
+    # `a` was made idle by the batch
+    assert [row[1] for row in rows] == ["a"] * 11
+    assert list(window.windows) == [("b",)]
+    with pytest.raises(ValueError):
+        GroupedWindow(10, stats=["p95"]).consume_many(("a",), [1], [1])
+
+
+def test_numpy_vs_window(
+    tmp_path,
+    test_file,
+    test_file2,
+    test_file_out_of_range,
+    test_file_out_of_range_last,
+    test_file_mult_within_bin,
+):
+    for i, f in enumerate(
+        [
+            test_file,
+            test_file2,
+            test_file_out_of_range,
+            test_file_out_of_range_last,
+            test_file_mult_within_bin,
+        ]
+    ):
+        input_file = tmp_path / f"input_{i}.txt"
+        input_file.write_text(f)
+        assert list(strategy_numpy(input_file, window_size=10)) == list(
+            strategy_sliding_window(input_file, window_size=10)
+        )
+
+
+def test_txt_to_arrays_malformed(tmp_path, test_file):
+    lines = test_file.splitlines()
+    # blank lines are skipped
+    _, durations = txt_to_arrays("\n".join([lines[0], "", "  ", *lines[1:]]) + "\n")
+    assert durations.tolist() == [20, 31, 54]
+    # lines matching neither field are not
+    malformed = "\n".join([lines[0], "not json", *lines[1:]])
+    with pytest.raises(ValueError):
+        txt_to_arrays(malformed)
+    with pytest.raises(KeyError):
+        txt_to_arrays("\n".join([lines[0], '{"duration": 1}']))
+    input_file = tmp_path / "input.txt"
+    input_file.write_text(malformed)
+    with pytest.raises(ValueError):
+        list(strategy_numpy(input_file, window_size=10))
+    with pytest.raises(ValueError):
+        list(strategy_sliding_window(input_file, window_size=10))
+
+
+@pytest.mark.filterwarnings("error")
+def test_offset_timestamps(tmp_path, test_file2):
+    # UTC offsets are dropped by every strategy, as by `EventParser`, so events
+    # are binned by their local times
+    lines = test_file2.splitlines()
+    offsets = ["+01:00", "-05:00"]
+    plain = tmp_path / "plain.txt"
+    plain.write_text(test_file2)
+    input_file = tmp_path / "input.txt"
+    input_file.write_text(
+        "\n".join(
+            line.replace('","translation_id"', f'{offsets[i % 2]}","translation_id"')
+            for i, line in enumerate(lines)
+        )
+    )
+    expected = list(strategy_sliding_window(plain, 10))
+    assert expected[0][0] == "2018-12-26 18:11:00"
+    assert list(strategy_sliding_window(input_file, 10)) == expected
+    assert list(strategy_sliding_window(input_file, 10, stats=["mean"])) == expected
+    assert list(strategy_numpy(input_file, 10)) == expected
+    assert list(strategy_pandas(input_file, 10)) == list(strategy_pandas(plain, 10))
+
+
+def test_grouped_vs_window(tmp_path):
+    input_file = tmp_path / "input.txt"
+    generate_events(input_file, 2000, rate=5, seed=0, clients=3, languages=3)
+    group_by = ["client_name", "target_language"]
+    rows = list(strategy_grouped(input_file, 10, group_by, idle=10**9))
+
+    # each group produces the same bins as a window over its events alone
+    lines = input_file.read_text().splitlines()
+    keys = {(c, t) for _, c, t, _ in rows}
+    assert len(keys) == 9
+    for client, target in keys:
+        group_file = tmp_path / f"{client}_{target}.txt"
+        group_file.write_text(
+            "\n".join(
+                l
+                for l in lines
+                if f'"client_name": "{client}"' in l
+                and f'"target_language": "{target}"' in l
+            )
+        )
+        assert [
+            (date, dur) for date, c, t, dur in rows if (c, t) == (client, target)
+        ] == list(strategy_sliding_window(group_file, 10))
+
+
+def test_grouped_window_eviction():
+    window = GroupedWindow(10)
+    rows = window.consume_tick(("a",), 100, 10)
+    rows += window.consume_tick(("b",), 105, 20)
+    assert list(window.windows) == [("a",), ("b",)]
+    # `a` is evicted once idle for more than 11 minutes, after its window emptied
+    rows += window.consume_tick(("b",), 111, 20)
+    assert list(window.windows) == [("a",), ("b",)]
+    rows += window.consume_tick(("b",), 112, 20)
+    assert list(window.windows) == [("b",)]
+    a_rows = [(date, dur) for date, key, dur in rows if key == "a"]
+    assert len(a_rows) == 12
+    assert [dur for _, dur in a_rows] == [0.0] + [10.0] * 10 + [0.0]
+    assert a_rows[-1][0] == "1970-01-01 01:51:00"
+
+    # an evicted group starts over, and makes `b` idle in turn
+    rows = window.consume_tick(("a",), 130, 30)
+    assert rows[0] == ("1970-01-01 02:10:00", "a", 0.0)
+    assert {key for _, key, _ in rows[1:]} == {"b"}
+    assert window.flush() == [("1970-01-01 02:11:00", "a", 30.0)]
+
+
+def test_stats_window_vs_brute_force(tmp_path):
+    input_file = tmp_path / "input.txt"
+    generate_events(input_file, 3000, profile="bursty", rate=20, seed=0)
+    stats = ["mean", "p50", "p95", "min", "max", "count", "wmean"]
+    rows = list(strategy_sliding_window(input_file, 5, stats=stats))
+
+    # bins and means are the same as the ones of the mean only
+    assert [r[:2] for r in rows] == list(strategy_sliding_window(input_file, 5))
+
+    parse = EventParser()
+    events = []
+    for line in input_file.read_text().splitlines():
+        us, dur = parse(line)
+        events.append((us // MINUTE_US, dur, parse.number(line, "nr_words")))
+    minutes, durations, words = map(np.array, zip(*events))
+    first = minutes.min()
+    for i, (_, mean, p50, p95, low, high, count, wmean) in enumerate(rows):
+        # the bin labelled `t` holds the minutes within [t - 5, t - 1]
+        t = first + i
+        within = (minutes >= t - 5) & (minutes < t)
+        if not within.any():
+            assert (mean, p50, low, high, count, wmean) == (0.0,) * 6
+            continue
+        values = durations[within]
+        assert count == within.sum()
+        assert (low, high) == (values.min(), values.max())
+        assert wmean == pytest.approx(np.average(values, weights=words[within]))
+        expected = np.quantile(values, [0.5, 0.95], method="lower")
+        assert [p50, p95] == pytest.approx(expected.tolist(), rel=0.01)
+
+
+def test_stats_window_flush():
+    window = StatsWindow(10, ["max", "count"])
+    window.consume_tick(100, 10)
+    window.consume_tick(100, 30)
+    assert window.flush() == [("1970-01-01 01:41:00", 30.0, 2)]
+    # the flush doesn't alter the window
+    assert window.consume_tick(101, 20) == [("1970-01-01 01:41:00", 30.0, 2)]
+    assert window.flush() == [("1970-01-01 01:42:00", 30.0, 3)]
+    with pytest.raises(ValueError, match="only supported for the mean"):
+        window.consume_bucket(102, 60, 2)
+
+
+def test_format_tick():
+    for minute in [0, 1, 59, 60, 1439, 1440, 25_772_831, -1]:
+        assert format_tick(minute) == str(from_epoch_minute(minute))
+    assert format_tick(3, 10 * SECOND_US) == "1970-01-01 00:00:30"
+    assert format_tick(1, 3600 * SECOND_US) == "1970-01-01 01:00:00"
+
+
+@pytest.mark.parametrize("bin_s,window_size", [(10, 6), (30, 20), (300, 3)])
+def test_bins_vs_numpy(tmp_path, bin_s, window_size):
+    input_file = tmp_path / "input.txt"
+    generate_events(input_file, 2000, profile="bursty", rate=10, seed=0)
+    bin_us = bin_s * SECOND_US
+    rows = list(strategy_sliding_window(input_file, window_size, bin_us=bin_us))
+    assert rows == list(strategy_numpy(input_file, window_size, bin_us=bin_us))
+    # consecutive bins are `bin_s` apart, and aligned to the epoch
+    dates = [datetime.datetime.fromisoformat(date) for date, _ in rows]
+    assert {(b - a).total_seconds() for a, b in zip(dates, dates[1:])} == {bin_s}
+    assert (dates[0] - datetime.datetime(1970, 1, 1)).total_seconds() % bin_s == 0
+
+
+def test_bins_vs_minutes(tmp_path):
+    # a window of 10 minutes over 1-min bins, set in seconds
+    input_file = tmp_path / "input.txt"
+    generate_events(input_file, 1000, rate=3, seed=0)
+    assert list(strategy_sliding_window(input_file, 10)) == list(
+        strategy_sliding_window(input_file, 10, bin_us=60 * SECOND_US)
+    )
+
+
+def reorder(input_file, output_file, spread, seed=0):
+    """Writes the events of a file delayed by up to `spread` minutes, keeping the
+    first event first, so no event arrives after one `spread` minutes later."""
+    parse = EventParser()
+    rng = np.random.default_rng(seed)
+    lines = input_file.read_text().splitlines()
+    ticks = [parse(line)[0] // MINUTE_US for line in lines]
+    keys = [tick + rng.uniform(0, spread) for tick in ticks]
+    keys[0] = ticks[0] - 1
+    order = sorted(range(len(lines)), key=keys.__getitem__)
+    output_file.write_text("\n".join(lines[i] for i in order))
+    return output_file
+
+
+def test_watermark_window_in_order(tmp_path):
+    input_file = tmp_path / "input.txt"
+    generate_events(input_file, 2000, profile="bursty", rate=5, seed=0)
+    assert list(strategy_sliding_window(input_file, 10, delay=3, lateness=5)) == list(
+        strategy_sliding_window(input_file, 10)
+    )
+
+
+def test_watermark_window_reorder(tmp_path):
+    # disorder within the delay produces the same bins as ordered input
+    input_file = tmp_path / "input.txt"
+    generate_events(input_file, 2000, rate=5, seed=0)
+    shuffled = reorder(input_file, tmp_path / "shuffled.txt", 3)
+    assert list(strategy_sliding_window(shuffled, 10, delay=3)) == list(
+        strategy_sliding_window(input_file, 10)
+    )
+
+
+def test_watermark_window_lateness(tmp_path):
+    input_file = tmp_path / "input.txt"
+    generate_events(input_file, 2000, rate=5, seed=0)
+    shuffled = reorder(input_file, tmp_path / "shuffled.txt", 5)
+    expected = list(strategy_sliding_window(input_file, 10))
+
+    window = WatermarkWindow(10, lateness=5)
+    parse = EventParser()
+    rows = []
+    for line in shuffled.read_text().splitlines():
+        us, dur = parse(line)
+        rows.extend(window.consume_tick(us // MINUTE_US, dur))
+    rows.extend(window.flush())
+    assert window.late > 0 and window.dropped == 0
+
+    # late events produce their bins again, and the latest ones are exact
+    assert len(rows) <= len(expected) + 10 * window.late
+    latest = dict(rows)
+    assert list(latest) == [date for date, _ in expected]
+    assert list(latest.values()) == pytest.approx([dur for _, dur in expected])
+
+
+def test_watermark_window_dropped():
+    window = WatermarkWindow(10, delay=1, lateness=2)
+    assert window.consume_tick(100, 10) == []
+    assert window.consume_tick(101, 20) == [("1970-01-01 01:40:00", 0.0)]
+    assert window.consume_tick(105, 30)[-1] == ("1970-01-01 01:44:00", 15.0)
+    # bins until 01:44 were produced, so 102 is late and 101 is too late
+    assert window.consume_tick(102, 40) == [
+        ("1970-01-01 01:43:00", 70 / 3),
+        ("1970-01-01 01:44:00", 70 / 3),
+    ]
+    assert window.consume_tick(101, 50) == []
+    assert (window.late, window.dropped) == (1, 1)
+    assert window.flush()[-1] == ("1970-01-01 01:46:00", 25.0)
@@ -0,0 +1,81 @@
+import pytest
+
+from src.unbabel.calc import strategy_grouped, strategy_sliding_window
+from src.unbabel.follow import Follower, follow
+from src.unbabel.generator import generate_lines
+
+
+def test_follower_partial_lines(tmp_path):
+    log = tmp_path / "events.log"
+    log.write_text("a\nb")
+    follower = Follower(log)
+    assert follower.read() == ["a"]
+    assert follower.read() == []
+    with open(log, "a") as fp:
+        fp.write("c\n\nd\n")
+    assert follower.read() == ["bc", "d"]
+    assert follower.position["offset"] == log.stat().st_size
+
+
+def test_follower_rotation(tmp_path):
+    log = tmp_path / "events.log"
+    log.write_text("a\n")
+    follower = Follower(log)
+    assert follower.read() == ["a"]
+    position = follower.position
+    with open(log, "a") as fp:
+        fp.write("b\nc")
+    log.rename(tmp_path / "events.log.1")
+    # the rotated file is read to its end before the new one
+    assert follower.read() == ["b"]
+    assert follower.read() == []
+    log.write_text("d\n")
+    assert follower.read() == ["c"]
+    assert follower.read() == ["d"]
+
+    # a restarted follower finds the rotated file
+    restarted = Follower(log)
+    restarted.seek(position)
+    assert [restarted.read() for _ in range(4)] == [["b"], ["c"], ["d"], []]
+
+    # files truncated in place are read again
+    log.write_text("")
+    assert follower.read() == []
+    log.write_text("e\n")
+    assert follower.read() == ["e"]
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"window_size": 10},
+        {"window_size": 10, "stats": ["mean", "p95"]},
+        {"window_size": 10, "group_by": ["client_name"], "lateness": 2},
+    ],
+)
+def test_follow_resume(tmp_path, config):
+    lines = "".join(generate_lines(3000, rate=20, seed=0, clients=3)).splitlines(True)
+    log = tmp_path / "events.log"
+    checkpoint = tmp_path / "events.ckpt"
+    rows = []
+    for part in [lines[:1000], lines[1000:1700], lines[1700:]]:
+        with open(log, "a") as fp:
+            fp.writelines(part)
+        # a run per part, stopped once idle
+        for batch in follow(log, checkpoint, config, sleep=lambda _: None):
+            if not batch:
+                break
+            rows.extend(batch)
+
+    full = tmp_path / "full.log"
+    full.write_text("".join(lines))
+    if "group_by" in config:
+        expected = list(strategy_grouped(full, **config))
+    else:
+        expected = list(strategy_sliding_window(full, **config))
+    # the last bins are only produced by the flush of a completed run
+    assert rows == expected[: len(rows)]
+    assert len(expected) - len(rows) <= 3 * 10
+
+    with pytest.raises(ValueError, match="another configuration"):
+        next(follow(log, checkpoint, {"window_size": 5}))
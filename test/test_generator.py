@@ -0,0 +1,33 @@
+import pytest
+
+from src.unbabel.generator import Profile, generate_events, generate_lines
+from src.unbabel.parse import MINUTE_US, EventParser
+
+
+@pytest.mark.parametrize("profile", list(Profile))
+def test_generate_ordered(profile):
+    parse = EventParser()
+    lines = "".join(
+        generate_lines(5000, profile=profile, rate=10, seed=0, chunk_size=1500)
+    ).splitlines()
+    assert len(lines) == 5000
+    timestamps = [parse(l)[0] for l in lines]
+    assert timestamps == sorted(timestamps)
+    assert parse.fallbacks == 0
+
+
+def test_generate_seed(tmp_path):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    generate_events(a, 1000, seed=1, clients=10, languages=5)
+    generate_events(b, 1000, seed=1, clients=10, languages=5)
+    assert a.read_text() == b.read_text()
+    assert "client-9" in a.read_text()
+
+
+def test_generate_same_minute():
+    parse = EventParser()
+    lines = "".join(
+        generate_lines(3000, profile=Profile.SAME_MINUTE, seed=0)
+    ).splitlines()
+    minutes = {parse(l)[0] // MINUTE_US for l in lines}
+    assert len(minutes) == 3
@@ -0,0 +1,30 @@
+import pytest
+
+from src.unbabel.calc import strategy_sliding_window
+from src.unbabel.parallel import strategy_parallel
+from src.unbabel.reader import partition
+
+
+def test_partition(tmp_path, test_file_mult_within_bin):
+    input_file = tmp_path / "input.txt"
+    input_file.write_text(test_file_mult_within_bin)
+    data = input_file.read_bytes()
+    for n in [1, 2, 3, 100]:
+        ranges = partition(input_file, n)
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+        for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+            assert end == start and data[start - 1 : start] == b"\n"
+
+
+@pytest.mark.parametrize("workers", [2, 3, 8])
+def test_parallel_vs_window(
+    tmp_path, workers, test_file, test_file2, test_file_mult_within_bin
+):
+    # floats that are not exactly representable, to check the summation order
+    floats = test_file_mult_within_bin.replace('"duration": 54}', '"duration": 0.1}')
+    for i, f in enumerate([test_file, test_file2, test_file_mult_within_bin, floats]):
+        input_file = tmp_path / f"input_{i}.txt"
+        input_file.write_text(f)
+        assert list(strategy_parallel(input_file, 10, workers=workers)) == list(
+            strategy_sliding_window(input_file, window_size=10)
+        )
@@ -0,0 +1,88 @@
+import pytest
+
+from src.unbabel.parse import (
+    EventParser,
+    parse_json_event,
+    parse_json_fields,
+    parse_json_number,
+    parse_interval,
+)
+
+
+def test_parser_vs_json(test_file_mult_within_bin):
+    parse = EventParser()
+    for line in test_file_mult_within_bin.split("\n"):
+        assert parse(line) == parse_json_event(line)
+    assert parse.fallbacks == 0
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        # pydantic serialization of the generated events
+        '{"timestamp": "2018-12-26T18:11:08.509654", "translation_id": "5aa5b2f39f7254a75bb3", "duration": 20, "nr_words": 20}',
+        '{"timestamp": "2018-12-26 18:11:08", "duration": 20}',
+        '{"timestamp": "2018-12-26 18:11:08.5", "duration": 20.5}',
+        '{"duration": 20, "timestamp": "2018-12-26 18:11:08.509654"}',
+        '{"timestamp":"2018-12-26 18:11:08.509654","duration":1e3}',
+    ],
+)
+def test_parser_formats(line):
+    assert EventParser()(line) == parse_json_event(line)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        '{"timestamp": "2018-12-26 18:11:08.509654+01:00", "duration": 20}',
+        '{"timestamp": "2018-12-26 18:11:08.509654", "duration": "20"}',
+        '{"timestamp": "2018-12-26", "duration": 20}',
+    ],
+)
+def test_parser_fallback(line):
+    parse = EventParser()
+    assert parse(line) == parse_json_event(line)
+    assert parse.fallbacks == 1
+
+
+@pytest.mark.parametrize(
+    "line,fallbacks",
+    [
+        ('{"client_name": "airliberty", "target_language": "pt"}', 0),
+        ('{"client_name":"airliberty","nr_words":20,"target_language":"pt"}', 0),
+        ('{"client_name": "air\\"liberty", "target_language": "pt"}', 1),
+        ('{"client_name": 20, "target_language": "pt"}', 1),
+        ('{"client_name": "airliberty"}', 1),
+    ],
+)
+def test_parser_fields(line, fallbacks):
+    parse = EventParser()
+    names = ["client_name", "target_language"]
+    assert parse.fields(line, names) == parse_json_fields(line, names)
+    assert parse.fallbacks == fallbacks
+
+
+@pytest.mark.parametrize(
+    "line,fallbacks",
+    [
+        ('{"nr_words": 20, "duration": 30}', 0),
+        ('{"duration": 30, "nr_words":20}', 0),
+        ('{"duration": 30, "nr_words": 2.5e1}', 0),
+        ('{"duration": 30, "nr_words": "20"}', 1),
+        ('{"duration": 30}', 1),
+    ],
+)
+def test_parser_number(line, fallbacks):
+    parse = EventParser()
+    assert parse.number(line, "nr_words") == parse_json_number(line, "nr_words")
+    assert parse.fallbacks == fallbacks
+
+
+def test_parse_interval():
+    assert parse_interval("10s") == 10_000_000
+    assert parse_interval("1m") == 60_000_000
+    assert parse_interval("2h") == 7_200_000_000
+    assert parse_interval("1d") == parse_interval("1440m")
+    for text in ["0s", "1.5m", "m", "10", "1w"]:
+        with pytest.raises(ValueError):
+            parse_interval(text)
@@ -0,0 +1,89 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src.unbabel.pool import PoolRunner
+from src.unbabel.sink import WriteBehindSink
+
+
+class FakePool:
+    """A pool of sqlite3 connections to a shared in-memory database, with the
+    `getconn`/`putconn`/`closeall` methods of psycopg2's pools."""
+
+    def __init__(self, size: int):
+        uri = "file:pool?mode=memory&cache=shared"
+        self.keep = sqlite3.connect(uri, uri=True)
+        self.keep.execute(
+            'CREATE TABLE metrics( "date" TIMESTAMP, group_key TEXT NOT NULL DEFAULT '
+            "'', average_delivery_time FLOAT, PRIMARY KEY (\"date\", group_key) );"
+        )
+        self.free = [
+            sqlite3.connect(uri, uri=True, check_same_thread=False) for _ in range(size)
+        ]
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def getconn(self):
+        with self.lock:
+            return self.free.pop()
+
+    def putconn(self, conn):
+        with self.lock:
+            self.free.append(conn)
+
+    def closeall(self):
+        self.closed = True
+        for conn in self.free:
+            conn.close()
+        self.keep.close()
+
+
+def test_pool_runner():
+    pool = FakePool(2)
+    runner = PoolRunner(pool, workers=2)
+    sink = WriteBehindSink(None, placeholder="?")
+    for minute in range(10):
+        sink.add(f"2018-12-26 18:{minute:02}:00", {"average_delivery_time": 1.0})
+
+    def count(conn):
+        return conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+
+    def fail(conn):
+        raise ValueError("failed")
+
+    async def main():
+        # the sink's rows are written on the executor, off the event loop
+        assert await runner.run(sink.write, sink.take()) == 10
+        counts = await asyncio.gather(*[runner.run(count) for _ in range(8)])
+        assert counts == [10] * 8
+        with pytest.raises(ValueError):
+            await runner.run(fail)
+
+    asyncio.run(main())
+    stats = runner.stats()
+    assert (stats["calls"], stats["errors"]) == (10, 1)
+    assert (stats["in_use"], stats["queued"]) == (0, 0)
+    # every connection was returned to the pool
+    assert len(pool.free) == 2
+    runner.close()
+    assert pool.closed
+
+
+def test_pool_runner_timeout():
+    runner = PoolRunner(FakePool(1), workers=1, timeout=0.05)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await runner.run(lambda conn: time.sleep(0.2))
+        # calls still queued behind it time out, and are never run
+        calls = [runner.run(lambda conn: None) for _ in range(2)]
+        for result in await asyncio.gather(*calls, return_exceptions=True):
+            assert isinstance(result, asyncio.TimeoutError)
+
+    asyncio.run(main())
+    runner.close()
+    stats = runner.stats()
+    assert (stats["timeouts"], stats["calls"], stats["queued"]) == (3, 1, 0)
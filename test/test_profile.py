@@ -0,0 +1,41 @@
+import json
+from itertools import count
+
+from src.unbabel import calc
+from src.unbabel.calc import strategy_sliding_window
+from src.unbabel.parse import EventParser
+from src.unbabel.profile import StageProfiler, profiled
+
+
+def test_stage_self_time():
+    ticks = count()
+    profiler = StageProfiler(clock=lambda: float(next(ticks)))
+    inner = profiler.wrap("inner", lambda: None)
+
+    def outer():
+        inner()
+        inner()
+
+    profiler.wrap("outer", outer)()
+    # the outer stage took 5 ticks, 2 of which in the inner stage
+    assert dict(profiler.totals) == {"inner": 2.0, "outer": 3.0}
+    assert dict(profiler.calls) == {"inner": 2, "outer": 1}
+    assert list(profiler.wrap_iter("iter", [1, 2])) == [1, 2]
+    assert profiler.calls["iter"] == 3
+
+
+def test_patch_restores(tmp_path, test_file, test_file_output):
+    input_file = tmp_path / "input.json"
+    input_file.write_text(test_file)
+    call = EventParser.__call__
+    read_lines = calc.read_lines
+    logs = []
+    with profiled(output_file=tmp_path / "out.prof", trace_malloc=5, log=logs.append):
+        assert EventParser.__call__ is not call
+        bins = list(strategy_sliding_window(input_file, 10))
+    expected = [json.loads(line) for line in test_file_output.splitlines()]
+    assert [b[1] for b in bins] == [e["average_delivery_time"] for e in expected]
+    assert EventParser.__call__ is call and calc.read_lines is read_lines
+    assert (tmp_path / "out.prof").stat().st_size
+    assert logs[0].split("\n")[1].split()[0] in ("parse", "window", "read")
+    assert logs[1].startswith("Top 5 allocations:")
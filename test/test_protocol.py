@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+import pytest
+
+from src.unbabel.calc import GroupedWindow
+from src.unbabel.parse import MINUTE_US, EventParser
+from src.unbabel.protocol import (
+    batch_frames,
+    consume_frame,
+    format_ack,
+    send_pipelined,
+    shard_of,
+    split_frame,
+)
+
+
+class FakeWebsocket:
+    """Acknowledges every frame, as the `/ws?protocol=2` endpoint."""
+
+    def __init__(self, reject: int = 0):
+        self.frames = []
+        self.acks = []
+        self.reject = reject
+        self.most_inflight = 0
+
+    async def send(self, frame):
+        self.frames.append(frame)
+        seq = len(self.frames)
+        lines = split_frame(frame)
+        if seq == self.reject:
+            self.acks.append(format_ack(seq, 0, "invalid"))
+        else:
+            self.acks.append(format_ack(seq, len(lines)))
+        self.most_inflight = max(self.most_inflight, len(self.acks))
+
+    async def recv(self):
+        return self.acks.pop(0)
+
+
+def test_split_frame():
+    lines = ['{"a": 1}', '{"a": 2}']
+    assert split_frame("\n".join(lines) + "\n\n") == lines
+    assert split_frame(json.dumps([{"a": 1}, {"a": 2}])) == lines
+    assert split_frame('{"a": 1}') == ['{"a": 1}']
+    with pytest.raises(ValueError):
+        split_frame('[{"a": 1}')
+
+
+def test_batch_frames():
+    lines = [f'{{"a": {i}}}' for i in range(7)]
+    frames = list(batch_frames(lines, 3))
+    assert len(frames) == 3
+    assert [line for frame in frames for line in split_frame(frame)] == lines
+
+
+def test_send_pipelined():
+    websocket = FakeWebsocket()
+    frames = list(batch_frames([f'{{"a": {i}}}' for i in range(100)], 7))
+    assert asyncio.run(send_pipelined(websocket, frames, inflight=4)) == 100
+    assert websocket.frames == frames
+    # frames are sent until 4 are unacknowledged, and every ack is read
+    assert websocket.most_inflight == 4
+    assert websocket.acks == []
+
+
+def test_send_pipelined_rejected():
+    websocket = FakeWebsocket(reject=3)
+    frames = batch_frames([f'{{"a": {i}}}' for i in range(10)], 2)
+    with pytest.raises(ValueError, match="Frame 3 was rejected"):
+        asyncio.run(send_pipelined(websocket, frames, inflight=2))
+
+
+def test_consume_frame_partial():
+    def event(minute, duration):
+        return json.dumps(
+            {"timestamp": f"2018-12-26 18:{minute}:08.509654", "duration": duration}
+        )
+
+    def consumer(window):
+        # as the `/ws` endpoint, for a window with statistics
+        parse = EventParser()
+
+        def consume(line):
+            us, duration = parse(line)
+            return window.consume_tick((), us // MINUTE_US, duration)
+
+        return consume
+
+    window = GroupedWindow(10, stats=["mean", "max"])
+    frames = [
+        [event(11, 20)],
+        [event(15, 31), event(12, 10)],
+        [event(16, 5), '{"duration": 1}'],
+    ]
+    results = [consume_frame(consumer(window), frame) for frame in frames]
+    assert [count for _, count, _ in results] == [1, 1, 1]
+    assert results[0][2] is None
+    assert "Out of order" in results[1][2]
+    assert "timestamp" in results[2][2]
+
+    # the rows of the events before the failing ones are kept
+    consume = consumer(GroupedWindow(10, stats=["mean", "max"]))
+    consumed = [frames[0][0], frames[1][0], frames[2][0]]
+    expected = [row for line in consumed for row in consume(line)]
+    assert [row for rows, _, _ in results for row in rows] == expected
+    assert [row[0][-8:-3] for row in expected] == [
+        "18:11",
+        "18:12",
+        "18:13",
+        "18:14",
+        "18:15",
+        "18:16",
+    ]
+
+
+def test_shard_of():
+    # shards are the same across processes, thus fixed
+    assert [shard_of(s, 4) for s in ["", "a", "tenant-1", "tenant-2"]] == [0, 3, 3, 1]
+    assert {shard_of(s, 1) for s in ["a", "b"]} == {0}
+    counts = [0] * 4
+    for i in range(1000):
+        counts[shard_of(f"tenant-{i}", 4)] += 1
+    assert min(counts) > 200
@@ -0,0 +1,90 @@
+import gzip
+
+import pytest
+
+from src.unbabel.generator import generate_lines
+from src.unbabel.reader import (
+    COMPRESSED,
+    expand_inputs,
+    prefetch,
+    read_batches,
+    read_blocks,
+    read_lines,
+)
+
+
+def test_read_lines(tmp_path, test_file_mult_within_bin):
+    input_file = tmp_path / "input.txt"
+    input_file.write_text(test_file_mult_within_bin)
+    expected = test_file_mult_within_bin.split("\n")
+    for block_size in [7, 100, 1 << 20]:
+        assert list(read_lines(input_file, block_size=block_size)) == expected
+
+
+def test_read_blocks_complete_lines(tmp_path, test_file):
+    input_file = tmp_path / "input.txt"
+    input_file.write_text(test_file + "\n")
+    for block in read_blocks(input_file, block_size=50):
+        assert block.endswith("\n")
+    assert "".join(read_blocks(input_file, block_size=50)) == test_file + "\n"
+
+
+def test_read_batches_skip_blank(tmp_path):
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("a\n\n  \nb\n")
+    assert list(read_batches(input_file)) == [["a", "b"]]
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".bz2", ".xz"])
+def test_read_compressed(tmp_path, test_file_mult_within_bin, suffix):
+    input_file = tmp_path / f"input.txt{suffix}"
+    with COMPRESSED[suffix](input_file, "wt") as fp:
+        fp.write(test_file_mult_within_bin)
+    expected = test_file_mult_within_bin.split("\n")
+    for block_size in [7, 1 << 20]:
+        assert list(read_lines(input_file, block_size=block_size)) == expected
+    with pytest.raises(ValueError):
+        list(read_lines(input_file, start=10))
+
+
+def test_merge_files(tmp_path):
+    lines = "".join(generate_lines(500, rate=5, seed=0)).splitlines()
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"events.log.{i}"
+        path.write_text("\n".join(lines[i::3]) + "\n")
+        paths.append(path)
+    with gzip.open(paths[0].with_suffix(".gz"), "wt") as fp:
+        fp.write(paths[0].read_text())
+    paths[0] = paths[0].with_suffix(".gz")
+    assert list(read_lines(paths)) == lines
+    assert "".join(read_blocks(paths, block_size=1000)).splitlines() == lines
+
+
+def test_expand_inputs(tmp_path):
+    for name in ["b.log", "a.log", "c.txt"]:
+        (tmp_path / name).write_text("")
+    assert expand_inputs([tmp_path / "*.log", tmp_path / "c.txt"]) == [
+        tmp_path / "a.log",
+        tmp_path / "b.log",
+        tmp_path / "c.txt",
+    ]
+    with pytest.raises(FileNotFoundError):
+        expand_inputs([tmp_path / "*.gz"])
+
+
+def test_prefetch():
+    assert list(prefetch(range(100), depth=2)) == list(range(100))
+
+    def failing():
+        yield 1
+        raise ValueError("failed")
+
+    items = prefetch(failing())
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="failed"):
+        next(items)
+    # the producer is stopped once the consumer stops
+    items = prefetch(iter(range(1000)), depth=1)
+    assert next(items) == 0
+    items.close()
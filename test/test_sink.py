@@ -0,0 +1,127 @@
+import sqlite3
+
+import pytest
+
+from src.unbabel.sink import WriteBehindSink, upsert_query
+
+
+class CountingConnection:
+    """Wraps a sqlite3 connection, counting statements and commits."""
+
+    def __init__(self, conn, fail: bool = False):
+        self.conn = conn
+        self.fail = fail
+        self.executed = 0
+        self.commits = 0
+
+    def cursor(self):
+        cur = self.conn.cursor()
+        outer = self
+
+        class Cursor:
+            def execute(self, query, params):
+                if outer.fail:
+                    raise sqlite3.OperationalError("unavailable")
+                outer.executed += 1
+                return cur.execute(query, params)
+
+            def close(self):
+                cur.close()
+
+        return Cursor()
+
+    def commit(self):
+        self.commits += 1
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        'CREATE TABLE metrics( "date" TIMESTAMP, group_key TEXT NOT NULL DEFAULT '
+        "'', average_delivery_time FLOAT, p95_delivery_time FLOAT, "
+        'PRIMARY KEY ("date", group_key) );'
+    )
+    return CountingConnection(conn)
+
+
+def rows(conn):
+    return conn.conn.execute(
+        "SELECT * FROM metrics ORDER BY date, group_key"
+    ).fetchall()
+
+
+def test_upsert_query():
+    query = upsert_query("metrics", ["average_delivery_time"], 2)
+    assert query == (
+        'INSERT INTO metrics ("date", group_key, "average_delivery_time") VALUES '
+        '(%s, %s, %s), (%s, %s, %s) ON CONFLICT ("date", group_key) DO UPDATE SET '
+        '"average_delivery_time" = EXCLUDED."average_delivery_time"'
+    )
+    with pytest.raises(ValueError):
+        upsert_query("metrics", ['x" = 1; --'], 1)
+
+
+def test_sink_coalesces(conn):
+    sink = WriteBehindSink(conn, placeholder="?", rows_per_statement=3)
+    for minute in range(10):
+        for group in ["", "client_name=o'brien"]:
+            sink.add(
+                f"2018-12-26 18:{minute:02}:00", {"average_delivery_time": 1.0}, group
+            )
+            sink.add(
+                f"2018-12-26 18:{minute:02}:00",
+                {"average_delivery_time": minute, "p95_delivery_time": 2.0},
+                group,
+            )
+    # nothing is written before a flush
+    assert conn.executed == 0 and rows(conn) == []
+    assert sink.flush() == 20
+    # 20 coalesced rows, 3 per statement, in a single transaction
+    assert (conn.executed, conn.commits) == (7, 1)
+    stored = rows(conn)
+    assert len(stored) == 20
+    assert stored[0] == ("2018-12-26 18:00:00", "", 0.0, 2.0)
+    assert stored[-1] == ("2018-12-26 18:09:00", "client_name=o'brien", 9.0, 2.0)
+
+    # rows produced again overwrite the stored columns only
+    sink.add("2018-12-26 18:00:00", {"average_delivery_time": 5.0})
+    sink.add("2018-12-26 18:10:00", {"average_delivery_time": 5.0})
+    sink.flush()
+    assert rows(conn)[0] == ("2018-12-26 18:00:00", "", 5.0, 2.0)
+    assert rows(conn)[-1] == ("2018-12-26 18:10:00", "", 5.0, None)
+    assert sink.flush() == 0
+
+
+def test_sink_thresholds(conn):
+    now = [0.0]
+    sink = WriteBehindSink(
+        conn, max_rows=4, max_age=1.0, placeholder="?", clock=lambda: now[0]
+    )
+    for minute in range(4):
+        sink.add(f"2018-12-26 18:{minute:02}:00", {"average_delivery_time": 1.0})
+    assert (sink.flushes, len(rows(conn))) == (1, 4)
+
+    sink.add("2018-12-26 18:04:00", {"average_delivery_time": 1.0})
+    now[0] = 0.5
+    assert not sink.due()
+    sink.add("2018-12-26 18:05:00", {"average_delivery_time": 1.0})
+    now[0] = 1.0
+    assert sink.due()
+    sink.add("2018-12-26 18:06:00", {"average_delivery_time": 1.0})
+    assert (sink.flushes, len(rows(conn))) == (2, 7)
+
+
+def test_sink_failure_keeps_rows(conn):
+    sink = WriteBehindSink(conn, placeholder="?")
+    sink.add("2018-12-26 18:00:00", {"average_delivery_time": 1.0})
+    conn.fail = True
+    with pytest.raises(sqlite3.OperationalError):
+        sink.flush()
+    conn.fail = False
+    assert sink.flush() == 1
+    assert len(rows(conn)) == 1
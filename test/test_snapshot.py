@@ -0,0 +1,58 @@
+import pytest
+
+from src.unbabel.calc import GroupedWindow
+from src.unbabel.generator import generate_lines
+from src.unbabel.parse import MINUTE_US, WORDS_FIELD, EventParser
+from src.unbabel.snapshot import (
+    dump_snapshot,
+    load_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+
+
+def events(n):
+    parse = EventParser()
+    lines = "".join(generate_lines(n, rate=5, seed=0, clients=3)).splitlines()
+    for line in lines:
+        us, dur = parse(line)
+        key = parse.fields(line, ["client_name"])
+        yield key, us // MINUTE_US, dur, parse.number(line, WORDS_FIELD)
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{}, {"stats": ["mean", "p95", "max", "wmean"]}, {"lateness": 3}]
+)
+def test_snapshot_resume(tmp_path, kwargs):
+    observations = list(events(2000))
+    window = GroupedWindow(10, **kwargs)
+    rows = []
+    for key, tick, dur, words in observations[:1000]:
+        rows.extend(window.consume_tick(key, tick, dur, words))
+
+    path = tmp_path / "windows.snap"
+    write_snapshot(path, dump_snapshot({"a": window}, {"a": observations[999][1]}))
+    state, offsets = read_snapshot(path)
+    assert offsets == {"a": observations[999][1]}
+    assert list(tmp_path.iterdir()) == [path]
+
+    # the restored window produces the same bins as the original one
+    restored = state["a"]
+    original = rows[:]
+    for key, tick, dur, words in observations[1000:]:
+        rows.extend(window.consume_tick(key, tick, dur, words))
+        original.extend(restored.consume_tick(key, tick, dur, words))
+    assert original == rows
+    assert restored.flush() == window.flush()
+
+
+def test_snapshot_corrupted(tmp_path):
+    data = dump_snapshot({"a": GroupedWindow(10)})
+    assert load_snapshot(data)[1] is None
+    with pytest.raises(ValueError, match="Corrupted"):
+        load_snapshot(data[:-1] + bytes([data[-1] ^ 1]))
+    with pytest.raises(ValueError, match="Truncated"):
+        load_snapshot(data[:10])
+    with pytest.raises(ValueError, match="version"):
+        load_snapshot(b"XXXX" + data[4:])
+    assert read_snapshot(tmp_path / "missing.snap") is None
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from src.unbabel.stats import (
+    MonotonicDeque,
+    QuantileSketch,
+    parse_stats,
+    percentile,
+    stat_column,
+)
+
+
+def test_parse_stats():
+    assert parse_stats(["mean", " p95", "p99.9", "count"]) == [
+        "mean",
+        "p95",
+        "p99.9",
+        "count",
+    ]
+    assert percentile("p99.9") == pytest.approx(0.999)
+    assert percentile("max") is None
+    assert stat_column("p99.9") == "p99_9_delivery_time"
+    assert stat_column("mean") == "average_delivery_time"
+    for names in [["p100"], ["median"], ["max", "max"]]:
+        with pytest.raises(ValueError):
+            parse_stats(names)
+
+
+def test_sketch_accuracy():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.lognormal(3, 1, 5000), [0.0] * 10])
+    sketch = QuantileSketch(accuracy=0.01)
+    counts = {}
+    for v in values.tolist():
+        key = sketch.key(v)
+        counts[key] = counts.get(key, 0) + 1
+    sketch.merge(counts)
+    qs = [0.0, 0.5, 0.95, 0.99, 1.0]
+    expected = np.quantile(values, qs, method="lower")
+    assert sketch.quantiles(qs) == pytest.approx(expected.tolist(), rel=0.01)
+
+    # subtracting the counts of every value empties the sketch
+    sketch.merge(counts, sign=-1)
+    assert sketch.n == 0 and sketch.counts == {}
+    assert sketch.quantiles(qs) == [0.0] * len(qs)
+
+
+def test_monotonic_deque():
+    values = [5, 3, 8, 1, 1, 9, 2, 4, 7, 6]
+    high, low = MonotonicDeque(maximum=True), MonotonicDeque(maximum=False)
+    for minute, v in enumerate(values):
+        high.push(minute, v)
+        low.push(minute, v)
+        high.evict(minute - 3)
+        low.evict(minute - 3)
+        window = values[max(minute - 2, 0) : minute + 1]
+        assert high.peek() == max(window)
+        assert low.peek() == min(window)
+    high.evict(len(values))
+    assert high.peek() == 0.0
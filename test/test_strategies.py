@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from importlib import metadata
+
+import pytest
+
+from src.unbabel import strategies
+from src.unbabel.calc import strategy_numpy, strategy_sliding_window
+from src.unbabel.strategies import load_strategy, strategy_names
+
+
+def test_load_builtin():
+    assert load_strategy("algo") is strategy_sliding_window
+    assert load_strategy("numpy") is strategy_numpy
+    with pytest.raises(ValueError, match="expected one of pandas, algo, numpy"):
+        load_strategy("nope")
+
+
+def test_load_entry_point(monkeypatch):
+    entry_point = metadata.EntryPoint(
+        "mine", "src.unbabel.calc:strategy_numpy", strategies.ENTRY_POINT_GROUP
+    )
+    monkeypatch.setattr(strategies, "entry_points", lambda: {"mine": entry_point})
+    assert strategy_names() == ["pandas", "algo", "numpy", "mine"]
+    assert load_strategy("mine") is strategy_numpy
+
+
+def test_cli_lazy_imports():
+    # a fresh interpreter, as the test session already imported them
+    modules = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, src.unbabel.cli; print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    for module in [
+        "numpy",
+        "pandas",
+        "websockets",
+        "pydantic",
+        "asyncio",
+        "src.unbabel.calc",
+        "src.unbabel.follow",
+    ]:
+        assert module not in modules
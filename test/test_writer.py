@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+
+from src.unbabel.calc import strategy_pandas, strategy_sliding_window
+from src.unbabel.writer import Format, write_output
+
+
+def test_write_jsonl(tmp_path, test_file, test_file_output):
+    input_file = tmp_path / "input.txt"
+    input_file.write_text(test_file)
+    output_file = tmp_path / "output.txt"
+    output_file.write_text("stale\n")
+    write_output(strategy_sliding_window(input_file, 10), output_file)
+    assert output_file.read_text() == test_file_output + "\n"
+
+    write_output(strategy_sliding_window(input_file, 10), output_file, append=True)
+    assert output_file.read_text() == (test_file_output + "\n") * 2
+
+
+def test_write_jsonl_non_finite(tmp_path, test_file_out_of_range):
+    input_file = tmp_path / "input.txt"
+    input_file.write_text(test_file_out_of_range)
+    output_file = tmp_path / "output.txt"
+    rows = list(strategy_pandas(input_file, 10))
+    write_output(rows, output_file)
+    expected = "".join(
+        json.dumps({"date": date, "average_delivery_time": dur}) + "\n"
+        for date, dur in rows
+    )
+    assert "NaN" in expected
+    assert output_file.read_text() == expected
+
+
+def test_write_csv(tmp_path):
+    output_file = tmp_path / "output.csv"
+    rows = [("2018-12-26 18:11:00", 0.0), ("2018-12-26 18:12:00", 20.5)]
+    write_output(rows, output_file, fmt=Format.CSV)
+    write_output(rows, output_file, fmt=Format.CSV, append=True)
+    assert output_file.read_text() == (
+        "date,average_delivery_time\n"
+        "2018-12-26 18:11:00,0.0\n"
+        "2018-12-26 18:12:00,20.5\n"
+        "2018-12-26 18:11:00,0.0\n"
+        "2018-12-26 18:12:00,20.5\n"
+    )
+
+
+def test_write_npy(tmp_path):
+    output_file = tmp_path / "output.npy"
+    rows = [("2018-12-26 18:11:00", 0.0), ("2018-12-26 18:12:00", 20.5)]
+    assert write_output(rows, output_file, fmt=Format.NPY) == 2
+    array = np.load(output_file)
+    assert array["date"][1] == np.datetime64("2018-12-26 18:12:00")
+    assert array["average_delivery_time"].tolist() == [0.0, 20.5]
+
+
+def test_write_groups(tmp_path):
+    rows = [
+        ("2018-12-26 18:11:00", "airliberty", "pt", 0.0),
+        ("2018-12-26 18:11:00", 'air "liberty", inc', "fr", 20.5),
+    ]
+    columns = ["client_name", "target_language"]
+    output_file = tmp_path / "output.txt"
+    write_output(rows, output_file, groups=columns)
+    assert output_file.read_text() == "".join(
+        json.dumps(
+            {
+                "date": date,
+                "client_name": c,
+                "target_language": t,
+                "average_delivery_time": dur,
+            }
+        )
+        + "\n"
+        for date, c, t, dur in rows
+    )
+
+    output_file = tmp_path / "output.csv"
+    write_output(rows, output_file, fmt=Format.CSV, groups=columns)
+    assert output_file.read_text() == (
+        "date,client_name,target_language,average_delivery_time\n"
+        "2018-12-26 18:11:00,airliberty,pt,0.0\n"
+        '2018-12-26 18:11:00,"air ""liberty"", inc",fr,20.5\n'
+    )
+
+    output_file = tmp_path / "output.npy"
+    write_output(rows, output_file, fmt=Format.NPY, groups=columns)
+    array = np.load(output_file)
+    assert array["client_name"].tolist() == ["airliberty", 'air "liberty", inc']
+    assert array["average_delivery_time"].tolist() == [0.0, 20.5]